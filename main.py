@@ -1,5 +1,8 @@
 import os
 import sys
+import time
+import asyncio
+import threading
 
 from dotenv import load_dotenv
 
@@ -7,10 +10,12 @@ load_dotenv()
 
 from src.audio.recorder import AudioRecorder
 from src.keyboard.listener import KeyboardManager, check_accessibility_permissions
+from src.keyboard.inputState import InputState
 from src.transcription.whisper import WhisperProcessor
 from src.utils.logger import logger
 from src.transcription.senseVoiceSmall import SenseVoiceSmallProcessor
-from src.chat.deepseek import DeepSeekChat
+from src.chat.chat_factory import ChatFactory
+from src.utils.segmenter import SentenceSegmenter
 
 
 def check_microphone_permissions():
@@ -30,7 +35,11 @@ class VoiceAssistant:
     def __init__(self, audio_processor):
         self.audio_recorder = AudioRecorder()
         self.audio_processor = audio_processor
-        self.chat_processor = DeepSeekChat()
+        # 对话模式使用流式 DeepSeek 后端，在后台事件循环中运行，不阻塞键盘监听；
+        # 不跟随 Web 模式的 CHAT_TYPE，可用 KEYBOARD_CHAT_TYPE 改为其他后端
+        self.chat_processor = ChatFactory.create_chat(os.getenv("KEYBOARD_CHAT_TYPE", "deepseek"))
+        self.chat_loop = asyncio.new_event_loop()
+        threading.Thread(target=self.chat_loop.run_forever, name="chat-loop", daemon=True).start()
         self.keyboard_manager = KeyboardManager(
             on_record_start=self.start_transcription_recording,
             on_record_stop=self.stop_transcription_recording,
@@ -38,7 +47,8 @@ class VoiceAssistant:
             on_translate_stop=self.stop_translation_recording,
             on_chat_start=self.start_chat_recording,
             on_chat_stop=self.stop_chat_recording,
-            on_reset_state=self.reset_state
+            on_reset_state=self.reset_state,
+            on_reply_cancel=self.cancel_reply
         )
     
     def start_transcription_recording(self):
@@ -105,17 +115,52 @@ class VoiceAssistant:
             )
             text, error = result if isinstance(result, tuple) else (result, None)
             
-            if error:
-                self.keyboard_manager.type_text("", error)
+            if error or not text:
+                self.keyboard_manager.type_text(text, error)
                 return
-                
-            # 使用 DeepSeek 处理对话
-            response = self.chat_processor.chat(text)
-            self.keyboard_manager.type_text(response)
+
+            # 回复在后台逐句输入，键盘监听立即返回
+            asyncio.run_coroutine_threadsafe(self._stream_reply(text), self.chat_loop)
         else:
             logger.error("没有录音数据，状态将重置")
             self.keyboard_manager.reset_state()
 
+    async def _stream_reply(self, text):
+        """流式获取回复，每凑成一句就输入到光标处"""
+        start = time.perf_counter()
+        segmenter = SentenceSegmenter()
+        keyboard = self.keyboard_manager
+
+        def type_sentence(sentence):
+            if keyboard.state == InputState.CHATTING:
+                if not keyboard.begin_reply():
+                    return False
+                sentence = sentence.lstrip()
+                logger.info(f"首句回复已输入，耗时 {(time.perf_counter() - start) * 1000:.0f}ms")
+            return keyboard.append_reply(sentence)
+
+        try:
+            async for chunk in self.chat_processor.stream_chat(text):
+                if chunk.startswith("Error:"):
+                    keyboard.show_error(f"❌ {chunk}")
+                    return
+                for sentence in segmenter.feed(chunk):
+                    if not type_sentence(sentence):
+                        # 用户已重置，停止生成
+                        self.chat_processor.stop_streaming()
+                        return
+            for sentence in segmenter.flush():
+                type_sentence(sentence)
+            keyboard.finish_reply()
+            logger.info(f"回复输入完成，总耗时 {(time.perf_counter() - start) * 1000:.0f}ms")
+        except Exception as e:
+            logger.error(f"对话回复失败: {e}", exc_info=True)
+            keyboard.show_error(f"❌ 对话回复失败: {e}")
+
+    def cancel_reply(self):
+        """中断正在输入的回复"""
+        self.chat_loop.call_soon_threadsafe(self.chat_processor.stop_streaming)
+
     def reset_state(self):
         """重置状态"""
         self.keyboard_manager.reset_state()
@@ -2,14 +2,125 @@ import torch
 import sounddevice as sd
 import numpy as np
 import os
-from typing import Tuple, Optional
+from typing import Iterator, Tuple, Optional
 import requests
 from tqdm import tqdm
 from pathlib import Path
 import sys
-import soundfile as sf
+import threading
+import time
+from contextlib import contextmanager
 from transformers import BertConfig, BertModel, BertTokenizer
-import io
+
+# 添加项目根目录到 Python 路径
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
+from src.utils.segmenter import split_sentences
+from src.audio.tts_batching import plan_batches
+from src.audio.tts_cache import get_audio_cache, get_phoneme_cache
+from src.audio.voices import get_voice_registry
+from src.audio.tts_optimize import (
+    CPUOptimization, capture_inputs, compile_modules, configure_threads,
+    quantize_dynamic, trace_modules, uncompile_modules,
+)
+from src.audio.wav import encode_pcm16
+
+SAMPLE_RATE = 24000
+SEGMENT_SILENCE = 0.3  # 每段之后的停顿（秒）
+SILENCE_SAMPLES = int(SAMPLE_RATE * SEGMENT_SILENCE)
+# 预热用的文本，长短不一，编译和追踪能见到不同的输入长度
+WARMUP_TEXTS = ("Hello there, how can I help you today?", "Sure.")
+
+# build_model 只接受文件路径，用这个路径表示已在内存中的权重
+_PRELOADED_PATH = "<preloaded-kokoro-weights>"
+_preload_lock = threading.Lock()
+
+
+@contextmanager
+def _preloaded_weights(weights: dict):
+    """让 build_model 内部的 torch.load 直接返回已加载的权重
+
+    只拦截 _PRELOADED_PATH，其他线程同时加载声音等文件不受影响。
+    """
+    with _preload_lock:
+        original = torch.load
+
+        def load(f, *args, **kwargs):
+            if isinstance(f, str) and f == _PRELOADED_PATH:
+                return {'net': weights}
+            return original(f, *args, **kwargs)
+
+        torch.load = load
+        try:
+            yield _PRELOADED_PATH
+        finally:
+            torch.load = original
+
+
+def _load_voicepack(path: Path, device: str):
+    """读取声音包，支持时使用内存映射"""
+    try:
+        voicepack = torch.load(path, map_location='cpu', weights_only=True, mmap=True)
+    except (TypeError, RuntimeError):
+        voicepack = torch.load(path, map_location='cpu', weights_only=True)
+    return voicepack.to(device)
+
+
+@contextmanager
+def _masked_time_axis(modules, frames):
+    """让 modules 中的卷积和实例归一化忽略批内各条目末尾的填充帧
+
+    解码器和 F0/N 预测器各层的时间长度都是帧数的整数倍（上采样倍数对
+    所有条目相同），条目 i 在长度为 T 的一层中的有效长度按
+    T * frames[i] / max(frames) 计算。卷积输入的填充位置置零，与逐段合成
+    时卷积边界的零填充一致；InstanceNorm 只按有效帧计算均值和方差，
+    否则较短条目整段的音高、能量和波形都会随填充改变。
+    """
+    from torch import nn
+
+    max_frames = int(frames.max())
+
+    def valid_mask(x):
+        steps = x.shape[-1]
+        valid = (frames * steps + max_frames - 1) // max_frames
+        return (torch.arange(steps, device=x.device)[None, :] < valid[:, None]).to(x.dtype)[:, None, :]
+
+    def zero_padding(module, args):
+        return (args[0] * valid_mask(args[0]),) + tuple(args[1:])
+
+    def masked_norm(module, args, output):
+        x = args[0]
+        mask = valid_mask(x)
+        count = mask.sum(-1, keepdim=True).clamp(min=1)
+        mean = (x * mask).sum(-1, keepdim=True) / count
+        var = ((x - mean) ** 2 * mask).sum(-1, keepdim=True) / count
+        normed = (x - mean) / torch.sqrt(var + module.eps)
+        if module.affine:
+            normed = normed * module.weight[None, :, None] + module.bias[None, :, None]
+        return normed
+
+    handles = []
+    for root in modules:
+        for module in root.modules():
+            if isinstance(module, (nn.Conv1d, nn.ConvTranspose1d)):
+                handles.append(module.register_forward_pre_hook(zero_padding))
+            elif isinstance(module, nn.InstanceNorm1d):
+                handles.append(module.register_forward_hook(masked_norm))
+    try:
+        yield
+    finally:
+        for handle in handles:
+            handle.remove()
+
+
+def peak_rss_mb() -> Optional[float]:
+    """进程的峰值常驻内存（MB），不支持的平台返回 None"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS 以字节为单位，Linux 以 KB 为单位
+    return rss / (1 << 20) if sys.platform == 'darwin' else rss / 1024
 
 class KokoroTTS:
     MODEL_FILES = {
@@ -21,7 +132,7 @@ class KokoroTTS:
         'voices/af.pt': 'https://huggingface.co/hexgrad/Kokoro-82M/resolve/main/voices/af.pt'
     }
     
-    def __init__(self):
+    def __init__(self, cpu_optimization: Optional[CPUOptimization] = None):
         # 设置路径
         root_dir = Path(__file__).resolve().parent.parent.parent
         self.model_path = root_dir / "models" / "kokoro-v1_0.pth"
@@ -32,6 +143,19 @@ class KokoroTTS:
         (self.model_dir / 'voices').mkdir(exist_ok=True)
         (self.model_dir / 'bert').mkdir(exist_ok=True)
         
+        # 是否用内存映射读取模型权重
+        self.mmap_weights = os.getenv("KOKORO_MMAP", "true").lower() != "false"
+        self.load_seconds = None
+        self.load_peak_rss_mb = None
+        # 每次前向最多合成的分段数，1 表示逐段合成；调大前先用
+        # tts_benchmark --check-batching 确认批量合成与逐段合成的音质一致
+        self.batch_size = int(os.getenv("KOKORO_BATCH_SIZE", "1"))
+        # 进程内共享的音素和音频缓存，重复的文本不再运行模型
+        self.phoneme_cache = get_phoneme_cache()
+        self.audio_cache = get_audio_cache()
+        # CPU 推理优化，默认按 KOKORO_CPU_OPTIMIZE 等环境变量
+        self.cpu_optimization = cpu_optimization or CPUOptimization.from_env()
+        
         # 复制或下载模型文件
         self._setup_model_files()
         self._init_model()
@@ -108,9 +232,12 @@ class KokoroTTS:
             # 尝试导入必要的模块
             try:
                 from models import build_model
+                import kokoro
                 from kokoro import generate, generate_full, phonemize
                 self.generate = generate
                 self.phonemize = phonemize
+                # 批量合成需要自行分词，旧版 kokoro.py 没有 tokenize 时只能逐段合成
+                self.tokenize = getattr(kokoro, 'tokenize', None)
                 print("成功导入模型模块")
             except ImportError as e:
                 print(f"导入错误: {str(e)}")
@@ -125,43 +252,37 @@ class KokoroTTS:
             
             # 构建模型
             print("开始构建模型...")
+            start = time.perf_counter()
             try:
-                # 先加载状态字典
-                state_dict = torch.load(model_path, map_location=self.device)
+                # 只读取一次权重，build_model 直接使用，不再写临时文件
+                state_dict = self._load_weights(model_path)
                 print(f"模型状态字典的键: {state_dict.keys()}")
                 
-                # 创建临时文件
-                temp_path = self.model_dir / "temp_model.pth"
-                torch.save({'net': state_dict}, temp_path)
-                
-                try:
-                    # 使用临时文件构建模型
+                with _preloaded_weights(state_dict) as path:
                     model = build_model(
-                        path=str(temp_path),
+                        path=path,
                         device=self.device
                     )
-                    
-                    # 将 Munch 对象转换为 nn.Module
-                    if hasattr(model, '__dict__'):
-                        from torch import nn
-                        self.model = nn.ModuleDict(model.__dict__)
-                    else:
-                        self.model = model
-                    
-                    # 移动到指定设备
-                    if hasattr(self.model, 'to'):
-                        self.model = self.model.to(self.device)
-                    
-                    print("模型构建完成")
-                    
-                    # 设置为评估模式
-                    if hasattr(self.model, 'eval'):
-                        self.model.eval()
-                    
-                finally:
-                    # 确保删除临时文件
-                    if temp_path.exists():
-                        temp_path.unlink()
+                
+                # 将 Munch 对象转换为 nn.Module
+                if hasattr(model, '__dict__'):
+                    from torch import nn
+                    self.model = nn.ModuleDict(model.__dict__)
+                else:
+                    self.model = model
+                
+                # 移动到指定设备
+                if hasattr(self.model, 'to'):
+                    self.model = self.model.to(self.device)
+                
+                # 设置为评估模式
+                if hasattr(self.model, 'eval'):
+                    self.model.eval()
+                
+                self.load_seconds = time.perf_counter() - start
+                self.load_peak_rss_mb = peak_rss_mb()
+                rss = f"{self.load_peak_rss_mb:.0f} MB" if self.load_peak_rss_mb else "未知"
+                print(f"模型构建完成，耗时 {self.load_seconds:.2f} 秒，峰值内存 {rss}")
                 
             except Exception as e:
                 print(f"加载模型状态时出错: {str(e)}")
@@ -184,22 +305,310 @@ class KokoroTTS:
             traceback.print_exc()
             raise
         
+        # 预加载全部声音，同一设备上的实例共享
+        self.voices = get_voice_registry(
+            self.model_dir / 'voices',
+            self.device,
+            loader=lambda path: _load_voicepack(path, self.device)
+        )
+        
         # 加载默认声音
         self.voice_name = 'af'  # Bella & Sarah 混合声音
-        voice_file = self.model_dir / 'voices' / f'{self.voice_name}.pt'
-        if not voice_file.exists():
-            raise FileNotFoundError(f"声音文件不存在: {voice_file}")
-            
-        # self.voicepack = torch.load(voice_file, weights_only=True).to(self.device)
-        
-        self.voicepack = torch.load(voice_file).to(self.device)
+        self.voicepack = self.voices.get(self.voice_name)
         print(f"已加载声音: {self.voice_name}")
 
-    def speak(self, text: str) -> Tuple[bytes, str]:
+        if self.cpu_optimization.enabled:
+            if self.device == 'cpu' and isinstance(self.model, torch.nn.Module):
+                self._optimize_for_cpu(self.cpu_optimization)
+            else:
+                print("CPU 推理优化只在 CPU 上启用，已跳过")
+
+    def _optimize_for_cpu(self, options: CPUOptimization):
+        """线程设置、int8 动态量化和可选的编译，最后预热
+
+        编译或追踪在预热时失败则恢复即时模式，量化后的模型仍然使用。
+        """
+        start = time.perf_counter()
+        configure_threads(options.threads, options.interop_threads)
+        if options.quantize:
+            self.model = quantize_dynamic(self.model)
+            print("已将 Linear/LSTM 动态量化为 int8")
+        if options.compile == "trace":
+            with capture_inputs(self.model) as examples:
+                self._warmup(1)
+            trace_modules(self.model, examples)
+        elif options.compile == "compile":
+            compile_modules(self.model)
+        try:
+            self._warmup(options.warmup)
+        except Exception as e:
+            if options.compile == "off":
+                raise
+            print(f"编译后的模型预热失败，恢复即时模式: {str(e)}")
+            uncompile_modules(self.model)
+            self._warmup(options.warmup)
+        print(f"CPU 推理优化完成，耗时 {time.perf_counter() - start:.2f} 秒")
+
+    def _warmup(self, rounds: int):
+        """不经过缓存运行几次模型，首次请求不再承担编译和内存分配的开销"""
+        for _ in range(rounds):
+            for text in WARMUP_TEXTS:
+                with torch.inference_mode():
+                    self.generate(self.model, text, self.voicepack, lang='a', ps=self.phonemize(text, 'a'))
+
+    def _load_weights(self, model_path: Path) -> dict:
+        """读取按模块分组的权重，只读一次，尽量使用内存映射
+
+        同目录下有同名 .safetensors 文件时优先使用（扁平的 "模块.参数" 键）；
+        否则 KOKORO_MMAP 不为 false 时用 torch.load(mmap=True)，权重按需从
+        页缓存读入，不会先完整复制到内存。
+        """
+        safetensors_path = model_path.with_suffix('.safetensors')
+        if safetensors_path.exists():
+            from safetensors.torch import load_file
+            weights = {}
+            for key, tensor in load_file(str(safetensors_path)).items():
+                module, _, name = key.partition('.')
+                weights.setdefault(module, {})[name] = tensor
+            print(f"从 safetensors 加载权重: {safetensors_path}")
+            return weights
+        if self.mmap_weights:
+            try:
+                return torch.load(model_path, map_location='cpu', mmap=True, weights_only=True)
+            except (TypeError, RuntimeError) as e:
+                # torch < 2.1 没有 mmap 参数，旧的非 zip 格式也无法映射
+                print(f"无法内存映射模型文件，改为完整读取: {str(e)}")
+        return torch.load(model_path, map_location='cpu', weights_only=True)
+
+    def _segments(self, text: str) -> list[str]:
+        """清理文本并按句子切分为不超过约 100 字符的分段"""
+        # 清理文本，移除多余的空白和换行
+        text = ' '.join(text.strip().split())
+        
+        # 将长文本分段处理
+        max_length = 100  # 每段最大字符数
+        segments = []
+        
+        # 按句子分割，短句合并到同一段
+        for sentence in split_sentences(text, max_chars=max_length):
+            sentence = sentence.strip()
+            if segments and len(segments[-1]) + len(sentence) < max_length:
+                segments[-1] += ' ' + sentence
+            else:
+                segments.append(sentence)
+        return segments
+
+    def _phonemize(self, segment: str) -> str:
+        return self.phoneme_cache.get_or_compute(segment, 'a', self.phonemize)
+
+    def _voice(self, voice: Optional[str]) -> Tuple[str, object]:
+        """返回 (声音名, 声音包)，voice 为空时使用实例当前的声音"""
+        if not voice:
+            return self.voice_name, self.voicepack
+        return self.voices.normalize(voice), self.voices.get(voice)
+
+    def _cached_audio(self, phonemes: str, speed: float, voice: str) -> Optional[np.ndarray]:
+        if self.audio_cache is None:
+            return None
+        return self.audio_cache.get(phonemes, voice, speed)
+
+    def _remember(self, phonemes: str, speed: float, voice: str, audio: np.ndarray):
+        if self.audio_cache is not None:
+            self.audio_cache.put(phonemes, voice, speed, audio)
+
+    def _synthesize(self, segment: str, speed: float = 1.0,
+                    voice: Optional[str] = None) -> Tuple[Optional[np.ndarray], Optional[str]]:
+        """合成一个分段，返回单声道音频和音素，命中缓存时不运行模型"""
+        voice, voicepack = self._voice(voice)
+        phonemes = self._phonemize(segment)
+        cached = self._cached_audio(phonemes, speed, voice)
+        if cached is not None:
+            return cached, phonemes
+        print(f"正在生成语音: {segment}")
+        
+        # 生成音频，inference_mode 比 no_grad 省去版本计数和视图跟踪
+        with torch.inference_mode():
+            audio, _ = self.generate(
+                self.model, 
+                segment, 
+                voicepack, 
+                lang='a',  # 使用通用语言代码
+                speed=speed,
+                ps=phonemes
+            )
+        
+        if audio is None or not isinstance(audio, np.ndarray):
+            return None, phonemes
+        # 确保音频是单声道
+        if len(audio.shape) > 1:
+            audio = audio[:, 0]  # 只保留第一个通道
+        else:
+            audio = audio.reshape(-1)
+        self._remember(phonemes, speed, voice, audio)
+        return audio, phonemes
+
+    def _can_batch(self) -> bool:
+        """旧版 kokoro.py 没有 tokenize；TorchScript 追踪的解码器不执行 hook，无法屏蔽填充"""
+        decoder = getattr(self.model, 'decoder', None)
+        return self.tokenize is not None and not isinstance(decoder, torch.jit.ScriptModule)
+
+    @torch.inference_mode()
+    def _forward_batch(self, token_lists: list[list[int]], voicepack, speed: float = 1.0) -> list[np.ndarray]:
+        """把多个分段填充到相同长度，一次前向合成
+
+        与 kokoro.forward 的计算相同，只是各步按批处理：文本侧用掩码和
+        pack_padded_sequence 忽略填充，对齐矩阵按各自的时长构造，F0/N
+        预测器的 LSTM 同样打包，F0/N 预测器和解码器在 _masked_time_axis
+        中运行，卷积和实例归一化都不受填充帧影响，输出按各自的帧数截断。
+        解码器的随机噪声与 iSTFT 的边界处理仍与逐段合成略有不同，音质用
+        tts_benchmark --check-batching 验证。
+        """
+        model, device = self.model, self.device
+        batch = len(token_lists)
+        lengths = torch.tensor([len(t) + 2 for t in token_lists], device=device)
+        max_len = int(lengths.max())
+        tokens = torch.zeros(batch, max_len, dtype=torch.long, device=device)
+        for i, t in enumerate(token_lists):
+            tokens[i, 1:len(t) + 1] = torch.tensor(t, device=device)
+        # True 表示填充位置
+        text_mask = torch.arange(max_len, device=device)[None, :] >= lengths[:, None]
+        # 风格向量按各自的 token 数选取
+        ref_s = torch.cat([voicepack[len(t)] for t in token_lists])
+        s = ref_s[:, 128:]
+
+        bert_dur = model.bert(tokens, attention_mask=(~text_mask).int())
+        d_en = model.bert_encoder(bert_dur).transpose(-1, -2)
+        d = model.predictor.text_encoder(d_en, s, lengths, text_mask)
+        packed = torch.nn.utils.rnn.pack_padded_sequence(d, lengths.cpu(), batch_first=True, enforce_sorted=False)
+        x, _ = model.predictor.lstm(packed)
+        x, _ = torch.nn.utils.rnn.pad_packed_sequence(x, batch_first=True, total_length=max_len)
+        duration = torch.sigmoid(model.predictor.duration_proj(x)).sum(axis=-1) / speed
+        pred_dur = torch.round(duration).clamp(min=1).long().masked_fill(text_mask, 0)
+
+        # 对齐矩阵：第 j 个 token 覆盖 [starts_j, ends_j) 帧
+        frames = pred_dur.sum(axis=-1)
+        max_frames = int(frames.max())
+        ends = pred_dur.cumsum(axis=-1)
+        starts = ends - pred_dur
+        positions = torch.arange(max_frames, device=device)[None, None, :]
+        pred_aln_trg = ((positions >= starts[..., None]) & (positions < ends[..., None])).float()
+
+        # 即 predictor.F0Ntrain，共享的双向 LSTM 不能读到填充帧
+        predictor = model.predictor
+        en = d.transpose(-1, -2) @ pred_aln_trg
+        packed = torch.nn.utils.rnn.pack_padded_sequence(
+            en.transpose(-1, -2), frames.cpu(), batch_first=True, enforce_sorted=False)
+        shared, _ = predictor.shared(packed)
+        shared, _ = torch.nn.utils.rnn.pad_packed_sequence(shared, batch_first=True, total_length=max_frames)
+        shared = shared.transpose(-1, -2)
+        t_en = model.text_encoder(tokens, lengths, text_mask)
+        asr = t_en @ pred_aln_trg
+        # torch.compile 包装的解码器不一定执行子模块的 hook，批量合成使用原模块
+        decoder = getattr(model.decoder, "_orig_mod", model.decoder)
+        with _masked_time_axis((predictor.F0, predictor.F0_proj, predictor.N, predictor.N_proj, decoder), frames):
+            F0_pred, N_pred = shared, shared
+            for block in predictor.F0:
+                F0_pred = block(F0_pred, s)
+            F0_pred = predictor.F0_proj(F0_pred).squeeze(1)
+            for block in predictor.N:
+                N_pred = block(N_pred, s)
+            N_pred = predictor.N_proj(N_pred).squeeze(1)
+            audio = decoder(asr, F0_pred, N_pred, ref_s[:, :128]).reshape(batch, -1)
+        samples_per_frame = audio.shape[-1] // max_frames
+        audio = audio.cpu().numpy()
+        return [audio[i, :int(frames[i]) * samples_per_frame] for i in range(batch)]
+
+    def iter_synthesize(self, segments: list[str], speed: float = 1.0,
+                        voice: Optional[str] = None) -> Iterator[Tuple[Optional[np.ndarray], Optional[str]]]:
+        """按文本顺序产出各分段的 (音频, 音素)
+
+        batch_size 大于 1 时第一段单独合成以尽快开始播放，命中音频缓存的
+        分段直接使用，其余分段按长度分批合成，一批完成后立即产出已按顺序
+        就绪的分段。voice 为声音名或混合表达式，为空时使用当前声音。
+        """
+        if self.batch_size <= 1 or not self._can_batch() or len(segments) <= 1:
+            for segment in segments:
+                yield self._synthesize(segment, speed, voice)
+            return
+
+        voice, voicepack = self._voice(voice)
+        yield self._synthesize(segments[0], speed, voice)
+        rest = segments[1:]
+        phonemes = [self._phonemize(segment) for segment in rest]
+        done = {}
+        pending = []
+        for i, ps in enumerate(phonemes):
+            cached = self._cached_audio(ps, speed, voice)
+            if cached is not None:
+                done[i] = (cached, ps)
+            else:
+                pending.append(i)
+        tokens = {i: self.tokenize(phonemes[i])[:510] for i in pending}
+        next_index = 0
+        while next_index in done:
+            yield done.pop(next_index)
+            next_index += 1
+        for batch in plan_batches([len(tokens[i]) for i in pending], max_batch=self.batch_size):
+            batch = [pending[j] for j in batch]
+            items = [i for i in batch if tokens[i]]
+            print(f"批量生成语音: {len(items)} 段")
+            try:
+                audios = self._forward_batch([tokens[i] for i in items], voicepack, speed) if items else []
+            except Exception as e:
+                print(f"批量合成失败，改为逐段合成: {str(e)}")
+                audios = [self._synthesize(rest[i], speed, voice)[0] for i in items]
+            for i in batch:
+                done[i] = (None, phonemes[i])
+            for i, audio in zip(items, audios):
+                done[i] = (audio, phonemes[i])
+                if audio is not None:
+                    self._remember(phonemes[i], speed, voice, audio)
+            while next_index in done:
+                yield done.pop(next_index)
+                next_index += 1
+
+    def encode_segments(self, segments: list[str], format: str = "wav",
+                        voice: Optional[str] = None) -> Iterator[Optional[bytes]]:
+        """按顺序产出每个分段的编码音频（末尾带段间停顿），合成失败的分段产出 None
+
+        分段一起交给 iter_synthesize，batch_size 大于 1 时按批推理。
+        """
+        if format not in ("wav", "pcm"):
+            raise ValueError(f"不支持的音频格式: {format}")
+        for audio, _ in self.iter_synthesize(segments, voice=voice):
+            # 无法预知全文的峰值，按分段归一化
+            yield None if audio is None else encode_pcm16([audio], SAMPLE_RATE, SILENCE_SAMPLES, format)
+
+    def speak_stream(self, text: str, format: str = "wav", voice: Optional[str] = None) -> Iterator[bytes]:
+        """
+        逐段合成语音，每段生成后立即产出，播放无需等待全文合成完成
+        Args:
+            text: 要转换的文字
+            format: "wav" 时每段是独立的 WAV 文件，"pcm" 时是 24kHz 单声道 16 位裸 PCM
+            voice: 本次使用的声音名或混合表达式（如 "af_bella:0.7+af_sarah:0.3"），默认为当前声音
+        Yields:
+            bytes: 一段音频，末尾带有与 speak 相同的段间停顿
+        """
+        if format not in ("wav", "pcm"):
+            raise ValueError(f"不支持的音频格式: {format}")
+        if not text or len(text.strip()) == 0:
+            print("文本为空")
+            return
+        try:
+            for chunk in self.encode_segments(self._segments(text), format, voice):
+                if chunk is not None:
+                    yield chunk
+        except Exception as e:
+            print(f"TTS 生成失败: {str(e)}")
+            import traceback
+            traceback.print_exc()
+
+    def speak(self, text: str, voice: Optional[str] = None) -> Tuple[bytes, str]:
         """
         将文字转换为语音
         Args:
             text: 要转换的文字
+            voice: 本次使用的声音名或混合表达式，默认为当前声音
         Returns:
             Tuple[bytes, str]: (音频数据, 音素)
         """
@@ -208,79 +617,16 @@ class KokoroTTS:
             if not text or len(text.strip()) == 0:
                 print("文本为空")
                 return None, None
-                
-            # 清理文本，移除多余的空白和换行
-            text = ' '.join(text.strip().split())
             
-            # 将长文本分段处理
-            max_length = 100  # 每段最大字符数
+            # 处理每个分段，合成失败的分段只保留停顿
             segments = []
+            phonemes = None
+            for audio, phonemes in self.iter_synthesize(self._segments(text), voice=voice):
+                segments.append(audio)
             
-            # 按句子分割
-            sentences = text.split('. ')
-            current_segment = ''
-            
-            for sentence in sentences:
-                if len(current_segment) + len(sentence) <= max_length:
-                    current_segment += sentence + '. '
-                else:
-                    if current_segment:
-                        segments.append(current_segment.strip())
-                    current_segment = sentence + '. '
-            
-            if current_segment:
-                segments.append(current_segment.strip())
-            
-            # 处理每个分段
-            full_audio = []
-            for segment in segments:
-                print(f"正在生成语音: {segment}")
-                
-                # 生成音频
-                audio, phonemes = self.generate(
-                    self.model, 
-                    segment, 
-                    self.voicepack, 
-                    lang='a',  # 使用通用语言代码
-                    speed=1.0
-                )
-                
-                if audio is not None and isinstance(audio, np.ndarray):
-                    # 确保音频是单声道
-                    if len(audio.shape) > 1:
-                        audio = audio[:, 0]  # 只保留第一个通道
-                    else:
-                        audio = audio.reshape(-1)
-                    
-                    # 添加到完整音频
-                    full_audio.append(audio)
-                
-                # 添加短暂停顿
-                silence = np.zeros(int(24000 * 0.3))  # 0.3秒静音
-                full_audio.append(silence)
-            
-            if full_audio:
-                # 合并所有音频片段
-                audio = np.concatenate(full_audio)
-                
-                # 确保音频数据是 float32 类型且在 [-1, 1] 范围内
-                if audio.dtype != np.float32:
-                    audio = audio.astype(np.float32)
-                if np.abs(audio).max() > 1:
-                    audio = audio / np.abs(audio).max()
-                
-                # 转换为 int16
-                audio_int16 = (audio * 32767).astype(np.int16)
-                
-                # 创建临时缓冲区保存为 WAV 格式
-                buffer = io.BytesIO()
-                sf.write(buffer, audio_int16, 24000, format='WAV', subtype='PCM_16')
-                buffer.seek(0)
-                
-                # 读取 WAV 文件数据
-                audio_bytes = buffer.read()
-                buffer.close()
-                
+            if segments:
+                # 各分段和段间停顿直接写入同一个缓冲区
+                audio_bytes = encode_pcm16(segments, SAMPLE_RATE, SILENCE_SAMPLES)
                 print("语音生成完成")
                 return audio_bytes, phonemes
             else:
@@ -312,14 +658,12 @@ class KokoroTTS:
         - bm_lewis: Lewis (英式)
         - af_nicole: Nicole
         - af_sky: Sky
+        也可以按权重混合，如 "af_bella:0.7+af_sarah:0.3"
         """
         try:
-            self.voice_name = voice_name
-            voice_file = self.model_dir / 'voices' / f'{voice_name}.pt'
-            if not voice_file.exists():
-                raise FileNotFoundError(f"声音文件不存在: {voice_file}")
-            
-            self.voicepack = torch.load(voice_file, weights_only=True).to(self.device)
+            # 声音已预加载，切换无需读盘
+            self.voicepack = self.voices.get(voice_name)
+            self.voice_name = self.voices.normalize(voice_name)
             print(f"已切换到声音: {voice_name}")
         except Exception as e:
             print(f"切换声音失败: {str(e)}")
@@ -0,0 +1,30 @@
+from typing import Sequence
+
+
+def plan_batches(lengths: Sequence[int], max_batch: int = 8, max_tokens: int = 2048,
+                 max_pad_ratio: float = 1.5) -> list[list[int]]:
+    """按长度把分段分组，返回每批分段的下标
+
+    分段先按 token 数排序，相近长度的分段放进同一批，减少填充浪费。
+    一批最多 max_batch 条，填充后的总 token 数不超过 max_tokens，最长
+    一条不超过最短一条的 max_pad_ratio 倍。各批按最短分段的原始顺序
+    排列，靠前的文本先合成。
+    """
+    order = sorted(range(len(lengths)), key=lambda i: (lengths[i], i))
+    batches: list[list[int]] = []
+    current: list[int] = []
+    for i in order:
+        if current:
+            # 已排序，新加入的分段就是本批最长的
+            longest = lengths[i]
+            shortest = max(lengths[current[0]], 1)
+            if (len(current) >= max_batch
+                    or longest * (len(current) + 1) > max_tokens
+                    or longest > shortest * max_pad_ratio):
+                batches.append(current)
+                current = []
+        current.append(i)
+    if current:
+        batches.append(current)
+    batches.sort(key=min)
+    return batches
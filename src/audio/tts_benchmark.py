@@ -0,0 +1,378 @@
+import os
+import sys
+import json
+import time
+import argparse
+import tracemalloc
+import platform
+import subprocess
+from pathlib import Path
+from typing import Optional
+
+# 添加项目根目录到 Python 路径
+root_dir = Path(__file__).resolve().parent.parent.parent
+sys.path.append(str(root_dir))
+
+from src.chat.benchmark import _git_commit, distribution
+from src.audio.tts_optimize import CPUOptimization, audio_similarity
+from src.audio.wav import encode_pcm16
+
+DEFAULT_TEXT = """
+Absolutely! Here's an interesting fact: The word "tarantula" comes from the Italian city of Taranto.
+It was believed that a bite from a tarantula spider could induce a sort of madness.
+Dancers were known to dance frantically to ward off the effects of the bite, a practice called tarantism.
+The condition was believed to be treatable through physical exertion.
+That is how the spider came to be associated with the term.
+Thanks for asking! Let me know if you want to hear another one.
+I can also tell you about other animals with surprising names.
+"""
+
+
+def measure(tts, segments: list[str], repeats: int = 3) -> dict:
+    """合成 repeats 次，返回耗时、音频时长和实时率（合成耗时 / 音频时长）"""
+    from src.audio.text_to_speech import SAMPLE_RATE
+
+    list(tts.iter_synthesize(segments))  # 预热
+    elapsed, rtf = [], []
+    audio_seconds = 0.0
+    for _ in range(repeats):
+        start = time.perf_counter()
+        results = list(tts.iter_synthesize(segments))
+        seconds = time.perf_counter() - start
+        audio_seconds = sum(len(audio) for audio, _ in results if audio is not None) / SAMPLE_RATE
+        elapsed.append(seconds * 1000)
+        rtf.append(seconds / audio_seconds if audio_seconds else float("inf"))
+    return {
+        "elapsed_ms": distribution(elapsed),
+        "audio_seconds": round(audio_seconds, 2),
+        "rtf": distribution(rtf),
+    }
+
+
+def run_benchmark(batch_sizes: list[int], repeats: int = 3, text: str = DEFAULT_TEXT,
+                  threads: Optional[int] = None) -> dict:
+    """在各批大小下测量同一段文本的实时率"""
+    import torch
+    from src.audio.text_to_speech import KokoroTTS
+
+    if threads:
+        torch.set_num_threads(threads)
+    tts = KokoroTTS()
+    # 重复合成同一段文本，关闭音频缓存才能测到模型本身
+    tts.audio_cache = None
+    segments = tts._segments(text)
+    report = {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "torch": torch.__version__,
+            "device": tts.device,
+            "cpu_count": os.cpu_count(),
+            "torch_threads": torch.get_num_threads(),
+            "segments": len(segments),
+            "repeats": repeats,
+        },
+        "results": {},
+    }
+    for batch_size in batch_sizes:
+        tts.batch_size = batch_size
+        print(f"批大小 {batch_size}...")
+        report["results"][str(batch_size)] = measure(tts, segments, repeats)
+    return report
+
+
+def synthesize_segments(tts, segments: list[str], seed: int = 0) -> list:
+    """逐段合成，每段前固定随机种子，解码器中的噪声可以复现"""
+    import torch
+
+    audios = []
+    for segment in segments:
+        torch.manual_seed(seed)
+        audios.append(tts._synthesize(segment)[0])
+    return audios
+
+
+def compare_audio(reference: list, candidate: list) -> dict:
+    """逐段比较频谱相似度和时长"""
+    pairs = [(r, c) for r, c in zip(reference, candidate) if r is not None and c is not None]
+    scores = [audio_similarity(r, c) for r, c in pairs]
+    ratios = [len(c) / len(r) for r, c in pairs]
+    return {
+        "similarity_mean": round(sum(scores) / len(scores), 4) if scores else None,
+        "similarity_min": round(min(scores), 4) if scores else None,
+        "length_ratio": round(sum(ratios) / len(ratios), 4) if ratios else None,
+    }
+
+
+def run_batching_check(batch_size: int = 4, text: str = DEFAULT_TEXT, tolerance: float = 0.02) -> dict:
+    """比较批量合成与逐段合成的音质，确认可以启用 KOKORO_BATCH_SIZE
+
+    逐段合成用另一个随机种子再合成一次作为基线：解码器的随机噪声本身
+    就会造成这样的差异。批量合成的最低相似度不比基线低 tolerance 以上、
+    时长一致时才算通过。
+    """
+    import torch
+    from src.audio.text_to_speech import KokoroTTS
+
+    tts = KokoroTTS()
+    tts.audio_cache = None
+    segments = tts._segments(text)
+    reference = synthesize_segments(tts, segments)
+    baseline = compare_audio(reference, synthesize_segments(tts, segments, seed=1))
+    tts.batch_size = batch_size
+    torch.manual_seed(0)
+    batched = compare_audio(reference, [audio for audio, _ in tts.iter_synthesize(segments)])
+    passed = (batched["similarity_min"] is not None
+              and batched["similarity_min"] >= baseline["similarity_min"] - tolerance
+              and abs(batched["length_ratio"] - 1) < 0.01)
+    return {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "torch": torch.__version__,
+            "device": tts.device,
+            "segments": len(segments),
+            "batch_size": batch_size,
+            "tolerance": tolerance,
+        },
+        "batching": {"unbatched": baseline, "batched": batched, "passed": passed},
+    }
+
+
+def run_cpu_benchmark(repeats: int = 3, text: str = DEFAULT_TEXT, compile: str = "off",
+                      threads: Optional[int] = None) -> dict:
+    """比较 fp32 即时模式与 CPU 优化模式的实时率和音质
+
+    fp32 用另一个随机种子再合成一次，它与参考音频的相似度就是解码器随机
+    噪声本身造成的差异，优化模式的相似度应与之接近。两个模型在同一进程
+    中依次加载，inter-op 线程数只能在第一次并行计算前设置，优化模式下
+    可能沿用 fp32 时的值，报告中记录了实际线程数。
+    """
+    import torch
+    from dataclasses import replace
+    from src.audio.text_to_speech import KokoroTTS
+
+    if threads:
+        torch.set_num_threads(threads)
+    variants = {
+        "fp32": CPUOptimization(),
+        "optimized": replace(CPUOptimization.from_env(), enabled=True, compile=compile, threads=threads),
+    }
+    report = {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "torch": torch.__version__,
+            "cpu_count": os.cpu_count(),
+            "repeats": repeats,
+            "compile": compile,
+        },
+        "variants": {},
+    }
+    reference = None
+    for name, options in variants.items():
+        print(f"加载 {name} 模型...")
+        start = time.perf_counter()
+        tts = KokoroTTS(cpu_optimization=options)
+        init_seconds = time.perf_counter() - start
+        tts.audio_cache = None
+        segments = tts._segments(text)
+        result = measure(tts, segments, repeats)
+        result.update({
+            "init_s": round(init_seconds, 2),
+            "torch_threads": torch.get_num_threads(),
+            "interop_threads": torch.get_num_interop_threads(),
+        })
+        audios = synthesize_segments(tts, segments)
+        if reference is None:
+            reference = audios
+            result["quality"] = compare_audio(reference, synthesize_segments(tts, segments, seed=1))
+        else:
+            result["quality"] = compare_audio(reference, audios)
+        report["variants"][name] = result
+        del tts
+    return report
+
+
+def _legacy_encode(segments: list, sample_rate: int, silence: int) -> bytes:
+    """原先的后处理：拼接 float64 静音、两次求峰值、转换类型、经 BytesIO 写 WAV"""
+    import io
+    import numpy as np
+    import soundfile as sf
+
+    full_audio = []
+    for audio in segments:
+        full_audio.append(audio)
+        full_audio.append(np.zeros(silence))
+    audio = np.concatenate(full_audio)
+    if audio.dtype != np.float32:
+        audio = audio.astype(np.float32)
+    if np.abs(audio).max() > 1:
+        audio = audio / np.abs(audio).max()
+    audio_int16 = (audio * 32767).astype(np.int16)
+    buffer = io.BytesIO()
+    sf.write(buffer, audio_int16, sample_rate, format='WAV', subtype='PCM_16')
+    return buffer.getvalue()
+
+
+def run_encode_benchmark(segments: int = 8, seconds: float = 4.0, repeats: int = 20) -> dict:
+    """比较新旧后处理编码一段回复的耗时和分配的内存
+
+    用随机音频代替模型输出，不需要加载 Kokoro。峰值内存由 tracemalloc
+    统计，numpy 数组的分配也计算在内，包含输出的 bytes 本身。
+    """
+    import numpy as np
+
+    sample_rate, silence = 24000, int(24000 * 0.3)
+    rng = np.random.default_rng(0)
+    audio = [rng.uniform(-1.2, 1.2, int(sample_rate * seconds)).astype(np.float32) for _ in range(segments)]
+    encoders = {
+        "legacy": lambda: _legacy_encode(audio, sample_rate, silence),
+        "preallocated": lambda: encode_pcm16(audio, sample_rate, silence),
+    }
+    report = {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "segments": segments,
+            "audio_seconds": round(segments * (seconds + 0.3), 2),
+            "repeats": repeats,
+        },
+        "encode": {},
+    }
+    for name, encode in encoders.items():
+        output = encode()  # 预热
+        elapsed = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            encode()
+            elapsed.append((time.perf_counter() - start) * 1000)
+        tracemalloc.start()
+        encode()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        report["encode"][name] = {
+            "elapsed_ms": distribution(elapsed),
+            "peak_alloc_mb": round(peak / (1 << 20), 2),
+            "output_mb": round(len(output) / (1 << 20), 2),
+        }
+    return report
+
+
+# 在独立进程中初始化 KokoroTTS，峰值内存只包含本次加载
+_STARTUP_SCRIPT = """
+import json, time
+start = time.perf_counter()
+from src.audio.text_to_speech import KokoroTTS, peak_rss_mb
+tts = KokoroTTS()
+print("STARTUP " + json.dumps({
+    "total_s": round(time.perf_counter() - start, 2),
+    "model_s": round(tts.load_seconds or 0, 2),
+    "peak_rss_mb": round(peak_rss_mb() or 0, 1),
+}))
+"""
+
+
+def measure_startup(mmap: bool) -> dict:
+    """测量一次冷启动的耗时和峰值内存"""
+    env = dict(os.environ, KOKORO_MMAP="true" if mmap else "false")
+    output = subprocess.run([sys.executable, "-c", _STARTUP_SCRIPT], cwd=root_dir, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    line = next(line for line in output.splitlines() if line.startswith("STARTUP "))
+    return json.loads(line[len("STARTUP "):])
+
+
+def run_startup_benchmark() -> dict:
+    """比较内存映射与完整读取两种加载方式"""
+    report = {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+        },
+        "startup": {},
+    }
+    for name, mmap in (("full", False), ("mmap", True)):
+        print(f"加载方式 {name}...")
+        report["startup"][name] = measure_startup(mmap)
+    return report
+
+
+def print_report(report: dict):
+    if "startup" in report:
+        print(f"\nKokoro 启动 (commit {report['meta'].get('commit')}):")
+        for name, r in report["startup"].items():
+            print(f"  {name}: 模型加载 {r['model_s']} s, 总计 {r['total_s']} s, 峰值内存 {r['peak_rss_mb']} MB")
+        return
+
+    if "encode" in report:
+        meta = report["meta"]
+        print(f"\n回复编码 (commit {meta.get('commit')}, {meta['segments']} 段, 共 {meta['audio_seconds']} s):")
+        for name, r in report["encode"].items():
+            print(f"  {name}: 耗时 p50 {r['elapsed_ms']['p50']} ms, 峰值分配 {r['peak_alloc_mb']} MB, "
+                  f"输出 {r['output_mb']} MB")
+        return
+
+    if "batching" in report:
+        meta, r = report["meta"], report["batching"]
+        print(f"\n批量合成音质 (commit {meta.get('commit')}, 批大小 {meta['batch_size']}, {meta['segments']} 段):")
+        for name in ("unbatched", "batched"):
+            q = r[name]
+            print(f"  {name}: 频谱相似度 均值 {q['similarity_mean']} 最低 {q['similarity_min']}, 时长比 {q['length_ratio']}")
+        print(f"  {'通过，可以启用 KOKORO_BATCH_SIZE' if r['passed'] else '未通过，保持 KOKORO_BATCH_SIZE=1'}")
+        return
+
+    if "variants" in report:
+        print(f"\nKokoro CPU 优化 (commit {report['meta'].get('commit')}, 编译 {report['meta']['compile']}):")
+        for name, r in report["variants"].items():
+            q = r["quality"]
+            print(f"  {name}: RTF p50 {r['rtf']['p50']}, 初始化 {r['init_s']} s, "
+                  f"{r['torch_threads']}/{r['interop_threads']} 线程, "
+                  f"频谱相似度 均值 {q['similarity_mean']} 最低 {q['similarity_min']}, 时长比 {q['length_ratio']}")
+        return
+
+    meta = report["meta"]
+    print(f"\nKokoro 实时率 (commit {meta.get('commit')}, {meta['device']}, "
+          f"{meta['torch_threads']} 线程, {meta['segments']} 段):")
+    for batch_size, r in report["results"].items():
+        print(f"  批大小 {batch_size}: RTF p50 {r['rtf']['p50']}, 耗时 p50 {r['elapsed_ms']['p50']} ms, "
+              f"音频 {r['audio_seconds']} s")
+
+
+def main(argv: Optional[list[str]] = None):
+    parser = argparse.ArgumentParser(description="Kokoro TTS 实时率基准测试")
+    parser.add_argument("--batch-sizes", nargs="+", type=int, default=[1, 2, 4, 8])
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--threads", type=int, help="torch 线程数，默认由 torch 决定")
+    parser.add_argument("--startup", action="store_true", help="测量模型加载耗时和峰值内存")
+    parser.add_argument("--cpu-optimize", action="store_true", help="比较 fp32 与 CPU 优化模式的实时率和音质")
+    parser.add_argument("--compile", choices=["off", "compile", "trace"], default="off",
+                        help="CPU 优化模式下的编译方式")
+    parser.add_argument("--check-batching", action="store_true",
+                        help="比较批量合成与逐段合成的音质，第一个 --batch-sizes 作为批大小")
+    parser.add_argument("--encode", action="store_true", help="比较新旧后处理编码一段回复的耗时和内存分配")
+    parser.add_argument("--output", help="结果 JSON 文件路径")
+    args = parser.parse_args(argv)
+
+    if args.check_batching:
+        report = run_batching_check(max(args.batch_sizes[0], 2))
+    elif args.encode:
+        report = run_encode_benchmark()
+    elif args.startup:
+        report = run_startup_benchmark()
+    elif args.cpu_optimize:
+        report = run_cpu_benchmark(args.repeats, compile=args.compile, threads=args.threads)
+    else:
+        report = run_benchmark(args.batch_sizes, args.repeats, threads=args.threads)
+    print_report(report)
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"\n结果已保存到 {args.output}")
+
+
+if __name__ == "__main__":
+    main()
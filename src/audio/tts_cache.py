@@ -0,0 +1,187 @@
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Optional
+
+import numpy as np
+
+
+class PhonemeCache:
+    """文本到音素的 LRU 缓存"""
+
+    def __init__(self, max_entries: int = 2048):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[tuple, str] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_or_compute(self, text: str, lang: str, phonemize: Callable[[str, str], str]) -> str:
+        key = (lang, text)
+        with self._lock:
+            phonemes = self._entries.get(key)
+            if phonemes is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return phonemes
+            self.misses += 1
+        # 音素化较慢，不在锁内执行；并发的相同文本最多重复计算一次
+        phonemes = phonemize(text, lang)
+        with self._lock:
+            self._entries[key] = phonemes
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return phonemes
+
+
+def audio_key(phonemes: str, voice: str, speed: float) -> str:
+    """按内容寻址的缓存键，相同的音素、声音和语速得到相同的音频"""
+    return hashlib.sha256(f"{voice}\0{speed:.3f}\0{phonemes}".encode("utf-8")).hexdigest()
+
+
+class AudioCache:
+    """按 (音素, 声音, 语速) 缓存合成结果，命中时无需运行模型
+
+    内存层按 LRU 淘汰，总大小不超过 max_bytes；提供 disk_dir 时，
+    写入内存的音频同时保存为 .npy 文件，内存未命中时从磁盘读取，
+    磁盘层总大小超过 max_disk_bytes 时删除最久未写入的文件。
+    缓存的数组是只读的，调用方需要修改时先复制。
+    """
+
+    def __init__(self, max_bytes: int = 64 << 20, disk_dir: Optional[str] = None,
+                 max_disk_bytes: int = 512 << 20):
+        self.max_bytes = max_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self._entries: OrderedDict[str, np.ndarray] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        self._disk: OrderedDict[str, int] = OrderedDict()  # key -> 文件大小，按写入时间排序
+        self._disk_bytes = 0
+        if self.disk_dir:
+            self.disk_dir.mkdir(parents=True, exist_ok=True)
+            files = sorted(self.disk_dir.glob("*.npy"), key=lambda p: p.stat().st_mtime)
+            for path in files:
+                size = path.stat().st_size
+                self._disk[path.stem] = size
+                self._disk_bytes += size
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def nbytes(self) -> int:
+        return self._bytes
+
+    def get(self, phonemes: str, voice: str, speed: float) -> Optional[np.ndarray]:
+        key = audio_key(phonemes, voice, speed)
+        with self._lock:
+            audio = self._entries.get(key)
+            if audio is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return audio
+            on_disk = key in self._disk
+        if on_disk:
+            audio = self._read(key)
+            if audio is not None:
+                with self._lock:
+                    self.disk_hits += 1
+                    self._store(key, audio)
+                return audio
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, phonemes: str, voice: str, speed: float, audio: np.ndarray):
+        key = audio_key(phonemes, voice, speed)
+        audio = np.array(audio, dtype=np.float32)
+        audio.setflags(write=False)
+        with self._lock:
+            self._store(key, audio)
+            write_disk = self.disk_dir is not None and key not in self._disk
+        if write_disk:
+            self._write(key, audio)
+
+    def _store(self, key: str, audio: np.ndarray):
+        if audio.nbytes > self.max_bytes:
+            return
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= old.nbytes
+        self._entries[key] = audio
+        self._bytes += audio.nbytes
+        while self._bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted.nbytes
+
+    def _read(self, key: str) -> Optional[np.ndarray]:
+        try:
+            audio = np.load(self.disk_dir / f"{key}.npy")
+        except (OSError, ValueError):
+            with self._lock:
+                self._disk_bytes -= self._disk.pop(key, 0)
+            return None
+        audio.setflags(write=False)
+        return audio
+
+    def _write(self, key: str, audio: np.ndarray):
+        path = self.disk_dir / f"{key}.npy"
+        tmp = path.with_name(f"{key}.{threading.get_ident()}.tmp")
+        try:
+            with open(tmp, "wb") as f:
+                np.save(f, audio)
+            os.replace(tmp, path)
+        except OSError as e:
+            print(f"写入音频缓存失败: {str(e)}")
+            tmp.unlink(missing_ok=True)
+            return
+        with self._lock:
+            size = path.stat().st_size
+            self._disk_bytes += size - self._disk.pop(key, 0)
+            self._disk[key] = size
+            while self._disk_bytes > self.max_disk_bytes and len(self._disk) > 1:
+                old_key, old_size = self._disk.popitem(last=False)
+                self._disk_bytes -= old_size
+                (self.disk_dir / f"{old_key}.npy").unlink(missing_ok=True)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+
+# 进程内共享，所有 KokoroTTS 实例使用同一组缓存
+_phoneme_cache: Optional[PhonemeCache] = None
+_audio_cache: Optional[AudioCache] = None
+
+
+def get_phoneme_cache() -> PhonemeCache:
+    global _phoneme_cache
+    if _phoneme_cache is None:
+        _phoneme_cache = PhonemeCache(int(os.getenv("KOKORO_PHONEME_CACHE_SIZE", "2048")))
+    return _phoneme_cache
+
+
+def get_audio_cache() -> Optional[AudioCache]:
+    """按环境变量创建共享的音频缓存，KOKORO_AUDIO_CACHE_MB=0 时不缓存"""
+    global _audio_cache
+    if _audio_cache is None:
+        max_mb = float(os.getenv("KOKORO_AUDIO_CACHE_MB", "64"))
+        if max_mb <= 0:
+            return None
+        _audio_cache = AudioCache(
+            max_bytes=int(max_mb * (1 << 20)),
+            disk_dir=os.getenv("KOKORO_AUDIO_CACHE_DIR") or None,
+            max_disk_bytes=int(float(os.getenv("KOKORO_AUDIO_CACHE_DISK_MB", "512")) * (1 << 20)),
+        )
+    return _audio_cache
@@ -0,0 +1,157 @@
+import os
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+
+# torch.compile 编译的子模块，kokoro.forward 直接调用它们的 forward
+COMPILE_MODULES = ("bert", "bert_encoder", "text_encoder", "decoder")
+# TorchScript 追踪的子模块：解码器占大部分计算，输入全是张量
+TRACE_MODULES = ("decoder",)
+
+
+@dataclass
+class CPUOptimization:
+    """CPU 推理优化选项
+
+    enabled 为 False 时按原样以 fp32 即时模式推理。threads / interop_threads
+    为空时 intra-op 沿用 torch 的默认值（物理核数），inter-op 设为 1：Kokoro
+    的前向是顺序执行的，多余的 inter-op 线程只会争抢核心。compile 可选
+    "off"、"compile"（torch.compile）或 "trace"（TorchScript 追踪解码器）。
+    """
+    enabled: bool = False
+    threads: Optional[int] = None
+    interop_threads: Optional[int] = None
+    quantize: bool = True
+    compile: str = "off"
+    warmup: int = 2
+
+    @classmethod
+    def from_env(cls) -> "CPUOptimization":
+        def optional_int(name):
+            value = os.getenv(name)
+            return int(value) if value else None
+
+        options = cls(
+            enabled=os.getenv("KOKORO_CPU_OPTIMIZE", "false").lower() == "true",
+            threads=optional_int("KOKORO_THREADS"),
+            interop_threads=optional_int("KOKORO_INTEROP_THREADS"),
+            quantize=os.getenv("KOKORO_QUANTIZE", "true").lower() != "false",
+            compile=os.getenv("KOKORO_COMPILE", "off").lower(),
+            warmup=int(os.getenv("KOKORO_WARMUP", "2")),
+        )
+        if options.compile not in ("off", "compile", "trace"):
+            raise ValueError(f"不支持的编译方式: {options.compile}")
+        return options
+
+
+def configure_threads(threads: Optional[int] = None, interop_threads: Optional[int] = None):
+    """设置 torch 的 intra-op / inter-op 线程数
+
+    inter-op 线程数只能在进程第一次并行计算前设置，之后设置会失败，
+    此时保留原值。
+    """
+    import torch
+
+    if threads:
+        torch.set_num_threads(threads)
+    try:
+        torch.set_num_interop_threads(interop_threads or 1)
+    except RuntimeError as e:
+        print(f"无法设置 inter-op 线程数，保留 {torch.get_num_interop_threads()}: {str(e)}")
+    print(f"torch 线程: intra-op {torch.get_num_threads()}, inter-op {torch.get_num_interop_threads()}")
+
+
+def quantize_dynamic(model):
+    """把 Linear 和 LSTM 的权重动态量化为 int8，激活仍为浮点
+
+    返回量化后的副本，原模型不变，调用方丢弃原模型即释放 fp32 权重。
+    """
+    import torch
+    from torch import nn
+
+    quantize = getattr(torch.ao.quantization, "quantize_dynamic", None) or torch.quantization.quantize_dynamic
+    return quantize(model, {nn.Linear, nn.LSTM}, dtype=torch.qint8)
+
+
+def compile_modules(model, names=COMPILE_MODULES):
+    """用 torch.compile 包装子模块，首次调用时编译，输入长度按动态形状处理"""
+    import torch
+
+    for name in names:
+        if name in model:
+            model[name] = torch.compile(model[name], dynamic=True)
+
+
+def uncompile_modules(model):
+    """撤销 compile_modules，编译失败时恢复即时模式"""
+    for name in list(model.keys()):
+        original = getattr(model[name], "_orig_mod", None)
+        if original is not None:
+            model[name] = original
+
+
+@contextmanager
+def capture_inputs(model, names=TRACE_MODULES):
+    """记录子模块每次被调用时的位置参数，用作追踪的示例输入"""
+    captured = {name: [] for name in names if name in model}
+    handles = [
+        model[name].register_forward_pre_hook(lambda _, args, name=name: captured[name].append(args))
+        for name in captured
+    ]
+    try:
+        yield captured
+    finally:
+        for handle in handles:
+            handle.remove()
+
+
+def trace_modules(model, examples: dict):
+    """用第一组示例输入追踪子模块，并用其余输入检查
+
+    追踪会把部分 Python 整数固化为常量，换一个长度的输入时结果形状与
+    即时模式不同或直接报错的子模块保持不变。
+    """
+    import torch
+
+    for name, inputs in examples.items():
+        if not inputs:
+            continue
+        module = model[name]
+        try:
+            traced = torch.jit.trace(module, inputs[0], check_trace=False)
+            for args in inputs[1:]:
+                if traced(*args).shape != module(*args).shape:
+                    raise RuntimeError("不同长度的输入输出形状不一致")
+        except Exception as e:
+            print(f"追踪 {name} 失败，保持即时模式: {str(e)}")
+            continue
+        model[name] = traced
+        print(f"已追踪 {name}")
+
+
+def audio_similarity(reference: np.ndarray, candidate: np.ndarray, n_fft: int = 1024, hop: int = 256) -> float:
+    """两段音频对数幅度谱的相关系数，1 表示频谱完全一致
+
+    比较频谱而不是波形：量化和 Kokoro 解码器中的随机噪声都会改变相位，
+    听感却几乎相同。低于参考音频峰值 60 dB 的部分统一截为底噪；
+    长度不同时截断到较短的一段。
+    """
+    def spectrum(audio):
+        audio = np.asarray(audio, dtype=np.float32).reshape(-1)
+        if len(audio) < n_fft:
+            audio = np.pad(audio, (0, n_fft - len(audio)))
+        frames = np.lib.stride_tricks.sliding_window_view(audio, n_fft)[::hop]
+        return np.log10(np.abs(np.fft.rfft(frames * np.hanning(n_fft), axis=-1)) + 1e-4)
+
+    a, b = spectrum(reference), spectrum(candidate)
+    floor = a.max() - 3
+    a, b = np.maximum(a, floor), np.maximum(b, floor)
+    frames = min(len(a), len(b))
+    a = a[:frames].ravel() - a[:frames].mean()
+    b = b[:frames].ravel() - b[:frames].mean()
+    denom = np.linalg.norm(a) * np.linalg.norm(b)
+    if denom == 0:
+        return 1.0 if np.array_equal(a, b) else 0.0
+    return float(a @ b / denom)
@@ -0,0 +1,113 @@
+import os
+import queue
+import threading
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional, Tuple
+
+
+class TTSPool:
+    """进程内共享的 TTS 模型副本池
+
+    启动时创建 size 个副本，之后所有连接共用，新连接无需加载模型，
+    内存不随连接数增长。每次合成时取出一个空闲副本，用完放回；副本
+    都在使用中时等待，size 为 1 即所有合成串行执行。
+
+    同时交给一个副本的分段越多，批量推理越有效，但其他连接等待副本的
+    时间也越长。流式合成第一段单独合成以尽快开始播放，之后每次取用
+    副本合成一批（副本的 batch_size 段），批与批之间放回副本，产出音频
+    期间不占用。
+    """
+
+    def __init__(self, factory: Callable[[], object], size: int = 1):
+        if size < 1:
+            raise ValueError("TTS 副本数至少为 1")
+        self.size = size
+        self._idle: queue.Queue = queue.Queue()
+        replicas = []
+        for i in range(size):
+            print(f"加载 TTS 模型副本 {i + 1}/{size}")
+            replicas.append(factory())
+        for tts in replicas:
+            self._idle.put(tts)
+        # 每次取用副本最多合成的分段数，与副本的批大小一致
+        self.batch_size = max(1, getattr(replicas[0], "batch_size", 1))
+        # 所有副本共享的声音注册表
+        self.voices = getattr(replicas[0], "voices", None)
+        self.busy = 0
+        self.waits = 0  # 需要等待空闲副本的次数
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def acquire(self, timeout: Optional[float] = None):
+        """取出一个空闲副本，超时抛出 queue.Empty"""
+        try:
+            tts = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                self.waits += 1
+            tts = self._idle.get(timeout=timeout)
+        with self._lock:
+            self.busy += 1
+        try:
+            yield tts
+        finally:
+            with self._lock:
+                self.busy -= 1
+            self._idle.put(tts)
+
+    def speak(self, text: str, voice: Optional[str] = None) -> Tuple[bytes, str]:
+        with self.acquire() as tts:
+            return tts.speak(text, voice=voice)
+
+    def _segments(self, text: str) -> list[str]:
+        if not text or not text.strip():
+            return []
+        with self.acquire() as tts:
+            return tts._segments(text)
+
+    def speak_stream(self, text: str, format: str = "wav", voice: Optional[str] = None) -> Iterator[bytes]:
+        """与 KokoroTTS.speak_stream 相同，每批合成时才占用副本"""
+        segments = self._segments(text)
+        groups = [segments[:1]] + [segments[i:i + self.batch_size] for i in range(1, len(segments), self.batch_size)]
+        for group in groups:
+            if not group:
+                continue
+            with self.acquire() as tts:
+                chunks = [chunk for chunk in tts.encode_segments(group, format, voice=voice) if chunk is not None]
+            yield from chunks
+
+    def speak_batch(self, texts: list[str], format: str = "wav", voice: Optional[str] = None) -> list[list[bytes]]:
+        """多段文本的全部分段交给同一个副本批量合成，按文本分别返回音频
+
+        用于合并同一连接排队的多个句子：逐句合成时每次只有一两个分段，
+        批量推理无从发挥。
+        """
+        owners, segments = [], []
+        for i, text in enumerate(texts):
+            for segment in self._segments(text):
+                owners.append(i)
+                segments.append(segment)
+        results: list[list[bytes]] = [[] for _ in texts]
+        if segments:
+            with self.acquire() as tts:
+                for owner, chunk in zip(owners, tts.encode_segments(segments, format, voice=voice)):
+                    if chunk is not None:
+                        results[owner].append(chunk)
+        return results
+
+
+_pool: Optional[TTSPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_tts_pool(size: Optional[int] = None) -> TTSPool:
+    """获取共享的 Kokoro 副本池，首次调用时加载模型
+
+    副本数默认取 KOKORO_REPLICAS（默认 1）。
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            from src.audio.text_to_speech import KokoroTTS
+            _pool = TTSPool(KokoroTTS, size or int(os.getenv("KOKORO_REPLICAS", "1")))
+        return _pool
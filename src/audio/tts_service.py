@@ -0,0 +1,246 @@
+import os
+import time
+import asyncio
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from functools import partial
+from typing import Awaitable, Callable, Optional
+
+from src.audio.tts_pool import TTSPool, get_tts_pool
+
+
+@dataclass
+class _Job:
+    text: str
+    voice: Optional[str]
+    format: str
+    future: asyncio.Future
+    queued_at: float = field(default_factory=time.perf_counter)
+
+
+@dataclass
+class _Slots:
+    """一个会话的排队名额，在提交时的事件循环中创建"""
+    semaphore: asyncio.Semaphore
+    loop: asyncio.AbstractEventLoop
+    outstanding: int = 0  # 等待名额和未完成的请求数，归零时删除
+
+
+class TTSService:
+    """在线程池中合成语音的异步服务
+
+    合成在 workers 个线程中执行（默认与模型副本数相同），事件循环在合成
+    期间继续处理其他连接和聊天流。每个会话最多 max_pending 个未完成的
+    请求，排满时 submit 等待，形成反压；各会话的请求轮流调度，一个会话
+    排队的长回复不会让其他会话一直等待。轮到一个会话时，它排队的、声音
+    和格式相同的请求最多合并 batch_size 个交给同一个副本批量合成：合成
+    跟不上聊天流时句子会排队，此时批量推理的吞吐更高。
+    """
+
+    def __init__(self, pool: TTSPool, max_pending: int = 4, workers: Optional[int] = None,
+                 batch_size: Optional[int] = None):
+        self.pool = pool
+        self.workers = workers or pool.size
+        self.batch_size = batch_size or pool.batch_size
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix="tts")
+        self._queues: OrderedDict[str, deque[_Job]] = OrderedDict()
+        self._slots: dict[str, _Slots] = {}
+        self._running = 0
+        self.completed = 0
+        self.max_wait_ms = 0.0  # 请求排队等待的最长时间
+
+    @property
+    def pending(self) -> int:
+        return sum(len(jobs) for jobs in self._queues.values())
+
+    async def submit(self, session_id: str, text: str, voice: Optional[str] = None,
+                     format: str = "wav") -> asyncio.Future:
+        """排队合成一段文本，返回结果为音频分段列表的 future
+
+        会话未完成的请求已有 max_pending 个时等待。取消返回的 future
+        即放弃该请求，已开始的合成仍会完成，但结果被丢弃。
+        """
+        loop = asyncio.get_running_loop()
+        slots = self._slots.get(session_id)
+        if slots is None or slots.loop is not loop:
+            slots = self._slots[session_id] = _Slots(asyncio.Semaphore(self.max_pending), loop)
+        slots.outstanding += 1
+        try:
+            await slots.semaphore.acquire()
+        except BaseException:
+            self._forget(session_id, slots)
+            raise
+        future = loop.create_future()
+        future.add_done_callback(lambda _: self._release(session_id, slots))
+        self._queues.setdefault(session_id, deque()).append(_Job(text, voice, format, future))
+        self._dispatch()
+        return future
+
+    def _release(self, session_id: str, slots: _Slots):
+        slots.semaphore.release()
+        self._forget(session_id, slots)
+
+    def _forget(self, session_id: str, slots: _Slots):
+        # 会话没有未完成的请求时删除名额，匿名连接每次都是新的会话 id
+        slots.outstanding -= 1
+        if slots.outstanding == 0 and self._slots.get(session_id) is slots:
+            del self._slots[session_id]
+
+    def has_voice(self, voice: Optional[str]) -> bool:
+        """声音名或混合表达式是否可用，为空表示默认声音"""
+        return not voice or self.pool.voices is None or voice in self.pool.voices
+
+    async def speak(self, session_id: str, text: str, voice: Optional[str] = None,
+                    format: str = "wav") -> list[bytes]:
+        return await (await self.submit(session_id, text, voice, format))
+
+    def _dispatch(self):
+        while self._running < self.workers and self._queues:
+            # 轮流从各会话取请求，同一会话连续排队的请求合并为一批
+            session_id, jobs = next(iter(self._queues.items()))
+            batch: list[_Job] = []
+            while jobs and len(batch) < self.batch_size:
+                job = jobs[0]
+                if job.future.done():
+                    jobs.popleft()  # 已被取消
+                    continue
+                if batch and (job.voice, job.format) != (batch[0].voice, batch[0].format):
+                    break
+                batch.append(jobs.popleft())
+            if jobs:
+                self._queues.move_to_end(session_id)
+            else:
+                del self._queues[session_id]
+            if not batch:
+                continue
+            now = time.perf_counter()
+            self.max_wait_ms = max(self.max_wait_ms, *((now - job.queued_at) * 1000 for job in batch))
+            self._running += 1
+            task = batch[0].future.get_loop().run_in_executor(self._executor, self._run, batch)
+            task.add_done_callback(partial(self._finished, batch))
+
+    def _run(self, batch: list[_Job]) -> list[list[bytes]]:
+        first = batch[0]
+        return self.pool.speak_batch([job.text for job in batch], first.format, voice=first.voice)
+
+    def _finished(self, batch: list[_Job], task: asyncio.Future):
+        self._running -= 1
+        self.completed += len(batch)
+        for i, job in enumerate(batch):
+            if job.future.done():
+                continue
+            if task.cancelled():
+                job.future.cancel()
+            elif task.exception() is not None:
+                job.future.set_exception(task.exception())
+            else:
+                job.future.set_result(task.result()[i])
+        self._dispatch()
+
+    def cancel_session(self, session_id: str):
+        """取消会话所有排队中的请求，如用户中断或断开连接时
+
+        正在合成的请求完成后，会话的名额随之删除。
+        """
+        for job in self._queues.pop(session_id, ()):
+            job.future.cancel()
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+class ReplyAudio:
+    """一次回复的语音：句子按顺序提交合成，完成后依次交给 send
+
+    作为异步上下文管理器使用。正常退出时等待已提交的语音发送完；因取消
+    或异常退出时立即放弃尚未发送的语音，不再等待合成，用户打断或开始
+    下一句话时不会继续收到旧回复的声音。
+    """
+
+    def __init__(self, service: TTSService, session_id: str, send: Callable[[bytes], Awaitable]):
+        self.service = service
+        self.session_id = session_id
+        self.send = send
+        self.cancelled = False
+        self._jobs: asyncio.Queue = asyncio.Queue()
+        self._sender: Optional[asyncio.Task] = None
+
+    async def __aenter__(self):
+        self._sender = asyncio.create_task(self._send_all())
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if exc_type is None and not self.cancelled:
+            await self.finish()
+        else:
+            self.cancel()
+
+    async def add(self, sentence: str, voice: Optional[str] = None):
+        """提交一句话，本会话排队的合成过多时等待"""
+        if self.cancelled:
+            return
+        job = await self.service.submit(self.session_id, sentence, voice=voice)
+        if self.cancelled:
+            job.cancel()
+        else:
+            self._jobs.put_nowait(job)
+
+    async def finish(self):
+        """等待已提交的语音全部发送"""
+        self._jobs.put_nowait(None)
+        try:
+            await self._sender
+        except asyncio.CancelledError:
+            self.cancel()
+            raise
+
+    def cancel(self):
+        """放弃尚未发送的语音，不等待正在进行的合成"""
+        self.cancelled = True
+        if self._sender is not None:
+            self._sender.cancel()
+        self.service.cancel_session(self.session_id)
+        while not self._jobs.empty():
+            job = self._jobs.get_nowait()
+            if job is not None:
+                job.cancel()
+
+    async def _send_all(self):
+        while (job := await self._jobs.get()) is not None:
+            try:
+                # shield：发送任务被取消时不把合成请求当作已取消而继续循环
+                chunks = await asyncio.shield(job)
+            except asyncio.CancelledError:
+                if self.cancelled or not job.cancelled():
+                    raise
+                continue
+            except Exception as e:
+                print(f"TTS error: {e}")
+                continue
+            for chunk in chunks:
+                await self.send(chunk)
+
+
+_service: Optional[TTSService] = None
+_service_lock = threading.Lock()
+
+
+def get_tts_service() -> TTSService:
+    """获取共享的 TTS 服务，首次调用时加载模型副本
+
+    每个会话最多排队 KOKORO_MAX_PENDING 个请求（默认 4）。多个线程同时
+    推理时按线程数平分 CPU 核心，避免 torch 的 intra-op 线程相互争抢；
+    设置了 KOKORO_THREADS 时以它为准。
+    """
+    global _service
+    with _service_lock:
+        if _service is None:
+            pool = get_tts_pool()
+            if not os.getenv("KOKORO_THREADS"):
+                import torch
+                torch.set_num_threads(max(1, (os.cpu_count() or 1) // pool.size))
+            _service = TTSService(pool, max_pending=int(os.getenv("KOKORO_MAX_PENDING", "4")))
+        return _service
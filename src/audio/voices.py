@@ -0,0 +1,89 @@
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable
+
+
+class VoiceRegistry:
+    """预加载的声音包，所有 TTS 实例共享
+
+    创建时一次性加载 voice_dir 下所有 .pt 声音包，之后按名字取用无需
+    读盘。声音可以按权重混合，如 "af_bella:0.7+af_sarah:0.3"，未写权重
+    时等权平均；混合结果缓存 max_mixes 个。
+    """
+
+    def __init__(self, voice_dir: Path, loader: Callable[[Path], object], max_mixes: int = 32):
+        self.voice_dir = Path(voice_dir)
+        self.max_mixes = max_mixes
+        self._voices = {path.stem: loader(path) for path in sorted(self.voice_dir.glob("*.pt"))}
+        self._mixes: OrderedDict[str, object] = OrderedDict()
+        self._lock = threading.Lock()
+        print(f"已预加载 {len(self._voices)} 个声音: {', '.join(self._voices)}")
+
+    @property
+    def names(self) -> list[str]:
+        return list(self._voices)
+
+    def __contains__(self, spec: str) -> bool:
+        try:
+            self._parse(spec)
+        except (FileNotFoundError, ValueError):
+            return False
+        return True
+
+    def _pack(self, name: str):
+        pack = self._voices.get(name)
+        if pack is None:
+            raise FileNotFoundError(f"声音文件不存在: {self.voice_dir / f'{name}.pt'}")
+        return pack
+
+    @staticmethod
+    def normalize(spec: str) -> str:
+        return "".join(spec.split())
+
+    def _parse(self, spec: str) -> list[tuple[str, float]]:
+        parts = []
+        for part in self.normalize(spec).split("+"):
+            name, _, weight = part.partition(":")
+            self._pack(name)
+            try:
+                value = float(weight) if weight else 1.0
+            except ValueError:
+                raise ValueError(f"无效的声音权重: {part}")
+            if value <= 0:
+                raise ValueError(f"无效的声音权重: {part}")
+            parts.append((name, value))
+        return parts
+
+    def get(self, spec: str):
+        """按名字或混合表达式返回声音包"""
+        spec = self.normalize(spec)
+        if spec in self._voices:
+            return self._voices[spec]
+        with self._lock:
+            pack = self._mixes.get(spec)
+            if pack is not None:
+                self._mixes.move_to_end(spec)
+                return pack
+        parts = self._parse(spec)
+        total = sum(weight for _, weight in parts)
+        pack = sum(self._voices[name] * (weight / total) for name, weight in parts)
+        with self._lock:
+            self._mixes[spec] = pack
+            while len(self._mixes) > self.max_mixes:
+                self._mixes.popitem(last=False)
+        return pack
+
+
+_registries: dict[tuple, VoiceRegistry] = {}
+_registries_lock = threading.Lock()
+
+
+def get_voice_registry(voice_dir: Path, device: str, loader: Callable[[Path], object]) -> VoiceRegistry:
+    """获取指定目录和设备的共享声音注册表，首次调用时加载全部声音"""
+    key = (str(voice_dir), device)
+    with _registries_lock:
+        registry = _registries.get(key)
+        if registry is None:
+            registry = _registries[key] = VoiceRegistry(voice_dir, loader)
+        return registry
@@ -0,0 +1,57 @@
+import struct
+from typing import Optional, Sequence
+
+import numpy as np
+
+WAV_HEADER_SIZE = 44
+
+
+def wav_header(num_samples: int, sample_rate: int, channels: int = 1) -> bytes:
+    """16 位 PCM WAV 文件的 44 字节 RIFF 头"""
+    data_size = num_samples * channels * 2
+    return struct.pack(
+        "<4sI4s4sIHHIIHH4sI",
+        b"RIFF", 36 + data_size, b"WAVE",
+        b"fmt ", 16, 1, channels, sample_rate, sample_rate * channels * 2, channels * 2, 16,
+        b"data", data_size,
+    )
+
+
+def peak(segments: Sequence[Optional[np.ndarray]]) -> float:
+    """所有分段的绝对值峰值，用 max/min 归约，不分配与音频等长的临时数组"""
+    value = 0.0
+    for audio in segments:
+        if audio is not None and len(audio):
+            value = max(value, float(audio.max()), -float(audio.min()))
+    return value
+
+
+def encode_pcm16(segments: Sequence[Optional[np.ndarray]], sample_rate: int, silence: int = 0,
+                 format: str = "wav") -> bytes:
+    """把若干段 float 音频编码为 16 位 PCM，每段之后跟 silence 个采样的静音
+
+    输出缓冲区一次分配：WAV 头直接写在开头，各分段缩放后直接写入对应位置，
+    静音保持缓冲区的初始零值，不再拼接、转换类型或经过 BytesIO，只在最后
+    生成 bytes 时复制一次。峰值超过 1 时按所有分段的共同峰值归一化。为
+    None 的分段只写入静音。format 为 "wav" 时输出完整的 WAV 文件，"pcm"
+    时输出裸 PCM。
+    """
+    if format not in ("wav", "pcm"):
+        raise ValueError(f"不支持的音频格式: {format}")
+    samples = sum(len(audio) for audio in segments if audio is not None) + silence * len(segments)
+    offset = WAV_HEADER_SIZE if format == "wav" else 0
+    buffer = bytearray(offset + samples * 2)
+    if format == "wav":
+        buffer[:offset] = wav_header(samples, sample_rate)
+    out = np.frombuffer(buffer, dtype="<i2", offset=offset)
+
+    top = peak(segments)
+    scale = 32767 / top if top > 1 else 32767
+    position = 0
+    for audio in segments:
+        if audio is not None and len(audio):
+            # 与 astype(np.int16) 相同，向零截断
+            np.multiply(audio, scale, out=out[position:position + len(audio)], casting="unsafe")
+            position += len(audio)
+        position += silence
+    return bytes(buffer)
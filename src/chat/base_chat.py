@@ -1,39 +1,266 @@
 from abc import ABC, abstractmethod
-from typing import AsyncGenerator, Optional
+from typing import AsyncGenerator, Callable, Optional
+import asyncio
 import logging
+import os
+
+import httpx
+
+from src.chat.history import ConversationHistory
+from src.chat.response_cache import get_response_cache, replay
+from src.chat.stream_client import CancelStats, StreamError, StreamRequest, StreamResult, stream_events
 
 logger = logging.getLogger(__name__)
 
+# 读取任务放入队列的结束标记
+_END = object()
+_STOPPED = object()
+
+
 class BaseChat(ABC):
-    """聊天基类，定义统一接口"""
-    
+    """聊天基类，定义统一接口
+
+    子类只需提供 _build_request 和 _parse_event，请求发送、流解析、
+    延迟统计与对话历史记录都由基类的 stream_chat 完成。对话历史按
+    CHAT_HISTORY_MAX_TOKENS 限制 token 数，超出的部分在后台压缩为摘要。
+    CHAT_RESPONSE_CACHE=true 时，首轮问题会先查进程内共享的回复缓存。
+
+    HTTP 流在独立的读取任务中接收，stop_streaming 会取消该任务并立即
+    关闭上游连接；调用方任务被取消时 CancelledError 照常向上传递。
+
+    stream_chat 传入 defer 列表时，完整的一轮不立即写入历史和回复缓存，
+    而是把记录函数追加到 defer 中，由调用方决定是否采用（如预取）。
+    """
+
+    # 系统提示，None 表示不发送
+    system_prompt: Optional[dict] = None
+    # 每次请求携带的历史消息条数，None 表示按 token 预算携带
+    history_window: Optional[int] = None
+    # 是否用本后端把超出预算的历史压缩为摘要
+    summarize_history = True
+    # 可选的 HealthMonitor，真实请求的结果会被动更新它
+    health = None
+
     def __init__(self, api_key: str):
         self.api_key = api_key
-        self.conversation_history = []
+        self.history = ConversationHistory(
+            max_tokens=int(os.getenv("CHAT_HISTORY_MAX_TOKENS", "1500")),
+            summarizer=self._summarize if self.summarize_history else None
+        )
         self._stop_streaming = False
-        
+        self._reader: Optional[asyncio.Task] = None
+        self.last_stats = None
+        self.cancel_stats = CancelStats()
+        self._avg_reply_tokens: Optional[float] = None  # 完整回复的平均 token 数（EWMA）
+        cache_enabled = os.getenv("CHAT_RESPONSE_CACHE", "false").lower() == "true"
+        self.response_cache = get_response_cache(self.__class__.__name__) if cache_enabled else None
+
     @abstractmethod
-    async def stream_chat(self, user_input: str) -> AsyncGenerator[str, None]:
-        """流式对话接口"""
+    def _build_request(self, messages: list[dict]) -> StreamRequest:
+        """根据消息列表构造流式请求"""
         pass
-        
+
+    @abstractmethod
+    def _parse_event(self, event: dict) -> Optional[str]:
+        """从一个流事件中提取文本内容"""
+        pass
+
+    def _completion_tokens(self, event: dict) -> Optional[int]:
+        """从最后一个流事件中读取服务端统计的 token 数"""
+        usage = event.get("usage")
+        if isinstance(usage, dict):
+            return usage.get("completion_tokens")
+        return None
+
+    async def _prepare(self):
+        """每轮对话开始前的准备工作（如获取令牌）"""
+        pass
+
+    @property
+    def conversation_history(self) -> list[dict]:
+        """当前会随请求发送的历史消息"""
+        return self.history.messages(self.history_window)
+
+    def _build_messages(self, user_input: str) -> list[dict]:
+        """组装本轮请求的消息列表"""
+        messages = [self.system_prompt] if self.system_prompt else []
+        messages.extend(self.conversation_history)
+        messages.append({"role": "user", "content": user_input})
+        return messages
+
+    def _record_turn(self, user_input: str, response: str):
+        """保存一轮完整对话"""
+        self.history.add_turn(user_input, response)
+
+    @staticmethod
+    def _complete_turn(record: Callable[[], None], defer: Optional[list]):
+        """立即记录一轮对话，或交给传入 defer 的调用方"""
+        if defer is None:
+            record()
+        else:
+            defer.append(record)
+
+    async def _summarize(self, summary: str, messages: list[dict]) -> str:
+        """用本后端把移出预算的历史合并进摘要，在后台执行"""
+        transcript = "\n".join(f"{m['role']}: {m['content']}" for m in messages)
+        prompt = (
+            "Merge the previous summary and the new conversation lines into one concise summary "
+            "of at most 120 words. Keep names, facts and open questions. Reply with the summary only.\n\n"
+            f"Previous summary: {summary or '(none)'}\n\nConversation:\n{transcript}"
+        )
+        result = StreamResult()
+        async for _ in self._stream_messages([{"role": "user", "content": prompt}], result, background=True):
+            pass
+        return result.text or summary
+
+    async def _read_events(self, request: StreamRequest, queue: asyncio.Queue):
+        """在独立任务中读取流事件，取消该任务会关闭 HTTP 连接"""
+        try:
+            async for event in stream_events(request):
+                queue.put_nowait(event)
+        except asyncio.CancelledError:
+            queue.put_nowait(_STOPPED)
+            raise
+        except Exception as e:
+            queue.put_nowait(e)
+        else:
+            queue.put_nowait(_END)
+
+    async def _stream_messages(self, messages: list[dict], result: StreamResult,
+                               background: bool = False) -> AsyncGenerator[str, None]:
+        """发送消息并逐段产出回复内容，同时累积到 result
+
+        background 为 True 时（如历史摘要）不响应 stop_streaming，也不更新 last_stats。
+        """
+        request = self._build_request(messages)
+        queue: asyncio.Queue = asyncio.Queue()
+        reader = asyncio.get_running_loop().create_task(self._read_events(request, queue))
+        if not background:
+            self._reader = reader
+            if self._stop_streaming:
+                reader.cancel()
+        try:
+            while (item := await queue.get()) is not _END:
+                if item is _STOPPED or (self._stop_streaming and not background):
+                    logger.info("流式输出被中断，已关闭上游连接")
+                    result.stats.cancelled = True
+                    break
+                if isinstance(item, BaseException):
+                    raise item
+                if result.last_event is None and self.health:
+                    self.health.mark_up()
+                result.last_event = item
+                if content := self._parse_event(item):
+                    result.append(content)
+                    yield content
+        except (httpx.TransportError, StreamError) as e:
+            if self.health and (not isinstance(e, StreamError) or e.status_code >= 500):
+                self.health.mark_down(str(e) or e.__class__.__name__)
+            raise
+        except (asyncio.CancelledError, GeneratorExit):
+            result.stats.cancelled = True
+            raise
+        finally:
+            if not reader.done():
+                reader.cancel()
+                try:
+                    await reader
+                except asyncio.CancelledError:
+                    pass
+            if self._reader is reader:
+                self._reader = None
+            result.stats.finish()
+            if result.last_event is not None:
+                result.stats.completion_tokens = self._completion_tokens(result.last_event)
+            if not background:
+                self.last_stats = result.stats
+                self._record_stream_stats(result)
+                logger.info(f"{self.__class__.__name__} {result.stats.summary()}")
+
+    def _record_stream_stats(self, result: StreamResult):
+        """完整回复更新平均长度，中断的回复按平均长度估算节省量"""
+        stats = result.stats
+        if not stats.cancelled:
+            if stats.tokens:
+                avg = self._avg_reply_tokens
+                self._avg_reply_tokens = stats.tokens if avg is None else avg + 0.3 * (stats.tokens - avg)
+            return
+        saved_tokens = max(int((self._avg_reply_tokens or 0) - stats.tokens), 0)
+        rate = stats.tokens_per_sec
+        saved_ms = saved_tokens / rate * 1000 if rate else 0.0
+        self.cancel_stats.record(saved_tokens, saved_ms)
+        logger.info(f"本次中断节省约 {saved_tokens} tokens / {saved_ms:.0f} ms，{self.cancel_stats.summary()}")
+
+    async def _replay_cached(self, user_input: str, response: str,
+                             defer: Optional[list] = None) -> AsyncGenerator[str, None]:
+        """以流的形式输出缓存的回复，并照常记录本轮对话"""
+        result = StreamResult()
+        async for content in replay(response):
+            if self._stop_streaming:
+                break
+            result.append(content)
+            yield content
+        result.stats.finish()
+        self.last_stats = result.stats
+        logger.info(f"{self.__class__.__name__} 命中回复缓存，{result.stats.summary()}")
+        if not self._stop_streaming:
+            self._complete_turn(lambda: self._record_turn(user_input, response), defer)
+
+    async def stream_chat(self, user_input: str, defer: Optional[list] = None) -> AsyncGenerator[str, None]:
+        """流式对话接口，defer 见类说明"""
+        self._stop_streaming = False
+        try:
+            # 只缓存无上下文的首轮问题
+            cache = self.response_cache if len(self.history) == 0 and not self.history.summary else None
+            if cache is not None and (cached := cache.get(user_input)) is not None:
+                async for content in self._replay_cached(user_input, cached, defer):
+                    yield content
+                return
+
+            await self._prepare()
+            result = StreamResult()
+            async for content in self._stream_messages(self._build_messages(user_input), result):
+                yield content
+            if not self._stop_streaming and result.parts:
+                def record():
+                    self._record_turn(user_input, result.text)
+                    if cache is not None:
+                        cache.put(user_input, result.text)
+                self._complete_turn(record, defer)
+        except StreamError as e:
+            logger.error(str(e))
+            yield f"Error: {e}"
+        except httpx.TimeoutException:
+            logger.error("API 请求超时")
+            yield "Error: API 请求超时"
+        except Exception as e:
+            error_msg = f"Stream chat 出错: {str(e)}"
+            logger.error(error_msg)
+            yield f"Error: {error_msg}"
+
     def stop_streaming(self):
-        """停止流式输出"""
+        """停止流式输出，立即取消正在进行的 HTTP 读取"""
         self._stop_streaming = True
-        
+        if self._reader and not self._reader.done():
+            self._reader.cancel()
+
     def reset_conversation(self):
         """重置对话历史"""
-        self.conversation_history = []
+        self.history.clear()
         self._stop_streaming = False
-        
+
+    async def close(self):
+        """释放资源，连接池由 stream_client 统一管理"""
+        self.stop_streaming()
+
     def verify_api_key(self) -> bool:
         """验证 API 密钥"""
         if not self.api_key:
             logger.error("API 密钥未设置")
             return False
-        
+
         if len(self.api_key) < 30:
             logger.error("API 密钥格式可能不正确")
             return False
-        
-        return True 
\ No newline at end of file
+
+        return True
@@ -0,0 +1,295 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import platform
+import subprocess
+from pathlib import Path
+from dataclasses import dataclass, field, asdict
+from typing import Optional
+
+# 添加项目根目录到 Python 路径
+root_dir = Path(__file__).resolve().parent.parent.parent
+sys.path.append(str(root_dir))
+
+from src.chat.base_chat import BaseChat, logger
+
+DEFAULT_PROMPTS = [
+    "你好，请介绍一下你自己。",
+    "What is the capital of France?",
+    "解释一下量子计算的基本原理。",
+    "Write a short poem about spring.",
+    "计算 123 + 456 的结果。",
+]
+
+
+def percentile(values: list[float], p: float) -> Optional[float]:
+    """线性插值的百分位数，p 取 0-100"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * p / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def distribution(values: list[float]) -> dict:
+    """汇总为 mean/p50/p95/p99，单位与输入一致"""
+    if not values:
+        return {"mean": None, "p50": None, "p95": None, "p99": None}
+    return {
+        "mean": round(sum(values) / len(values), 2),
+        "p50": round(percentile(values, 50), 2),
+        "p95": round(percentile(values, 95), 2),
+        "p99": round(percentile(values, 99), 2),
+    }
+
+
+@dataclass
+class RequestSample:
+    """单次请求的测量结果"""
+    ttft_ms: Optional[float] = None
+    total_ms: float = 0.0
+    chunks: int = 0
+    tokens: int = 0
+    inter_token_ms: list[float] = field(default_factory=list)
+    error: Optional[str] = None
+
+    @property
+    def tokens_per_sec(self) -> Optional[float]:
+        # 按首字之后的生成阶段计算，与 StreamStats 一致
+        if self.ttft_ms is None or self.tokens < 2 or self.total_ms <= self.ttft_ms:
+            return None
+        return (self.tokens - 1) * 1000 / (self.total_ms - self.ttft_ms)
+
+
+async def measure(chat: BaseChat, prompt: str) -> RequestSample:
+    """流式请求一次并记录首字延迟、字间延迟和 token 数"""
+    sample = RequestSample()
+    start = last = time.perf_counter()
+    try:
+        async for chunk in chat.stream_chat(prompt):
+            now = time.perf_counter()
+            if chunk.startswith("Error:") and sample.chunks == 0:
+                sample.error = chunk
+                break
+            if sample.ttft_ms is None:
+                sample.ttft_ms = (now - start) * 1000
+            else:
+                sample.inter_token_ms.append((now - last) * 1000)
+            sample.chunks += 1
+            last = now
+    except Exception as e:
+        sample.error = f"Error: {str(e)}"
+    sample.total_ms = (time.perf_counter() - start) * 1000
+    stats = chat.last_stats
+    # 优先使用服务端统计的 token 数，没有时按收到的片段数计
+    sample.tokens = (stats.completion_tokens if stats and stats.completion_tokens else None) or sample.chunks
+    return sample
+
+
+def summarize(samples: list[RequestSample], wall_s: float) -> dict:
+    ok = [s for s in samples if s.error is None]
+    inter_token = [gap for s in ok for gap in s.inter_token_ms]
+    rates = [rate for s in ok if (rate := s.tokens_per_sec) is not None]
+    errors = [s.error for s in samples if s.error is not None]
+    return {
+        "requests": len(samples),
+        "errors": len(errors),
+        "error_rate": round(len(errors) / len(samples), 4) if samples else 0.0,
+        "ttft_ms": distribution([s.ttft_ms for s in ok]),
+        "inter_token_ms": distribution(inter_token),
+        "total_ms": distribution([s.total_ms for s in ok]),
+        "tokens_per_sec": distribution(rates),
+        "throughput_rps": round(len(ok) / wall_s, 2) if wall_s > 0 else None,
+        "output_tokens_per_sec": round(sum(s.tokens for s in ok) / wall_s, 2) if wall_s > 0 else None,
+        "sample_errors": sorted(set(errors))[:3],
+    }
+
+
+async def run_level(backend: str, concurrency: int, requests: int, warmup: int,
+                    prompts: list[str]) -> dict:
+    """以指定并发数对一个后端发起请求，每个并发槽位使用独立的聊天实例"""
+    from src.chat.chat_factory import ChatFactory
+
+    chats = [ChatFactory.create_chat(backend) for _ in range(concurrency)]
+    try:
+        # 预热：建立连接、获取令牌、加载模型，结果不计入统计
+        for i in range(warmup):
+            chat = chats[i % concurrency]
+            await measure(chat, prompts[i % len(prompts)])
+            chat.reset_conversation()
+
+        queue: asyncio.Queue[int] = asyncio.Queue()
+        for i in range(requests):
+            queue.put_nowait(i)
+        samples: list[RequestSample] = []
+
+        async def worker(chat: BaseChat):
+            while not queue.empty():
+                i = queue.get_nowait()
+                # 每次请求都从空历史开始，保证各并发级别可比
+                chat.reset_conversation()
+                samples.append(await measure(chat, prompts[i % len(prompts)]))
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(chat) for chat in chats))
+        return summarize(samples, time.perf_counter() - start)
+    finally:
+        for chat in chats:
+            await chat.close()
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=root_dir,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+async def run_benchmark(backends: list[str], concurrency: list[int], requests: int = 20,
+                        warmup: int = 2, prompts: Optional[list[str]] = None,
+                        mock: bool = False, mock_profile=None) -> dict:
+    """对各后端在各并发级别下运行基准测试，返回可序列化为 JSON 的结果
+
+    mock 为 True 时启动内置的模拟服务（延迟参数为 mock_profile），
+    并把各后端的地址指向它。
+    """
+    from src.chat.stream_client import close_clients
+
+    prompts = prompts or DEFAULT_PROMPTS
+    report = {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "mock": mock,
+            "requests": requests,
+            "warmup": warmup,
+            "concurrency": concurrency,
+        },
+        "results": {},
+    }
+    # 回复缓存会让重复的问题直接命中，基准测试中关闭
+    os.environ["CHAT_RESPONSE_CACHE"] = "false"
+
+    server = None
+    if mock:
+        from src.chat.mock_server import MockLLMServer
+        server = MockLLMServer(mock_profile)
+        await server.start()
+        report["meta"]["mock_profile"] = asdict(server.profile)
+        for name in ("DEEPSEEK_BASE_URL", "ERNIE_BASE_URL", "OLLAMA_BASE_URL"):
+            os.environ[name] = server.url
+        # 不把真实密钥发给模拟服务；长度需通过 verify_api_key 的格式检查
+        for name in ("DEEPSEEK_API_KEY", "BAIDU_API_KEY", "BAIDU_SECRET_KEY"):
+            os.environ[name] = "mock-" + "0" * 32
+
+    try:
+        for backend in backends:
+            levels = report["results"][backend] = {}
+            for level in concurrency:
+                logger.info(f"基准测试 {backend}，并发 {level}")
+                try:
+                    levels[str(level)] = await run_level(backend, level, requests, warmup, prompts)
+                except Exception as e:
+                    logger.error(f"基准测试 {backend} 失败: {str(e)}")
+                    levels[str(level)] = {"error": str(e)}
+    finally:
+        await close_clients()
+        if server:
+            await server.stop()
+    return report
+
+
+# 比较时关注的指标：(路径, 越小越好)
+COMPARE_METRICS = [
+    (("ttft_ms", "p50"), True),
+    (("ttft_ms", "p95"), True),
+    (("inter_token_ms", "p50"), True),
+    (("total_ms", "p95"), True),
+    (("tokens_per_sec", "p50"), False),
+    (("throughput_rps",), False),
+    (("error_rate",), True),
+]
+
+
+def _lookup(data: dict, path: tuple):
+    for key in path:
+        if not isinstance(data, dict):
+            return None
+        data = data.get(key)
+    return data
+
+
+def compare(old: dict, new: dict) -> list[dict]:
+    """比较两次基准测试结果，返回各指标的变化"""
+    rows = []
+    for backend, levels in new.get("results", {}).items():
+        for level, result in levels.items():
+            base = old.get("results", {}).get(backend, {}).get(level)
+            if not base:
+                continue
+            for path, lower_is_better in COMPARE_METRICS:
+                before, after = _lookup(base, path), _lookup(result, path)
+                if before is None or after is None:
+                    continue
+                change = (after - before) / before * 100 if before else 0.0
+                rows.append({
+                    "backend": backend,
+                    "concurrency": level,
+                    "metric": ".".join(path),
+                    "old": before,
+                    "new": after,
+                    "change_pct": round(change, 1),
+                    "better": (after < before) == lower_is_better if after != before else None,
+                })
+    return rows
+
+
+def print_report(report: dict):
+    print(f"\n基准测试结果 (commit {report['meta'].get('commit')}):")
+    for backend, levels in report["results"].items():
+        print(f"\n{backend.upper()}:")
+        for level, r in levels.items():
+            if "error" in r:
+                print(f"  并发 {level}: 失败 {r['error']}")
+                continue
+            print(f"  并发 {level}: TTFT p50/p95/p99 {r['ttft_ms']['p50']}/{r['ttft_ms']['p95']}/{r['ttft_ms']['p99']} ms, "
+                  f"字间 p50 {r['inter_token_ms']['p50']} ms, "
+                  f"{r['tokens_per_sec']['p50']} tokens/s, "
+                  f"吞吐 {r['throughput_rps']} req/s, 错误率 {r['error_rate'] * 100:.1f}%")
+
+
+def main(argv: Optional[list[str]] = None):
+    parser = argparse.ArgumentParser(description="聊天后端基准测试")
+    parser.add_argument("--backends", nargs="+", default=["deepseek", "ernie", "ollama"])
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 4, 8])
+    parser.add_argument("--requests", type=int, default=20, help="每个并发级别的请求数")
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--mock", action="store_true", help="使用内置模拟服务，结果可离线复现")
+    parser.add_argument("--output", help="结果 JSON 文件路径")
+    parser.add_argument("--compare", metavar="BASELINE", help="与之前的结果 JSON 比较")
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(run_benchmark(args.backends, args.concurrency, args.requests,
+                                       args.warmup, mock=args.mock))
+    print_report(report)
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"\n结果已保存到 {args.output}")
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+        print(f"\n与 {baseline['meta'].get('commit')} 比较:")
+        for row in compare(baseline, report):
+            mark = {True: "↑", False: "↓", None: "="}[row["better"]]
+            print(f"  {mark} {row['backend']} 并发 {row['concurrency']} {row['metric']}: "
+                  f"{row['old']} -> {row['new']} ({row['change_pct']:+.1f}%)")
+
+
+if __name__ == "__main__":
+    main()
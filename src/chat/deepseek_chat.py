@@ -6,151 +6,121 @@ from pathlib import Path
 root_dir = Path(__file__).resolve().parent.parent.parent
 sys.path.append(str(root_dir))
 
-import httpx
-import json
-from typing import AsyncGenerator
+from dataclasses import dataclass, field
+from typing import AsyncGenerator, Optional
 import asyncio
 from src.chat.base_chat import BaseChat, logger
+from src.chat.stream_client import StreamRequest, StreamResult
+
+@dataclass
+class PromptCacheStats:
+    """DeepSeek 前缀缓存命中统计（按会话累计）"""
+    # 每轮 (命中 tokens, 未命中 tokens, 首字延迟 ms)
+    turns: list[tuple[int, int, Optional[float]]] = field(default_factory=list)
+
+    def record(self, usage: dict, ttft_ms: Optional[float]):
+        self.turns.append((
+            usage.get("prompt_cache_hit_tokens", 0),
+            usage.get("prompt_cache_miss_tokens", 0),
+            ttft_ms
+        ))
+
+    @property
+    def hit_rate(self) -> float:
+        hit = sum(t[0] for t in self.turns)
+        total = hit + sum(t[1] for t in self.turns)
+        return hit / total if total else 0.0
+
+    def _mean_ttft(self, cached: bool) -> Optional[float]:
+        values = [ttft for hit, miss, ttft in self.turns
+                  if ttft is not None and (hit >= miss) == cached]
+        return sum(values) / len(values) if values else None
+
+    def summary(self) -> str:
+        hit_ttft, miss_ttft = self._mean_ttft(True), self._mean_ttft(False)
+        text = f"前缀缓存命中率: {self.hit_rate:.0%} ({len(self.turns)} 轮)"
+        if hit_ttft is not None and miss_ttft is not None:
+            text += f", 平均首字延迟 命中 {hit_ttft:.0f} ms / 未命中 {miss_ttft:.0f} ms"
+        return text
 
 class DeepSeekChat(BaseChat):
-    """DeepSeek 聊天实现"""
-    
+    """DeepSeek 聊天实现
+
+    默认使用 append 提示词布局：系统提示和已有历史保持逐字节不变，每轮
+    只在末尾追加，使 DeepSeek 的前缀缓存持续命中；历史超出预算时一次
+    移出一半，减少前缀变化的次数。DEEPSEEK_PROMPT_MODE=rolling 时每轮
+    只移出刚好超出的部分。
+    """
+
+    # 添加系统提示，限制只用英语回复
+    system_prompt = {
+        "role": "system",
+        "content": "You are a helpful AI assistant. Always respond in English, regardless of the input language. Keep your responses clear and concise."
+    }
+    max_tokens: Optional[int] = 2000
+
     def __init__(self):
         api_key = os.getenv("DEEPSEEK_API_KEY")
         super().__init__(api_key)
         
-        self.base_url = "https://api.deepseek.com/v1"
+        self.base_url = os.getenv("DEEPSEEK_BASE_URL", "https://api.deepseek.com/v1")
         self.model = "deepseek-chat"
         
         # 验证 API 密钥
         if not self.verify_api_key():
             raise ValueError("DeepSeek API 密钥无效")
             
-        logger.info(f"初始化 DeepSeekChat，使用模型: {self.model}")
-        
-        # 初始化 HTTP 客户端
-        self.client = httpx.AsyncClient(
+        self.prompt_mode = os.getenv("DEEPSEEK_PROMPT_MODE", "append").lower()
+        if self.prompt_mode == "append":
+            self.history.low_water = self.history.max_tokens // 2
+        self.cache_stats = PromptCacheStats()
+            
+        logger.info(f"初始化 DeepSeekChat，使用模型: {self.model}，提示词布局: {self.prompt_mode}")
+        self.headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
+
+    def set_stop_streaming(self, stop: bool):
+        if stop:
+            self.stop_streaming()
+        else:
+            self._stop_streaming = False
+
+    def _build_request(self, messages: list[dict]) -> StreamRequest:
+        data = {
+            "model": self.model,
+            "messages": messages,
+            "stream": True,
+            "stream_options": {"include_usage": True},
+            "temperature": 0.7
+        }
+        if self.max_tokens:
+            data["max_tokens"] = self.max_tokens
+        return StreamRequest(
             base_url=self.base_url,
-            headers={
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json"
-            },
-            timeout=30.0
+            path="/chat/completions",
+            payload=data,
+            headers=self.headers
         )
 
-    def set_stop_streaming(self, stop: bool):
-        self._stop_streaming = stop
-        
-    async def stream_chat(self, user_input: str) -> AsyncGenerator[str, None]:
-        """流式对话实现"""
-        print("开始流式对话")
-        print("self._stop_streaming: ", self._stop_streaming)
-        self.set_stop_streaming(False)
-        try:
-            print("开始处理用户输入: ", user_input)
-            logger.info(f"开始处理用户输入: {user_input}")
-            
-            # 添加系统提示，限制只用英语回复
-            system_prompt = {
-                "role": "system",
-                "content": "You are a helpful AI assistant. Always respond in English, regardless of the input language. Keep your responses clear and concise."
-            }
-            
-            # 添加用户输入到对话历史
-            messages = [system_prompt]  # 添加系统提示作为第一条消息
-            messages.extend(self.conversation_history[-4:])  # 保留最近4轮对话
-            messages.append({"role": "user", "content": user_input})
-            
-            # 准备请求数据
-            data = {
-                "model": self.model,
-                "messages": messages,
-                "stream": True,
-                "temperature": 0.7,
-                "max_tokens": 2000
-            }
-            print("发送请求到 DeepSeek API")
-            logger.info("发送请求到 DeepSeek API")
-            
-            try:
-                async with self.client.stream(
-                    "POST", 
-                    "/chat/completions", 
-                    json=data
-                ) as response:
-                    if response.status_code != 200:
-                        error_text = await response.text()
-                        logger.error(f"API 调用失败: {error_text}")
-                        yield f"Error: API 调用失败 ({response.status_code}): {error_text}"
-                        return
-
-                    logger.info("开始接收流式响应")
-                    full_response = ""
-                    
-                    async for line in response.aiter_lines():
-                        if self._stop_streaming:
-                            logger.info("流式输出被中断")
-                            self.set_stop_streaming(False)
-                            break
-                            
-                        if line.strip():
-                            if line.startswith("data: "):
-                                try:
-                                    line = line.removeprefix("data: ")
-                                    if line.strip() == "[DONE]":
-                                        logger.info("收到结束标记")
-                                        continue
-                                        
-                                    chunk = json.loads(line)
-                                    if content := chunk["choices"][0]["delta"].get("content"):
-                                        full_response += content
-                                        logger.debug(f"收到响应片段: {content}")
-                                        yield content
-                                        
-                                except json.JSONDecodeError:
-                                    logger.warning(f"JSON 解析错误，跳过: {line}")
-                                    continue
-                                except Exception as e:
-                                    logger.error(f"处理响应chunk时出错: {str(e)}")
-                                    continue
-
-                    # 如果成功完成对话，保存到历史记录
-                    if full_response:
-                        logger.info("对话完成，保存到历史记录")
-                        self.conversation_history.append({
-                            "role": "assistant",
-                            "content": full_response
-                        })
-                        
-            except httpx.TimeoutError:
-                error_msg = "API 请求超时"
-                logger.error(error_msg)
-                yield f"Error: {error_msg}"
-            except Exception as e:
-                error_msg = f"API 请求出错: {str(e)}"
-                logger.error(error_msg)
-                yield f"Error: {error_msg}"
-                
-        except Exception as e:
-            error_msg = f"Stream chat 出错: {str(e)}"
-            logger.error(error_msg)
-            yield f"Error: {error_msg}"
-            
-    async def close(self):
-        """关闭客户端"""
-        if self.client:
-            await self.client.aclose()
-            self.client = None
-            
-    def __del__(self):
-        """析构函数"""
-        if self.client:
-            try:
-                loop = asyncio.get_event_loop()
-                if loop.is_running():
-                    loop.create_task(self.client.aclose())
-            except:
-                pass 
+    def _parse_event(self, event: dict) -> Optional[str]:
+        choices = event.get("choices")
+        if not choices:
+            return None
+        return choices[0].get("delta", {}).get("content")
+
+    async def _stream_messages(self, messages: list[dict], result: StreamResult,
+                               background: bool = False) -> AsyncGenerator[str, None]:
+        async for content in super()._stream_messages(messages, result, background):
+            yield content
+        usage = (result.last_event or {}).get("usage")
+        if usage and not background:
+            self.cache_stats.record(usage, result.stats.ttft_ms)
+            logger.info(
+                f"本轮缓存命中 {usage.get('prompt_cache_hit_tokens', 0)}/{usage.get('prompt_tokens', 0)} tokens，"
+                f"{self.cache_stats.summary()}"
+            )
 
 
 async def test():
@@ -174,4 +144,4 @@ async def test():
         await chat.close()
 
 if __name__ == "__main__":
-    asyncio.run(test())
\ No newline at end of file
+    asyncio.run(test())
@@ -6,107 +6,101 @@ from pathlib import Path
 root_dir = Path(__file__).resolve().parent.parent.parent
 sys.path.append(str(root_dir))
 
-import httpx
-import json
-from typing import AsyncGenerator
+from typing import Optional
 import asyncio
 from src.chat.base_chat import BaseChat, logger
+from src.chat.stream_client import StreamError, StreamRequest, get_client
+from src.chat.token_cache import get_token_cache
+
+# 令牌无效或过期的错误码
+TOKEN_ERROR_CODES = (110, 111)
+
+
+def _token_fetcher(base_url: str, api_key: str, secret_key: str):
+    """构造获取文心 OAuth 令牌的函数，不持有聊天实例"""
+    async def fetch() -> tuple[str, float]:
+        params = {
+            "grant_type": "client_credentials",
+            "client_id": api_key,
+            "client_secret": secret_key
+        }
+        response = await get_client(base_url).post("/oauth/2.0/token", params=params)
+        if response.status_code != 200:
+            raise Exception("获取访问令牌失败")
+        result = response.json()
+        if "access_token" not in result:
+            raise Exception(f"获取访问令牌失败: {result.get('error_description', result)}")
+        return result["access_token"], result.get("expires_in", 0)
+    return fetch
 
 class ErnieChat(BaseChat):
-    """文心一言聊天实现"""
+    """文心一言聊天实现
+
+    访问令牌由进程内共享的 AccessTokenCache 管理，所有实例共用一个令牌，
+    并在到期前后台续期，对话请求不再等待 OAuth。
+    """
+
+    chat_path = "/rpc/2.0/ai_custom/v1/wenxinworkshop/chat/completions"
     
     def __init__(self):
         api_key = os.getenv("BAIDU_API_KEY")
         super().__init__(api_key)
         
         self.secret_key = os.getenv("BAIDU_SECRET_KEY")
-        self.base_url = "https://aip.baidubce.com/rpc/2.0/ai_custom/v1/wenxinworkshop/chat/completions"
-        self.access_token = None
-        self.client = httpx.AsyncClient()
-        
-    async def _get_access_token(self):
-        """获取访问令牌"""
-        url = f"https://aip.baidubce.com/oauth/2.0/token?grant_type=client_credentials&client_id={self.api_key}&client_secret={self.secret_key}"
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url)
-            if response.status_code == 200:
-                self.access_token = response.json()["access_token"]
-            else:
-                raise Exception("获取访问令牌失败")
-                
-    async def stream_chat(self, user_input: str) -> AsyncGenerator[str, None]:
-        """流式对话实现"""
-        print('--------------------------------')
-        print(f"开始流式对话，用户输入: {user_input}")
-        print('--------------------------------')
+        self.base_url = os.getenv("ERNIE_BASE_URL", "https://aip.baidubce.com")
+        self.tokens = get_token_cache(
+            (self.base_url, self.api_key),
+            _token_fetcher(self.base_url, self.api_key, self.secret_key)
+        )
+        # 有事件循环时在后台预取令牌，首轮对话无需等待
+        try:
+            asyncio.get_running_loop().create_task(self._warm_token())
+        except RuntimeError:
+            pass
+
+    @property
+    def access_token(self) -> Optional[str]:
+        return self.tokens.token
+
+    async def _warm_token(self):
         try:
-            if self._stop_streaming:
-                return
-                
-            if not self.access_token:
-                await self._get_access_token()
-                
-            self.conversation_history.append({"role": "user", "content": user_input})
-            full_response = ""
-            
-            url = f"{self.base_url}?access_token={self.access_token}"
-            data = {
-                "messages": self.conversation_history,
-                "stream": True,
-                "temperature": 0.7
-            }
-            
-            async with self.client.stream("POST", url, json=data) as response:
-                if response.status_code != 200:
-                    error_msg = f"API 调用失败: {await response.text()}"
-                    logger.error(error_msg)
-                    yield f"Error: {error_msg}"
-                    return
-
-                buffer = ""
-                async for line in response.aiter_lines():
-                    if self._stop_streaming:
-                        break
-                        
-                    if not line.strip():
-                        continue
-                        
-                    try:
-                        # 处理可能的SSE格式
-                        if line.startswith('data: '):
-                            line = line[6:]
-                        
-                        # 累积buffer直到有完整的JSON
-                        buffer += line
-                        try:
-                            chunk = json.loads(buffer)
-                            buffer = ""  # 重置buffer
-                            
-                            if result := chunk.get("result", ""):
-                                full_response += result
-                                yield result
-                                
-                        except json.JSONDecodeError:
-                            # 如果不是完整的JSON就继续累积
-                            continue
-                            
-                    except Exception as e:
-                        logger.error(f"处理响应chunk时出错: {str(e)}")
-                        continue
-
-            if not self._stop_streaming and full_response:
-                self.conversation_history.append({
-                    "role": "assistant",
-                    "content": full_response
-                })
-                    
+            await self.tokens.get()
         except Exception as e:
-            error_msg = f"Stream chat error: {str(e)}"
-            logger.error(error_msg)
-            yield f"Error: {error_msg}"
-            
-        finally:
-            await self.client.aclose() 
+            logger.warning(f"预取访问令牌失败: {str(e)}")
+
+    async def _get_access_token(self) -> str:
+        """获取访问令牌，缓存有效时直接返回"""
+        return await self.tokens.get()
+
+    async def _prepare(self):
+        await self._get_access_token()
+
+    def _payload(self, messages: list[dict]) -> dict:
+        # 文心接口的 messages 只能交替出现 user/assistant，系统提示和摘要放入 system 字段
+        system = "\n".join(m["content"] for m in messages if m["role"] == "system")
+        data = {
+            "messages": [m for m in messages if m["role"] != "system"],
+            "stream": True,
+            "temperature": 0.7
+        }
+        if system:
+            data["system"] = system
+        return data
+
+    def _build_request(self, messages: list[dict]) -> StreamRequest:
+        return StreamRequest(
+            base_url=self.base_url,
+            path=self.chat_path,
+            payload=self._payload(messages),
+            params={"access_token": self.access_token}
+        )
+
+    def _parse_event(self, event: dict) -> Optional[str]:
+        if "error_code" in event:
+            if event["error_code"] in TOKEN_ERROR_CODES:
+                self.tokens.invalidate()
+            raise StreamError(event["error_code"], event.get("error_msg", ""))
+        return event.get("result")
 
 async def test():
     # 确保环境变量已加载
@@ -122,4 +116,4 @@ async def test():
     print("\n")
 
 if __name__ == "__main__":
-    asyncio.run(test())
\ No newline at end of file
+    asyncio.run(test())
@@ -0,0 +1,115 @@
+import time
+import asyncio
+import logging
+from typing import Optional
+
+import httpx
+
+from src.chat.stream_client import get_client
+
+logger = logging.getLogger(__name__)
+
+
+class HealthMonitor:
+    """后端可用性监控
+
+    探测结果缓存 ttl 秒，由后台任务定期刷新；真实请求的成功/失败也会
+    被动更新状态，因此对话前只需读取缓存，不再同步探测。
+    """
+
+    def __init__(self, base_url: str, probe_path: str, ttl: float = 5.0,
+                 interval: float = 15.0, timeout: float = 2.0):
+        self.base_url = base_url
+        self.probe_path = probe_path
+        self.ttl = ttl
+        self.interval = interval  # 服务正常时的探测间隔，异常时按 ttl 重试
+        self.timeout = timeout
+        self.available: Optional[bool] = None  # None 表示尚未确认
+        self.checked_at = 0.0
+        self.last_error: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+        self._probe_task: Optional[asyncio.Task] = None
+
+    def mark_up(self):
+        """记录一次成功的请求"""
+        if self.available is False:
+            logger.info(f"后端恢复可用: {self.base_url}")
+        self.available = True
+        self.checked_at = time.monotonic()
+        self.last_error = None
+
+    def mark_down(self, reason: str):
+        """记录一次失败的请求"""
+        if self.available is not False:
+            logger.warning(f"后端不可用: {self.base_url} ({reason})")
+        self.available = False
+        self.checked_at = time.monotonic()
+        self.last_error = reason
+
+    @property
+    def is_stale(self) -> bool:
+        return time.monotonic() - self.checked_at > self.ttl
+
+    def is_available(self) -> bool:
+        """读取缓存的可用性，过期时在后台刷新，不阻塞调用方"""
+        if self.is_stale:
+            self._schedule_probe()
+        # 尚未确认时乐观放行，由真实请求的结果更新状态
+        return self.available is not False
+
+    async def probe(self) -> bool:
+        """主动探测一次"""
+        try:
+            response = await get_client(self.base_url).get(self.probe_path, timeout=self.timeout)
+            response.raise_for_status()
+            self.mark_up()
+        except httpx.HTTPError as e:
+            self.mark_down(str(e) or e.__class__.__name__)
+        return bool(self.available)
+
+    def _schedule_probe(self):
+        if self._probe_task and not self._probe_task.done():
+            return
+        try:
+            self._probe_task = asyncio.get_running_loop().create_task(self.probe())
+        except RuntimeError:
+            pass  # 没有运行中的事件循环
+
+    def start(self):
+        """在当前事件循环中启动后台探测任务"""
+        if self._task and not self._task.done():
+            return
+        try:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        except RuntimeError:
+            pass
+
+    async def _run(self):
+        while True:
+            if self.is_stale:
+                await self.probe()
+            await asyncio.sleep(self.interval if self.available else self.ttl)
+
+    async def stop(self):
+        for task in (self._task, self._probe_task):
+            if task and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._task = None
+        self._probe_task = None
+
+
+# 进程内共享，同一个服务地址只有一个监控器
+_monitors: dict[tuple[str, str], HealthMonitor] = {}
+
+
+def get_monitor(base_url: str, probe_path: str, **kwargs) -> HealthMonitor:
+    """获取指定服务的共享监控器"""
+    key = (base_url, probe_path)
+    monitor = _monitors.get(key)
+    if monitor is None:
+        monitor = _monitors[key] = HealthMonitor(base_url, probe_path, **kwargs)
+    return monitor
@@ -0,0 +1,180 @@
+import re
+import asyncio
+import logging
+from collections import deque
+from itertools import islice
+from typing import Awaitable, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+# 中日韩字符与全角符号，大多数分词器中约 1 字 1 token
+_CJK_RE = re.compile(r"[\u3000-\u303f\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uff00-\uffef]")
+# 每条消息的角色、分隔符等固定开销
+MESSAGE_OVERHEAD = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """本地快速估算 token 数：CJK 按 1 字 1 token，其余按 4 字符 1 token"""
+    if not text:
+        return 0
+    cjk = len(_CJK_RE.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+# (previous_summary, evicted_messages) -> new_summary
+Summarizer = Callable[[str, list[dict]], Awaitable[str]]
+
+
+class ConversationHistory:
+    """按 token 预算管理的对话历史
+
+    超出预算时最早的整轮对话被移出，交给 summarizer 在后台压缩进滚动
+    摘要，不阻塞当前回复；没有 summarizer 时直接丢弃。有 summarizer 时，
+    待压缩的消息在摘要完成前仍留在历史中，摘要完成后与新摘要一步替换，
+    每次移出只改变一次历史前缀（前缀缓存只失效一次）。attach 一个
+    HistoryStore 后，新消息和摘要会异步持久化，restore 按预算读回。
+    """
+
+    def __init__(self, max_tokens: int = 1500, min_recent: int = 4,
+                 summarizer: Optional[Summarizer] = None, low_water: Optional[int] = None):
+        self.max_tokens = max_tokens
+        # 超出预算后一次移出到 low_water 以下；调低可减少历史前缀变化的次数
+        self.low_water = max_tokens if low_water is None else low_water
+        self.min_recent = min_recent  # 至少保留的最近消息条数
+        self.summarizer = summarizer
+        self.summary = ""
+        # 以 (role, content, tokens) 元组紧凑存储
+        self._turns: deque[tuple[str, str, int]] = deque()
+        self._tokens = 0
+        # 已交给摘要、尚未移出的消息：_turns 最前面的 _evicting 条，共 _evicting_tokens
+        self._evicting = 0
+        self._evicting_tokens = 0
+        self._task: Optional[asyncio.Task] = None
+        self.store = None
+        self.session_id: Optional[str] = None
+
+    def attach(self, store, session_id: str):
+        """关联持久化存储，之后的消息都会写入该会话"""
+        self.store = store
+        self.session_id = session_id
+
+    async def restore(self):
+        """从存储中读取不超过 max_tokens 的最近消息和摘要"""
+        if self.store is None:
+            return
+        turns, summary = await self.store.load(self.session_id, self.max_tokens)
+        if self._task and not self._task.done():
+            self._task.cancel()
+        self._turns = deque(turns)
+        self._tokens = sum(tokens for _, _, tokens in turns)
+        self._evicting = self._evicting_tokens = 0
+        self.summary = summary
+        if turns:
+            logger.info(f"已恢复会话 {self.session_id} 的 {len(turns)} 条历史消息")
+
+    def __len__(self) -> int:
+        return len(self._turns)
+
+    @property
+    def tokens(self) -> int:
+        """当前会随请求发送的历史 token 数（含摘要）"""
+        summary_tokens = estimate_tokens(self.summary) + MESSAGE_OVERHEAD if self.summary else 0
+        return self._tokens + summary_tokens
+
+    def _append(self, role: str, content: str):
+        tokens = estimate_tokens(content) + MESSAGE_OVERHEAD
+        self._turns.append((role, content, tokens))
+        self._tokens += tokens
+        if self.store is not None:
+            self.store.append(self.session_id, role, content, tokens)
+
+    def add(self, role: str, content: str):
+        self._append(role, content)
+        self._enforce_budget()
+
+    def add_turn(self, user_input: str, response: str):
+        """保存一轮完整对话"""
+        self._append("user", user_input)
+        self._append("assistant", response)
+        self._enforce_budget()
+
+    def messages(self, window: Optional[int] = None) -> list[dict]:
+        """生成请求用的消息列表，摘要以 system 消息放在最前"""
+        if window is None:
+            turns = self._turns
+        else:
+            turns = list(self._turns)[-window:] if window > 0 else []
+        messages = []
+        if self.summary and window is None:
+            messages.append({"role": "system", "content": f"Summary of the earlier conversation: {self.summary}"})
+        messages.extend({"role": role, "content": content} for role, content, _ in turns)
+        return messages
+
+    def clear(self):
+        self._turns.clear()
+        self._tokens = 0
+        self._evicting = self._evicting_tokens = 0
+        self.summary = ""
+        if self._task and not self._task.done():
+            self._task.cancel()
+        self._task = None
+        if self.store is not None:
+            self.store.clear(self.session_id)
+
+    def _enforce_budget(self):
+        """移出最早的整轮对话直到满足预算，已在等待摘要的消息不重复计算"""
+        tokens = self.tokens - self._evicting_tokens
+        if tokens <= self.max_tokens:
+            return
+        count = self._evicting
+        while tokens > self.low_water and len(self._turns) - count > self.min_recent:
+            # 成对移出，保持 user/assistant 交替
+            for _ in range(2 if len(self._turns) - count - self.min_recent >= 2 else 1):
+                tokens -= self._turns[count][2]
+                count += 1
+        if count == self._evicting:
+            return
+        if self.summarizer is None:
+            for _ in range(count):
+                self._tokens -= self._turns.popleft()[2]
+            logger.debug(f"历史超出预算，丢弃 {count} 条消息")
+            return
+        self._evicting_tokens += sum(t for _, _, t in islice(self._turns, self._evicting, count))
+        self._evicting = count
+        self._schedule_compaction()
+
+    def _schedule_compaction(self):
+        if self._task and not self._task.done():
+            return  # 正在压缩，新移出的消息会在下一次处理
+        try:
+            self._task = asyncio.get_running_loop().create_task(self._compact())
+        except RuntimeError:
+            pass  # 没有事件循环时保留在待压缩队列中
+
+    async def _compact(self):
+        while self._evicting:
+            count = self._evicting
+            evicted = [{"role": role, "content": content} for role, content, _ in islice(self._turns, count)]
+            summary = self.summary
+            try:
+                summary = (await self.summarizer(self.summary, evicted)).strip()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"历史摘要失败，丢弃 {len(evicted)} 条消息: {str(e)}")
+            # 移出消息与更新摘要在同一步完成，中间没有让出事件循环
+            for _ in range(count):
+                tokens = self._turns.popleft()[2]
+                self._tokens -= tokens
+                self._evicting_tokens -= tokens
+            self._evicting -= count
+            if summary != self.summary:
+                self.summary = summary
+                if self.store is not None:
+                    self.store.save_summary(self.session_id, self.summary)
+                logger.info(f"已将 {len(evicted)} 条历史消息压缩进摘要 ({estimate_tokens(self.summary)} tokens)")
+
+    async def wait_idle(self):
+        """等待后台压缩完成"""
+        while self._task and not self._task.done():
+            await self._task
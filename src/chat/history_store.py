@@ -0,0 +1,244 @@
+import os
+import time
+import queue
+import asyncio
+import logging
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# 一条消息: (role, content, tokens)
+StoredTurn = tuple[str, str, int]
+
+
+class HistoryStore(ABC):
+    """对话历史的持久化接口
+
+    写入方法必须立即返回，不能阻塞流式回复；读取只在会话恢复时调用。
+    """
+
+    @abstractmethod
+    def append(self, session_id: str, role: str, content: str, tokens: int):
+        pass
+
+    @abstractmethod
+    def save_summary(self, session_id: str, summary: str):
+        pass
+
+    @abstractmethod
+    def clear(self, session_id: str):
+        pass
+
+    @abstractmethod
+    async def load(self, session_id: str, max_tokens: int) -> tuple[list[StoredTurn], str]:
+        """读取最近的、总 token 数不超过 max_tokens 的消息，以及滚动摘要"""
+        pass
+
+    async def close(self):
+        pass
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id TEXT NOT NULL,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    tokens INTEGER NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_messages_session ON messages (session_id, id);
+CREATE TABLE IF NOT EXISTS summaries (
+    session_id TEXT PRIMARY KEY,
+    summary TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+
+_STOP = object()
+
+
+class SQLiteHistoryStore(HistoryStore):
+    """基于 SQLite（WAL 模式）的对话历史存储
+
+    写操作放入队列，由后台线程批量写入，每批一个事务；读操作按
+    (session_id, id) 索引倒序读取，凑够 token 预算即停止，不加载整段历史。
+
+    后台线程每隔 prune_interval 秒清理一次：删除早于 max_age 秒的消息，
+    总消息数超过 max_rows 时删除最早的消息，会话没有剩余消息时一并删除
+    其摘要。两者为 None 时不清理。
+    """
+
+    def __init__(self, path: str, batch_size: int = 256, max_age: Optional[float] = None,
+                 max_rows: Optional[int] = None, prune_interval: float = 600.0):
+        self.path = str(path)
+        self.batch_size = batch_size
+        self.max_age = max_age
+        self.max_rows = max_rows
+        self.prune_interval = prune_interval
+        self._last_prune: Optional[float] = None
+        self.pruned = 0  # 清理删除的消息数
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+        self._queue: queue.Queue = queue.Queue()
+        self.batches = 0
+        self._writer = threading.Thread(target=self._run, name="history-writer", daemon=True)
+        self._writer.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def append(self, session_id: str, role: str, content: str, tokens: int):
+        self._queue.put_nowait(("append", session_id, role, content, tokens, time.time()))
+
+    def save_summary(self, session_id: str, summary: str):
+        self._queue.put_nowait(("summary", session_id, summary, time.time()))
+
+    def clear(self, session_id: str):
+        self._queue.put_nowait(("clear", session_id))
+
+    def _run(self):
+        conn = self._connect()
+        try:
+            while True:
+                batch = [self._queue.get()]
+                # 取走队列中已有的写操作，合并为一个事务
+                while len(batch) < self.batch_size:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                stop = _STOP in batch
+                ops = [op for op in batch if op is not _STOP]
+                try:
+                    if ops:
+                        self._write(conn, ops)
+                        self.batches += 1
+                except sqlite3.Error as e:
+                    logger.error(f"写入对话历史失败，丢弃 {len(ops)} 条操作: {str(e)}")
+                try:
+                    if ops:
+                        self._maybe_prune(conn)
+                except sqlite3.Error as e:
+                    logger.error(f"清理对话历史失败: {str(e)}")
+                finally:
+                    for _ in batch:
+                        self._queue.task_done()
+                if stop:
+                    return
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _write(conn: sqlite3.Connection, ops: list[tuple]):
+        with conn:
+            for op in ops:
+                kind = op[0]
+                if kind == "append":
+                    conn.execute(
+                        "INSERT INTO messages (session_id, role, content, tokens, created_at) VALUES (?, ?, ?, ?, ?)",
+                        op[1:]
+                    )
+                elif kind == "summary":
+                    conn.execute(
+                        "INSERT OR REPLACE INTO summaries (session_id, summary, updated_at) VALUES (?, ?, ?)",
+                        op[1:]
+                    )
+                elif kind == "clear":
+                    conn.execute("DELETE FROM messages WHERE session_id = ?", op[1:])
+                    conn.execute("DELETE FROM summaries WHERE session_id = ?", op[1:])
+
+    def _maybe_prune(self, conn: sqlite3.Connection):
+        if self.max_age is None and self.max_rows is None:
+            return
+        now = time.monotonic()
+        if self._last_prune is not None and now - self._last_prune < self.prune_interval:
+            return
+        self._last_prune = now
+        with conn:
+            deleted = 0
+            if self.max_age is not None:
+                cutoff = time.time() - self.max_age
+                deleted += conn.execute("DELETE FROM messages WHERE created_at < ?", (cutoff,)).rowcount
+            if self.max_rows is not None:
+                deleted += conn.execute(
+                    "DELETE FROM messages WHERE id <= "
+                    "(SELECT id FROM messages ORDER BY id DESC LIMIT 1 OFFSET ?)",
+                    (self.max_rows,)
+                ).rowcount
+            if deleted:
+                conn.execute("DELETE FROM summaries WHERE session_id NOT IN (SELECT session_id FROM messages)")
+        if deleted:
+            self.pruned += deleted
+            logger.info(f"清理过期的对话历史 {deleted} 条")
+
+    def flush(self):
+        """阻塞等待队列中的写操作完成"""
+        self._queue.join()
+
+    def _load(self, session_id: str, max_tokens: int) -> tuple[list[StoredTurn], str]:
+        # 先等待本会话之前的写入落盘，避免刚淘汰又恢复的会话读不到最新消息
+        self.flush()
+        conn = self._connect()
+        try:
+            turns: list[StoredTurn] = []
+            total = 0
+            rows = conn.execute(
+                "SELECT role, content, tokens FROM messages WHERE session_id = ? ORDER BY id DESC",
+                (session_id,)
+            )
+            for role, content, tokens in rows:
+                if total + tokens > max_tokens:
+                    break
+                turns.append((role, content, tokens))
+                total += tokens
+            turns.reverse()
+            # 从 user 消息开始，保持 user/assistant 交替
+            while turns and turns[0][0] != "user":
+                turns.pop(0)
+            row = conn.execute("SELECT summary FROM summaries WHERE session_id = ?", (session_id,)).fetchone()
+            return turns, row[0] if row else ""
+        finally:
+            conn.close()
+
+    async def load(self, session_id: str, max_tokens: int) -> tuple[list[StoredTurn], str]:
+        return await asyncio.to_thread(self._load, session_id, max_tokens)
+
+    async def close(self):
+        """写完队列中剩余的操作后停止后台线程"""
+        if _stores.get(self.path) is self:
+            del _stores[self.path]
+        if self._writer.is_alive():
+            self._queue.put_nowait(_STOP)
+            await asyncio.to_thread(self._writer.join)
+
+
+_stores: dict[str, SQLiteHistoryStore] = {}
+
+
+def get_history_store(path: Optional[str]) -> Optional[SQLiteHistoryStore]:
+    """获取指定路径的共享存储，path 为空时不持久化
+
+    消息保留天数取 CHAT_HISTORY_MAX_AGE_DAYS（默认 30），总消息数上限取
+    CHAT_HISTORY_MAX_ROWS（默认 100000），设为 0 表示不限。
+    """
+    if not path:
+        return None
+    store = _stores.get(path)
+    if store is None:
+        max_age_days = float(os.getenv("CHAT_HISTORY_MAX_AGE_DAYS", "30"))
+        max_rows = int(os.getenv("CHAT_HISTORY_MAX_ROWS", "100000"))
+        store = _stores[path] = SQLiteHistoryStore(
+            path,
+            max_age=max_age_days * 86400 if max_age_days > 0 else None,
+            max_rows=max_rows if max_rows > 0 else None
+        )
+    return store
@@ -0,0 +1,240 @@
+import json
+import time
+import asyncio
+import hashlib
+import logging
+from collections import Counter
+from dataclasses import dataclass
+from typing import Optional
+
+from src.chat.history import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+_WORDS = ("Honey never spoils because its low moisture and acidic pH keep bacteria away . "
+          "Bees visit about two million flowers to make one pound of it !").split()
+
+
+def reply_tokens(count: int) -> list[str]:
+    """模拟回复的 token 序列，内容固定以便结果可复现"""
+    return [(" " if i else "") + _WORDS[i % len(_WORDS)] for i in range(count)]
+
+
+@dataclass
+class MockProfile:
+    """模拟服务的延迟参数"""
+    ttft_ms: float = 80.0  # 固定的首字延迟
+    prefill_ms_per_token: float = 0.2  # 未命中缓存的提示词每 token 额外延迟
+    inter_token_ms: float = 15.0
+    reply_tokens: int = 40
+
+
+class MockLLMServer:
+    """本地模拟 LLM 服务，兼容 DeepSeek、文心一言和 Ollama 的流式接口
+
+    DeepSeek 模拟前缀缓存（命中的提示词不计 prefill 延迟），Ollama 的
+    /api/generate 模拟 context 复用，便于离线复现基准测试结果。
+    """
+
+    def __init__(self, profile: Optional[MockProfile] = None, host: str = "127.0.0.1", port: int = 0):
+        self.profile = profile or MockProfile()
+        self.host = host
+        self.port = port
+        self.requests = 0
+        self.paths: Counter[str] = Counter()  # 按路径统计的请求数
+        self.aborted = 0  # 生成过程中被客户端断开的流
+        self._server: Optional[asyncio.base_events.Server] = None
+        self._prefixes: set[str] = set()
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        logger.info(f"模拟 LLM 服务已启动: {self.url}")
+
+    async def stop(self):
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.stop()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                request_line, *header_lines = head.decode("latin-1").split("\r\n")
+                method, target, _ = request_line.split(" ", 2)
+                headers = {}
+                for line in header_lines:
+                    if ": " in line:
+                        name, value = line.split(": ", 1)
+                        headers[name.lower()] = value
+                length = int(headers.get("content-length", 0))
+                body = json.loads(await reader.readexactly(length)) if length else {}
+                path = target.split("?", 1)[0]
+                self.requests += 1
+                self.paths[path] += 1
+                await self._route(method, path, body, writer)
+        except asyncio.IncompleteReadError:
+            pass  # 客户端在两次请求之间关闭连接
+        except (ConnectionResetError, BrokenPipeError):
+            self.aborted += 1
+        finally:
+            writer.close()
+
+    async def _route(self, method: str, path: str, body: dict, writer: asyncio.StreamWriter):
+        if method == "GET" and path == "/api/version":
+            await self._send_json(writer, {"version": "mock"})
+        elif path == "/oauth/2.0/token":
+            await self._send_json(writer, {"access_token": "mock-token", "expires_in": 2592000})
+        elif path.endswith("/chat/completions") and "wenxinworkshop" not in path:
+            await self._deepseek(body, writer)
+        elif "wenxinworkshop" in path:
+            await self._ernie(body, writer)
+        elif path == "/api/chat":
+            await self._ollama(body, writer, generate=False)
+        elif path == "/api/generate":
+            if not body.get("prompt"):
+                await self._send_json(writer, {"model": body.get("model"), "done": True, "load_duration": 0})
+            else:
+                await self._ollama(body, writer, generate=True)
+        else:
+            await self._send_json(writer, {"error": f"unknown path {path}"}, status="404 Not Found")
+
+    async def _send_json(self, writer, data: dict, status: str = "200 OK"):
+        body = json.dumps(data).encode()
+        writer.write(f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\n"
+                     f"Content-Length: {len(body)}\r\n\r\n".encode() + body)
+        await writer.drain()
+
+    async def _start_stream(self, writer, content_type: str):
+        writer.write(f"HTTP/1.1 200 OK\r\nContent-Type: {content_type}\r\n"
+                     f"Transfer-Encoding: chunked\r\n\r\n".encode())
+
+    async def _send_chunk(self, writer, data: bytes):
+        writer.write(b"%x\r\n%s\r\n" % (len(data), data))
+        await writer.drain()
+
+    async def _end_stream(self, writer):
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+    async def _emit_tokens(self, writer, prefill_tokens: int, encode):
+        """按延迟参数逐个发送 token，encode 把 token 转为一个数据块"""
+        profile = self.profile
+        await asyncio.sleep((profile.ttft_ms + prefill_tokens * profile.prefill_ms_per_token) / 1000)
+        tokens = reply_tokens(profile.reply_tokens)
+        for i, token in enumerate(tokens):
+            if i:
+                await asyncio.sleep(profile.inter_token_ms / 1000)
+            await self._send_chunk(writer, encode(token))
+        return tokens
+
+    def _cache_hit_tokens(self, messages: list[dict]) -> int:
+        """模拟前缀缓存：返回已见过的最长消息前缀的 token 数，并记录本次前缀"""
+        hit = 0
+        digest = hashlib.sha1()
+        tokens = 0
+        for message in messages:
+            digest.update(json.dumps(message, ensure_ascii=False, sort_keys=True).encode())
+            tokens += estimate_tokens(message.get("content", "")) + 4
+            key = digest.hexdigest()
+            if key in self._prefixes:
+                hit = tokens
+            self._prefixes.add(key)
+        return hit
+
+    async def _deepseek(self, body: dict, writer):
+        messages = body.get("messages", [])
+        prompt_tokens = sum(estimate_tokens(m.get("content", "")) + 4 for m in messages)
+        hit = self._cache_hit_tokens(messages)
+        await self._start_stream(writer, "text/event-stream")
+
+        def encode(token):
+            chunk = {"object": "chat.completion.chunk", "model": body.get("model"),
+                     "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}]}
+            return b"data: " + json.dumps(chunk).encode() + b"\n\n"
+
+        tokens = await self._emit_tokens(writer, prompt_tokens - hit, encode)
+        if body.get("stream_options", {}).get("include_usage"):
+            usage = {"prompt_tokens": prompt_tokens, "completion_tokens": len(tokens),
+                     "total_tokens": prompt_tokens + len(tokens),
+                     "prompt_cache_hit_tokens": hit, "prompt_cache_miss_tokens": prompt_tokens - hit}
+            await self._send_chunk(writer, b"data: " + json.dumps({"choices": [], "usage": usage}).encode() + b"\n\n")
+        await self._send_chunk(writer, b"data: [DONE]\n\n")
+        await self._end_stream(writer)
+
+    async def _ernie(self, body: dict, writer):
+        messages = body.get("messages", [])
+        prompt_tokens = sum(estimate_tokens(m.get("content", "")) for m in messages)
+        await self._start_stream(writer, "text/event-stream")
+        sent = 0
+
+        def encode(token):
+            nonlocal sent
+            sent += 1
+            chunk = {"result": token, "is_end": False,
+                     "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": sent}}
+            return b"data: " + json.dumps(chunk).encode() + b"\n\n"
+
+        await self._emit_tokens(writer, prompt_tokens, encode)
+        final = {"result": "", "is_end": True,
+                 "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": sent}}
+        await self._send_chunk(writer, b"data: " + json.dumps(final).encode() + b"\n\n")
+        await self._end_stream(writer)
+
+    async def _ollama(self, body: dict, writer, generate: bool):
+        if generate:
+            context = body.get("context") or []
+            new_tokens = estimate_tokens(body.get("prompt", "")) + estimate_tokens(body.get("system", ""))
+        else:
+            context = []
+            new_tokens = sum(estimate_tokens(m.get("content", "")) + 4 for m in body.get("messages", []))
+        await self._start_stream(writer, "application/x-ndjson")
+        started = time.perf_counter()
+
+        def encode(token):
+            if generate:
+                chunk = {"model": body.get("model"), "response": token, "done": False}
+            else:
+                chunk = {"model": body.get("model"), "message": {"role": "assistant", "content": token}, "done": False}
+            return json.dumps(chunk).encode() + b"\n"
+
+        tokens = await self._emit_tokens(writer, new_tokens, encode)
+        final = {
+            "model": body.get("model"),
+            "done": True,
+            "eval_count": len(tokens),
+            "prompt_eval_count": new_tokens,
+            "prompt_eval_duration": int((self.profile.ttft_ms + new_tokens * self.profile.prefill_ms_per_token) * 1e6),
+            "total_duration": int((time.perf_counter() - started) * 1e9),
+        }
+        if generate:
+            final["response"] = ""
+            final["context"] = context + list(range(len(context), len(context) + new_tokens + len(tokens)))
+        else:
+            final["message"] = {"role": "assistant", "content": ""}
+        await self._send_chunk(writer, json.dumps(final).encode() + b"\n")
+        await self._end_stream(writer)
+
+
+async def serve(port: int = 18080):
+    """独立运行模拟服务"""
+    async with MockLLMServer(port=port) as server:
+        print(f"模拟 LLM 服务: {server.url}")
+        await asyncio.Event().wait()
+
+
+if __name__ == "__main__":
+    import sys
+    asyncio.run(serve(int(sys.argv[1]) if len(sys.argv) > 1 else 18080))
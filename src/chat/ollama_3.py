@@ -6,127 +6,218 @@ from pathlib import Path
 root_dir = Path(__file__).resolve().parent.parent.parent
 sys.path.append(str(root_dir))
 
-import json
-import requests
-from typing import AsyncGenerator
+import httpx
+from dataclasses import dataclass
+from typing import AsyncGenerator, Optional
 import asyncio
 from src.chat.base_chat import BaseChat, logger
+from src.chat.health import get_monitor
+from src.chat.stream_client import StreamError, StreamRequest, StreamResult, get_client
+
+@dataclass
+class PromptEvalStats:
+    """本地模式下单轮对话的提示词评估统计"""
+    reused_tokens: int  # 通过 context 复用、无需重新评估的 token 数
+    evaluated_tokens: int  # 本轮实际评估的 token 数
+    eval_ms: float  # 本轮提示词评估耗时
+
+    @property
+    def saved_ms(self) -> float:
+        """按本轮每 token 评估耗时估算复用 context 节省的时间"""
+        if not self.evaluated_tokens:
+            return 0.0
+        return self.reused_tokens * self.eval_ms / self.evaluated_tokens
+
 
 class OllamaChat(BaseChat):
-    """Ollama 聊天实现"""
+    """Ollama 聊天实现
+
+    设置 OLLAMA_MODE=local 时使用本机 Ollama：启动时预加载模型并通过
+    keep_alive 常驻内存，对话改用 /api/generate 并复用返回的 context，
+    每轮只评估新增的提示词。context 只在历史与其一致时复用：历史超出
+    预算被移出、被清空或被替换后放弃 context，下一轮把保留的历史
+    （含摘要）作为提示词重新评估。
+    """
+
+    # 只发送系统提示和本轮输入，历史不随请求发送也无需摘要
+    history_window = 0
+    summarize_history = False
+    # 已预加载的 (base_url, model)，进程内只预加载一次
+    _preloaded: set[tuple[str, str]] = set()
     
     def __init__(self):
         api_key = os.getenv("OLLAMA_API_KEY", "")
         super().__init__(api_key)
         
-        # 设置远程服务器地址
-        self.base_url = "http://159.138.21.8:11434"
-        self.model = "llama3.2-vision"  # 固定使用这个模型
+        self.local_mode = os.getenv("OLLAMA_MODE", "remote").lower() == "local"
+        default_url = "http://127.0.0.1:11434" if self.local_mode else "http://159.138.21.8:11434"
+        # 设置服务器地址
+        self.base_url = os.getenv("OLLAMA_BASE_URL", default_url)
+        self.model = os.getenv("OLLAMA_MODEL", "llama3.2-vision")
+        self.keep_alive = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
         
-        # 设置请求头和超时
+        # 设置请求头
         self.headers = {
             "Content-Type": "application/json",
             "Accept": "application/json"
         }
-        self.timeout = 30
-        
         # 添加系统提示，限制只用英语回复
         self.system_prompt = {
             "role": "system",
             "content": "You are a helpful AI assistant. Always respond in English, regardless of the input language. Keep your responses clear and concise. 只能使用英文回答，禁止使用其它语言，回答问题时，所有输出只能是英文"
         }
         
+        # 本地模式下上一轮返回的 context 及各轮提示词评估统计
+        self._context: Optional[list[int]] = None
+        self._context_mark = None  # 获得 context 时的历史状态，见 _history_mark
+        self._pending_event: Optional[dict] = None  # 本轮结束事件，记录本轮时才采用其 context
+        if self.local_mode:
+            # 超出预算时一次移出到一半，context 每批移出只重建一次，而不是每轮都重建
+            self.history.low_water = self.history.max_tokens // 2
+        self.prompt_eval_history: list[PromptEvalStats] = []
+        
         logger.info(f"初始化 OllamaChat，使用模型: {self.model}")
-        logger.info(f"服务器地址: {self.base_url}")
+        logger.info(f"服务器地址: {self.base_url}{' (本地模式)' if self.local_mode else ''}")
         
-        # 尝试连接服务器，但不阻止初始化
-        self._try_server_connection()
+        # 后台监控服务器状态，不阻止初始化
+        self.health = get_monitor(self.base_url, "/api/version")
+        self.health.start()
+        if self.local_mode:
+            try:
+                asyncio.get_running_loop().create_task(self.preload())
+            except RuntimeError:
+                pass  # 没有运行中的事件循环，首次对话时再预加载
     
-    def _try_server_connection(self):
-        """尝试连接服务器，但不抛出异常"""
+    async def preload(self):
+        """预加载模型并通过 keep_alive 保持常驻"""
+        key = (self.base_url, self.model)
+        if key in self._preloaded:
+            return
+        self._preloaded.add(key)
         try:
-            response = requests.get(
-                f"{self.base_url}/api/version",
-                headers=self.headers,
-                timeout=self.timeout
+            response = await get_client(self.base_url).post(
+                "/api/generate",
+                json={"model": self.model, "keep_alive": self.keep_alive},
+                timeout=120.0
             )
             response.raise_for_status()
-            logger.info("Ollama 服务器连接成功")
-            return True
-        except requests.exceptions.RequestException as e:
-            logger.warning(f"Ollama 服务器连接警告: {str(e)}")
-            return False
-    
-    async def stream_chat(self, user_input: str) -> AsyncGenerator[str, None]:
+            load_ms = response.json().get("load_duration", 0) / 1e6
+            logger.info(f"Ollama 模型已预加载: {self.model}，加载耗时 {load_ms:.0f} ms")
+        except httpx.HTTPError as e:
+            self._preloaded.discard(key)
+            logger.warning(f"Ollama 模型预加载失败: {str(e)}")
+
+    async def _prepare(self):
+        # 读取缓存的服务器状态，不可用时立即失败
+        self.health.start()
+        if not self.health.is_available():
+            raise ConnectionError(f"无法连接到 Ollama 服务器，请检查网络连接 ({self.health.last_error})")
+        if self.local_mode:
+            await self.preload()
+
+    def _build_request(self, messages: list[dict]) -> StreamRequest:
+        if self.local_mode:
+            payload = {
+                "model": self.model,
+                "prompt": messages[-1]["content"],
+                "stream": True,
+                "keep_alive": self.keep_alive
+            }
+            if self._context and self._history_mark() != self._context_mark:
+                logger.info("对话历史已变化，放弃 Ollama context 并按历史重建")
+                self._context = None
+            if self._context:
+                payload["context"] = self._context
+            else:
+                payload["system"] = self.system_prompt["content"]
+                payload["prompt"] = self._history_prompt(messages[-1]["content"])
+            path = "/api/generate"
+        else:
+            payload = {
+                "model": self.model,
+                "messages": messages,
+                "stream": True
+            }
+            path = "/api/chat"
+        return StreamRequest(
+            base_url=self.base_url,
+            path=path,
+            payload=payload,
+            headers=self.headers,
+            wire_format="ndjson"
+        )
+
+    def _parse_event(self, event: dict) -> Optional[str]:
+        if "error" in event:
+            raise StreamError(500, event["error"])
+        if self.local_mode:
+            return event.get("response")
+        return event.get("message", {}).get("content")
+
+    def _completion_tokens(self, event: dict) -> Optional[int]:
+        return event.get("eval_count")
+
+    async def _stream_messages(self, messages: list[dict], result: StreamResult,
+                               background: bool = False) -> AsyncGenerator[str, None]:
+        if not background:
+            self._pending_event = None
+        async for content in super()._stream_messages(messages, result, background):
+            yield content
+        if self.local_mode and not background and result.last_event and result.last_event.get("done"):
+            self._pending_event = result.last_event
+
+    def _history_mark(self) -> tuple:
+        """历史对象、消息条数和最后一条消息，任何一项变化都说明 context 已过时"""
+        return self.history, len(self.history), self.history.messages(1)
+
+    def _history_prompt(self, user_input: str) -> str:
+        """没有可用的 context 时，把保留的历史和本轮输入合并为提示词"""
+        lines = [f"{m['role']}: {m['content']}" for m in self.history.messages()]
+        if not lines:
+            return user_input
+        return "\n".join(lines + [f"user: {user_input}"])
+
+    def _record_turn(self, user_input: str, response: str):
+        # context 与历史一同更新，未被采用的回复（如未命中的预取）不会留在 context 中
+        before = len(self.history)
+        super()._record_turn(user_input, response)
+        event, self._pending_event = self._pending_event, None
+        if event is None:
+            return
+        if len(self.history) != before + 2:
+            # 本轮记录后历史超出预算，context 仍包含被移出的消息
+            self._context = None
+            return
+        self._update_context(event)
+        self._context_mark = self._history_mark()
+
+    def _update_context(self, event: dict):
+        """保存本轮返回的 context，并记录复用节省的评估时间"""
+        stats = PromptEvalStats(
+            reused_tokens=len(self._context or []),
+            evaluated_tokens=event.get("prompt_eval_count", 0),
+            eval_ms=event.get("prompt_eval_duration", 0) / 1e6
+        )
+        self.prompt_eval_history.append(stats)
+        self._context = event.get("context") or None
+        logger.info(
+            f"提示词评估: 复用 {stats.reused_tokens} tokens, 新评估 {stats.evaluated_tokens} tokens, "
+            f"耗时 {stats.eval_ms:.0f} ms, 节省约 {stats.saved_ms:.0f} ms"
+        )
+
+    def reset_conversation(self):
+        """重置对话历史和 context"""
+        super().reset_conversation()
+        self._context = None
+
+    async def stream_chat(self, user_input: str, defer: Optional[list] = None) -> AsyncGenerator[str, None]:
         """流式对话实现"""
         print('--------------------------------')
         print(f"开始流式对话，用户输入: {user_input}")
         print(f"使用服务器: {self.base_url}")
         print('--------------------------------')
-        
-        # 在每次对话前检查连接
-        if not self._try_server_connection():
-            yield "Error: 无法连接到 Ollama 服务器，请检查网络连接"
-            return
-            
-        try:
-            # 准备消息，添加系统提示
-            messages = [
-                self.system_prompt,
-                {"role": "user", "content": user_input}
-            ]
-            
-            # 准备请求数据
-            data = {
-                "model": self.model,
-                "messages": messages,
-                "stream": True
-            }
-            
-            url = f"{self.base_url}/api/chat"
-            
-            try:
-                response = requests.post(
-                    url,
-                    json=data,
-                    headers=self.headers,
-                    stream=True,
-                    timeout=self.timeout
-                )
-                response.raise_for_status()
-                
-                full_response = ""
-                for line in response.iter_lines():
-                    if self._stop_streaming:
-                        break
-                        
-                    if line:
-                        try:
-                            json_response = json.loads(line)
-                            if "message" in json_response:
-                                content = json_response["message"]["content"]
-                                full_response += content
-                                yield content
-                                
-                        except json.JSONDecodeError:
-                            continue
-                            
-                # 保存到对话历史
-                if full_response:
-                    self.conversation_history.append({
-                        "role": "assistant",
-                        "content": full_response
-                    })
-                    
-            except requests.exceptions.RequestException as e:
-                error_msg = f"API 请求错误: {str(e)}"
-                logger.error(error_msg)
-                yield f"Error: {error_msg}"
-                
-        except Exception as e:
-            error_msg = f"Stream chat 出错: {str(e)}"
-            logger.error(error_msg)
-            yield f"Error: {error_msg}"
+        async for content in super().stream_chat(user_input, defer):
+            yield content
     
  
 async def test():
@@ -0,0 +1,163 @@
+import re
+import asyncio
+import logging
+import unicodedata
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import AsyncGenerator, Optional
+
+logger = logging.getLogger(__name__)
+
+_STRIP_RE = re.compile(r"[\W_]+", re.UNICODE)
+# 英文单词、数字串或单个其他文字（如汉字）各算一个词
+_TOKEN_RE = re.compile(r"[a-z]+|\d+|[^\W\d_a-z]", re.UNICODE)
+
+
+def normalize(text: str) -> str:
+    """归一化问题文本：全半角统一、小写、去掉标点和空白"""
+    return _STRIP_RE.sub("", unicodedata.normalize("NFKC", text).lower())
+
+
+def char_ngrams(text: str, n: int = 2) -> frozenset[str]:
+    """字符 n-gram 集合，中英文通用"""
+    if len(text) <= n:
+        return frozenset([text]) if text else frozenset()
+    return frozenset(text[i:i + n] for i in range(len(text) - n + 1))
+
+
+def tokens(text: str) -> list[str]:
+    """按词切分归一化前的文本，用于判断两个问题的具体差别"""
+    return _TOKEN_RE.findall(unicodedata.normalize("NFKC", text).lower())
+
+
+def indel_distance(a: list[str], b: list[str]) -> int:
+    """只允许插入和删除时，把 a 变成 b 需要的步数"""
+    previous = [0] * (len(b) + 1)
+    for x in a:
+        current = [0]
+        for j, y in enumerate(b):
+            current.append(previous[j] + 1 if x == y else max(previous[j + 1], current[j]))
+        previous = current
+    return len(a) + len(b) - 2 * previous[-1]
+
+
+def similarity(a: frozenset[str], b: frozenset[str]) -> float:
+    """n-gram 集合的 Jaccard 相似度"""
+    if not a or not b:
+        return 0.0
+    common = len(a & b)
+    return common / (len(a) + len(b) - common)
+
+
+@dataclass
+class _Entry:
+    grams: frozenset[str]
+    tokens: list[str]
+    response: str
+
+
+class ResponseCache:
+    """首轮问题的回复缓存
+
+    先按归一化文本精确匹配，未命中时通过 n-gram 倒排索引找相似度不低于
+    threshold 的候选。只差一个数字或名称的问题（"23 乘 47" 与 "23 乘 48"）
+    n-gram 相似度同样很高，答错比未命中更糟，因此近似命中还要求两个问题
+    只差不超过 max_edits 个插入或删除的词（如语气词），且不涉及数字；
+    替换任何一个词都不算命中。容量满时按 LRU 淘汰。
+    """
+
+    def __init__(self, max_entries: int = 256, threshold: float = 0.75, ngram: int = 2,
+                 max_edits: int = 1):
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.ngram = ngram
+        self.max_edits = max_edits
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()
+        self._index: dict[str, set[str]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, text: str) -> Optional[str]:
+        key = normalize(text)
+        if not key:
+            return None
+        entry = self._entries.get(key)
+        if entry is None:
+            key = self._find_similar(char_ngrams(key, self.ngram), tokens(text))
+            entry = self._entries.get(key) if key else None
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry.response
+
+    def _close_enough(self, query: list[str], cached: list[str]) -> bool:
+        if indel_distance(query, cached) > self.max_edits:
+            return False
+        # 数字必须完全一致
+        return [t for t in query if t.isdigit()] == [t for t in cached if t.isdigit()]
+
+    def _find_similar(self, grams: frozenset[str], query: list[str]) -> Optional[str]:
+        # 统计与候选共有的 n-gram 数，只对有交集的条目计算相似度
+        overlap: dict[str, int] = {}
+        for gram in grams:
+            for key in self._index.get(gram, ()):
+                overlap[key] = overlap.get(key, 0) + 1
+        best_key, best_score = None, self.threshold
+        for key, common in overlap.items():
+            other = self._entries[key].grams
+            score = common / (len(grams) + len(other) - common)
+            if score >= best_score and self._close_enough(query, self._entries[key].tokens):
+                best_key, best_score = key, score
+        return best_key
+
+    def put(self, text: str, response: str):
+        key = normalize(text)
+        if not key or not response:
+            return
+        if key in self._entries:
+            self._entries[key].response = response
+            self._entries.move_to_end(key)
+            return
+        grams = char_ngrams(key, self.ngram)
+        self._entries[key] = _Entry(grams, tokens(text), response)
+        for gram in grams:
+            self._index.setdefault(gram, set()).add(key)
+        while len(self._entries) > self.max_entries:
+            self._evict()
+
+    def _evict(self):
+        key, entry = self._entries.popitem(last=False)
+        for gram in entry.grams:
+            keys = self._index.get(gram)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._index[gram]
+
+    def clear(self):
+        self._entries.clear()
+        self._index.clear()
+
+
+async def replay(response: str, chunk_chars: int = 16) -> AsyncGenerator[str, None]:
+    """把缓存的回复按小片段模拟为流式输出"""
+    for start in range(0, len(response), chunk_chars):
+        yield response[start:start + chunk_chars]
+        await asyncio.sleep(0)  # 让出事件循环
+
+
+# 进程内共享，按后端类型区分
+_caches: dict[str, ResponseCache] = {}
+
+
+def get_response_cache(namespace: str) -> ResponseCache:
+    """获取指定后端的共享回复缓存"""
+    cache = _caches.get(namespace)
+    if cache is None:
+        cache = _caches[namespace] = ResponseCache()
+    return cache
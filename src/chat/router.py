@@ -0,0 +1,153 @@
+import os
+import time
+from dataclasses import dataclass
+from typing import AsyncGenerator, Optional
+
+from src.chat.base_chat import BaseChat, logger
+from src.chat.history import ConversationHistory
+
+
+@dataclass
+class BackendMetrics:
+    """单个后端的 EWMA 延迟与错误率"""
+    alpha: float = 0.3
+    ttft_ms: Optional[float] = None
+    error_rate: float = 0.0
+    turns: int = 0
+    last_used: float = 0.0
+
+    def observe(self, ttft_ms: Optional[float], error: bool):
+        self.turns += 1
+        self.last_used = time.monotonic()
+        self.error_rate += self.alpha * ((1.0 if error else 0.0) - self.error_rate)
+        if ttft_ms is not None:
+            self.ttft_ms = ttft_ms if self.ttft_ms is None else self.ttft_ms + self.alpha * (ttft_ms - self.ttft_ms)
+
+    def expected_ms(self, slo_ms: float) -> float:
+        """出错按两倍 SLO 计算的期望首字延迟"""
+        if self.ttft_ms is None:
+            return 2 * slo_ms
+        return self.ttft_ms * (1 - self.error_rate) + 2 * slo_ms * self.error_rate
+
+    def meets(self, slo_ms: float, max_error_rate: float) -> bool:
+        return self.ttft_ms is not None and self.ttft_ms <= slo_ms and self.error_rate <= max_error_rate
+
+
+class RoutingChat:
+    """按延迟 SLO 路由的聊天实现
+
+    包装多个后端并为每个后端维护 EWMA 首字延迟和错误率。每轮对话选择
+    满足 SLO 且按配置顺序最靠前的后端；都不满足时选择期望延迟最低的。
+    首字之前出错会切换到下一个后端重试，输出中途出错无法重试，但同样计入
+    该后端的错误率。
+
+    自身不发送请求，因此不继承 BaseChat，只提供相同的对话接口
+    （stream_chat、history、stop_streaming 等），每轮交给选中后端的
+    stream_chat 完成。路由持有唯一的对话历史，创建时替换各后端的
+    history，切换后端不会丢失上下文；后端必须是尚无历史的新实例，
+    否则其已有的历史会被丢弃，因此直接报错。
+    """
+
+    def __init__(self, backends: dict[str, BaseChat], slo_ms: float = 1500.0,
+                 max_error_rate: float = 0.3, explore_after: float = 60.0):
+        if not backends:
+            raise ValueError("至少需要一个聊天后端")
+        for name, backend in backends.items():
+            if len(backend.history) or backend.history.summary:
+                raise ValueError(f"后端 {name} 已有对话历史，路由会替换为共享的历史")
+        self.backends = backends
+        self.slo_ms = slo_ms
+        self.max_error_rate = max_error_rate
+        self.explore_after = explore_after  # 超过该秒数未使用的后端重新视为未知
+        self.metrics = {name: BackendMetrics() for name in backends}
+        self.current: Optional[str] = None
+        self.last_stats = None
+        self.history = ConversationHistory(
+            max_tokens=int(os.getenv("CHAT_HISTORY_MAX_TOKENS", "1500")),
+            summarizer=self._summarize,
+            # 沿用后端一次移出更多历史的设置（如 DeepSeek append 模式保持前缀缓存）
+            low_water=min(backend.history.low_water for backend in backends.values())
+        )
+        for backend in backends.values():
+            backend.history = self.history
+        logger.info(f"初始化 RoutingChat，后端: {list(backends)}，首字延迟 SLO: {slo_ms:.0f} ms")
+
+    @property
+    def conversation_history(self) -> list[dict]:
+        return self.history.messages()
+
+    def _is_unknown(self, metrics: BackendMetrics) -> bool:
+        return metrics.turns == 0 or time.monotonic() - metrics.last_used > self.explore_after
+
+    def select_backend(self, exclude: frozenset[str] = frozenset()) -> Optional[str]:
+        """选择本轮使用的后端"""
+        candidates = []
+        for name, backend in self.backends.items():
+            if name in exclude:
+                continue
+            if backend.health is not None and not backend.health.is_available():
+                continue
+            candidates.append(name)
+        if not candidates:
+            return None
+
+        for name in candidates:
+            metrics = self.metrics[name]
+            if self._is_unknown(metrics):
+                return name
+            if metrics.meets(self.slo_ms, self.max_error_rate):
+                return name
+        return min(candidates, key=lambda name: self.metrics[name].expected_ms(self.slo_ms))
+
+    async def _summarize(self, summary: str, messages: list[dict]) -> str:
+        # 优先用当前后端生成摘要，跳过不支持摘要的后端
+        names = [self.current] if self.current else []
+        names += [name for name in self.backends if name != self.current]
+        for name in names:
+            if self.backends[name].summarize_history:
+                return await self.backends[name]._summarize(summary, messages)
+        return summary
+
+    async def stream_chat(self, user_input: str, defer: Optional[list] = None) -> AsyncGenerator[str, None]:
+        """选择后端并转发流式回复，首字前出错时切换后端"""
+        tried: set[str] = set()
+        error = "Error: 没有可用的聊天后端"
+        while (name := self.select_backend(frozenset(tried))) is not None:
+            tried.add(name)
+            backend = self.backends[name]
+            if name != self.current:
+                logger.info(f"路由切换到后端: {name}")
+            self.current = name
+
+            start = time.perf_counter()
+            ttft_ms = None
+            failed = False
+            async for chunk in backend.stream_chat(user_input, defer):
+                if chunk.startswith("Error:"):
+                    # 输出中途出错同样计入错误率
+                    failed = True
+                    error = chunk
+                    if ttft_ms is None:
+                        break
+                elif ttft_ms is None:
+                    ttft_ms = (time.perf_counter() - start) * 1000
+                yield chunk
+            self.metrics[name].observe(ttft_ms, failed)
+            self.last_stats = backend.last_stats
+            if not failed or ttft_ms is not None:
+                return  # 成功，或已输出部分回复而无法换后端重试
+            logger.warning(f"后端 {name} 出错，尝试其他后端: {error}")
+        yield error
+
+    def stop_streaming(self):
+        for backend in self.backends.values():
+            backend.stop_streaming()
+
+    def reset_conversation(self):
+        # 后端共享路由的历史，逐个重置以清除各自的状态（如 Ollama context）
+        for backend in self.backends.values():
+            backend.reset_conversation()
+
+    async def close(self):
+        for backend in self.backends.values():
+            await backend.close()
@@ -0,0 +1,146 @@
+import time
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Optional
+
+from src.chat.base_chat import BaseChat
+from src.chat.history_store import HistoryStore
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _Session:
+    chat: BaseChat
+    active: int = 0  # 当前使用该会话的连接数
+    last_seen: float = field(default_factory=time.monotonic)
+    # 当前连接被新连接取代时的回调
+    on_replaced: Optional[Callable[[], Awaitable[None]]] = None
+
+
+class SessionManager:
+    """按客户端 session id 复用聊天实例
+
+    断线重连的浏览器拿回同一个聊天实例，对话历史、访问令牌、Ollama
+    context 等都无需重建。没有连接使用的会话超过 idle_ttl 秒后淘汰；
+    会话数超过 max_sessions 或历史总 token 数超过 max_total_tokens 时，
+    按最近最少使用的顺序淘汰空闲会话。提供 store 时会话历史会持久化，
+    被淘汰或服务重启后的会话在下次连接时从存储中恢复。
+
+    同一会话同时只服务一个连接：浏览器的多个标签页共享 localStorage 中
+    的 session id，若两个连接同时对话，历史会交错，一个标签页的停止也会
+    中断另一个的回复。新连接获取会话时先调用旧连接的 on_replaced，
+    由旧连接停止回复并断开。
+    """
+
+    def __init__(self, factory: Callable[[], BaseChat], max_sessions: int = 100,
+                 idle_ttl: float = 1800.0, max_total_tokens: int = 200_000,
+                 store: Optional[HistoryStore] = None):
+        self.factory = factory
+        self.store = store
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.max_total_tokens = max_total_tokens
+        self._sessions: OrderedDict[str, _Session] = OrderedDict()
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self._sessions
+
+    @property
+    def total_tokens(self) -> int:
+        return sum(session.chat.history.tokens for session in self._sessions.values())
+
+    async def acquire(self, session_id: str,
+                      on_replaced: Optional[Callable[[], Awaitable[None]]] = None) -> tuple[BaseChat, bool]:
+        """获取会话的聊天实例，返回 (chat, 是否为恢复的会话)
+
+        on_replaced 在本连接被同一会话的新连接取代时调用，应停止本连接
+        正在进行的回复。
+        """
+        await self._evict()
+        session = self._sessions.get(session_id)
+        resumed = session is not None
+        if session is None:
+            chat = self.factory()
+            if self.store is not None:
+                chat.history.attach(self.store, session_id)
+                await chat.history.restore()
+            session = self._sessions[session_id] = _Session(chat)
+            # 从存储恢复出历史的会话同样视为恢复
+            resumed = len(chat.history) > 0 or bool(chat.history.summary)
+            logger.info(f"新建会话 {session_id}，当前会话数: {len(self._sessions)}")
+        else:
+            logger.info(f"恢复会话 {session_id}，历史 {len(session.chat.history)} 条消息")
+            previous, session.on_replaced = session.on_replaced, None
+            if session.active and previous is not None:
+                logger.info(f"会话 {session_id} 在新连接中打开，断开之前的连接")
+                await previous()
+        session.on_replaced = on_replaced
+        self._sessions.move_to_end(session_id)
+        session.active += 1
+        session.last_seen = time.monotonic()
+        return session.chat, resumed
+
+    async def release(self, session_id: str, discard: bool = False):
+        """连接断开时调用；discard 为 True 时立即关闭会话并删除其持久化历史"""
+        session = self._sessions.get(session_id)
+        if session is None:
+            return
+        session.active = max(session.active - 1, 0)
+        session.last_seen = time.monotonic()
+        # 连接断开时可能仍在生成，停止以释放上游连接
+        if session.active == 0:
+            session.on_replaced = None
+            session.chat.stop_streaming()
+        if discard and session.active == 0:
+            await self._remove(session_id)
+            # 丢弃的会话（如匿名连接）不会再被恢复，删除其持久化的历史
+            if self.store is not None:
+                self.store.clear(session_id)
+        await self._evict()
+
+    async def _remove(self, session_id: str):
+        session = self._sessions.pop(session_id, None)
+        if session is None:
+            return  # 已被并发的淘汰移除
+        self.evictions += 1
+        try:
+            await session.chat.close()
+        except Exception as e:
+            logger.warning(f"关闭会话 {session_id} 失败: {str(e)}")
+
+    def _idle_victim(self) -> Optional[str]:
+        # OrderedDict 按最近使用排序，最前面的空闲会话最久未用
+        for session_id, session in self._sessions.items():
+            if session.active == 0:
+                return session_id
+        return None
+
+    async def _evict(self):
+        now = time.monotonic()
+        expired = [sid for sid, s in self._sessions.items()
+                   if s.active == 0 and now - s.last_seen > self.idle_ttl]
+        for session_id in expired:
+            logger.info(f"会话 {session_id} 空闲超时，已释放")
+            await self._remove(session_id)
+
+        total_tokens = self.total_tokens
+        while len(self._sessions) > self.max_sessions or total_tokens > self.max_total_tokens:
+            victim = self._idle_victim()
+            if victim is None:
+                break  # 都在使用中，暂时允许超出
+            logger.info(f"会话数或内存超出上限，淘汰最久未用的会话 {victim}")
+            total_tokens -= self._sessions[victim].chat.history.tokens
+            await self._remove(victim)
+
+    async def close(self):
+        """关闭所有会话，并等待历史写入完成"""
+        for session_id in list(self._sessions):
+            await self._remove(session_id)
+        if self.store is not None:
+            await self.store.close()
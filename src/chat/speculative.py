@@ -0,0 +1,156 @@
+import time
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import AsyncGenerator, Optional
+
+from src.chat.base_chat import BaseChat
+from src.chat.response_cache import char_ngrams, normalize, similarity
+
+logger = logging.getLogger(__name__)
+
+_END = object()
+
+
+@dataclass
+class SpeculationStats:
+    """预取的命中率与节省的首字延迟"""
+    turns: int = 0        # 提交的对话轮数
+    speculated: int = 0   # 提交时有预取在进行的轮数
+    hits: int = 0
+    saved_ms: float = 0.0
+    last_saved_ms: float = 0.0
+
+    @property
+    def misses(self) -> int:
+        return self.speculated - self.hits
+
+    @property
+    def hit_rate(self) -> float:
+        return self.hits / self.speculated if self.speculated else 0.0
+
+    def record_hit(self, saved_ms: float):
+        self.hits += 1
+        self.last_saved_ms = saved_ms
+        self.saved_ms += saved_ms
+
+    def summary(self) -> str:
+        avg = self.saved_ms / self.hits if self.hits else 0.0
+        return (f"预取 {self.speculated}/{self.turns} 轮，命中率 {self.hit_rate:.0%}，"
+                f"平均节省首字延迟 {avg:.0f} ms")
+
+
+class Speculator:
+    """根据稳定的部分转录提前发起对话请求
+
+    用户还在说话或语音识别尚未返回时，propose 用部分转录在后台开始
+    流式请求并缓存输出；commit 收到最终转录后，与预取文本的 n-gram
+    相似度不低于 threshold 时直接沿用进行中的流，否则取消预取并用最终
+    转录重新请求。预取的回复不直接写入对话历史和回复缓存，命中并完整
+    输出后才记录，记录的是预取时的文本，即模型实际回答的问题；未命中
+    或被取消的预取即使已经完成也不留下痕迹。
+    """
+
+    def __init__(self, chat: BaseChat, threshold: float = 0.8, min_chars: int = 4, ngram: int = 2):
+        self.chat = chat
+        self.threshold = threshold
+        self.min_chars = min_chars  # 归一化后短于该长度的部分转录不预取
+        self.ngram = ngram
+        self.stats = SpeculationStats()
+        self._task: Optional[asyncio.Task] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._deferred: list = []  # 预取完成后待采用的记录函数
+        self._grams: frozenset[str] = frozenset()
+        self._started = 0.0
+        self._first_at: Optional[float] = None
+        self._committing = False
+
+    @property
+    def active(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def _grams_of(self, text: str) -> frozenset[str]:
+        return char_ngrams(normalize(text), self.ngram)
+
+    def propose(self, partial: str):
+        """收到新的稳定部分转录，与进行中的预取差异过大时重新预取"""
+        if self._committing:
+            return  # 本轮已提交，迟到的部分转录不再预取
+        key = normalize(partial)
+        if len(key) < self.min_chars:
+            return
+        grams = char_ngrams(key, self.ngram)
+        if self._task is not None and similarity(grams, self._grams) >= self.threshold:
+            return
+        self.cancel()
+        self._grams = grams
+        self._queue = asyncio.Queue()
+        self._started = time.perf_counter()
+        self._first_at = None
+        self._deferred = []
+        self._task = asyncio.get_running_loop().create_task(self._run(partial, self._queue, self._deferred))
+        logger.info(f"根据部分转录预取回复: {partial}")
+
+    async def _run(self, text: str, queue: asyncio.Queue, deferred: list):
+        try:
+            async for content in self.chat.stream_chat(text, defer=deferred):
+                if self._first_at is None:
+                    self._first_at = time.perf_counter()
+                queue.put_nowait(content)
+        finally:
+            queue.put_nowait(_END)
+
+    def cancel(self):
+        """取消进行中的预取"""
+        task, self._task = self._task, None
+        if task is not None and not task.done():
+            task.cancel()
+
+    async def _discard(self, task: asyncio.Task):
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    async def commit(self, final: str) -> AsyncGenerator[str, None]:
+        """用最终转录开始本轮回复，命中预取时沿用已在进行的流"""
+        self._committing = True
+        self.stats.turns += 1
+        task, queue, self._task = self._task, self._queue, None
+        deferred = self._deferred
+        try:
+            if task is not None:
+                self.stats.speculated += 1
+                score = similarity(self._grams_of(final), self._grams)
+                if score >= self.threshold:
+                    async for content in self._replay(task, queue):
+                        yield content
+                    # 预取的回复已完整交给用户，此时才写入历史
+                    for record in deferred:
+                        record()
+                    return
+                logger.info(f"预取未命中（相似度 {score:.2f}），按最终转录重新请求，{self.stats.summary()}")
+                await self._discard(task)
+            async for content in self.chat.stream_chat(final):
+                yield content
+        finally:
+            self._committing = False
+            if task is not None and not task.done():
+                await self._discard(task)
+
+    async def _replay(self, task: asyncio.Task, queue: asyncio.Queue) -> AsyncGenerator[str, None]:
+        committed_at = time.perf_counter()
+        first = True
+        while (content := await queue.get()) is not _END:
+            if first:
+                first = False
+                # 不预取时首字在 committed_at + TTFT 到达
+                saved_ms = (min(committed_at, self._first_at) - self._started) * 1000
+                self.stats.record_hit(saved_ms)
+                logger.info(f"预取命中，节省首字延迟 {saved_ms:.0f} ms，{self.stats.summary()}")
+            yield content
+        if first:
+            self.stats.record_hit(0.0)
+        # 让预取任务中的异常照常抛出
+        await task
@@ -0,0 +1,257 @@
+import json
+import time
+import logging
+import weakref
+import asyncio
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+
+class StreamError(Exception):
+    """上游接口返回非 200 状态码"""
+
+    def __init__(self, status_code: int, body: str):
+        super().__init__(f"API 调用失败 ({status_code}): {body}")
+        self.status_code = status_code
+        self.body = body
+
+
+class _LineParser:
+    """增量按行切分字节流，跨 chunk 的半行与多字节字符会保留到下一次 feed"""
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self._scan_from = 0  # 已确认没有换行符的前缀长度，避免重复扫描
+
+    def _lines(self, chunk: bytes):
+        buffer = self._buffer
+        buffer += chunk
+        start = 0
+        while True:
+            newline = buffer.find(b"\n", max(start, self._scan_from))
+            if newline < 0:
+                break
+            line = bytes(buffer[start:newline])
+            start = newline + 1
+            if line.endswith(b"\r"):
+                line = line[:-1]
+            yield line
+        if start:
+            del buffer[:start]
+        self._scan_from = len(buffer)
+
+    def _tail(self) -> bytes:
+        line = bytes(self._buffer).rstrip(b"\r")
+        self._buffer.clear()
+        self._scan_from = 0
+        return line
+
+
+class SSEParser(_LineParser):
+    """增量 SSE 解析器，feed 原始字节，返回完整事件的 data 内容"""
+
+    def __init__(self):
+        super().__init__()
+        self._data: list[str] = []
+
+    def _handle_line(self, line: bytes, events: list[str]):
+        if not line:
+            # 空行表示一个事件结束
+            if self._data:
+                events.append("\n".join(self._data))
+                self._data = []
+            return
+        if line.startswith(b":"):
+            return  # 注释 / keep-alive
+        name, _, value = line.partition(b":")
+        if name == b"data":
+            if value.startswith(b" "):
+                value = value[1:]
+            self._data.append(value.decode("utf-8"))
+
+    def feed(self, chunk: bytes) -> list[str]:
+        events: list[str] = []
+        for line in self._lines(chunk):
+            self._handle_line(line, events)
+        return events
+
+    def close(self) -> list[str]:
+        """流结束时输出缓冲区中剩余的事件"""
+        events: list[str] = []
+        tail = self._tail()
+        if tail:
+            self._handle_line(tail, events)
+        self._handle_line(b"", events)
+        return events
+
+
+class NDJSONParser(_LineParser):
+    """增量 NDJSON 解析器（Ollama 使用），每行一个 JSON 对象"""
+
+    def feed(self, chunk: bytes) -> list[str]:
+        return [line.decode("utf-8") for line in self._lines(chunk) if line.strip()]
+
+    def close(self) -> list[str]:
+        tail = self._tail()
+        return [tail.decode("utf-8")] if tail.strip() else []
+
+
+@dataclass
+class StreamRequest:
+    """一次流式请求的描述，由各个后端构造"""
+    base_url: str
+    path: str
+    payload: dict
+    params: Optional[dict] = None
+    headers: Optional[dict] = None
+    wire_format: str = "sse"  # 'sse' 或 'ndjson'
+
+
+@dataclass
+class StreamStats:
+    """单次流式响应的延迟统计"""
+    started_at: float = field(default_factory=time.perf_counter)
+    first_token_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    chunks: int = 0
+    completion_tokens: Optional[int] = None  # 服务端返回的 token 数，缺失时按 chunk 数估计
+    cancelled: bool = False  # 是否被停止或取消
+
+    def mark_token(self):
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+        self.chunks += 1
+
+    def finish(self):
+        self.finished_at = time.perf_counter()
+
+    @property
+    def ttft_ms(self) -> Optional[float]:
+        if self.first_token_at is None:
+            return None
+        return (self.first_token_at - self.started_at) * 1000
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.finished_at if self.finished_at is not None else time.perf_counter()
+        return (end - self.started_at) * 1000
+
+    @property
+    def tokens(self) -> int:
+        return self.completion_tokens if self.completion_tokens is not None else self.chunks
+
+    @property
+    def tokens_per_sec(self) -> Optional[float]:
+        if self.first_token_at is None or self.finished_at is None:
+            return None
+        elapsed = self.finished_at - self.first_token_at
+        if elapsed <= 0:
+            return None
+        return self.tokens / elapsed
+
+    def summary(self) -> str:
+        ttft = f"{self.ttft_ms:.0f} ms" if self.ttft_ms is not None else "-"
+        tps = f"{self.tokens_per_sec:.1f}" if self.tokens_per_sec is not None else "-"
+        suffix = "（已中断）" if self.cancelled else ""
+        return f"首字延迟: {ttft}, 总耗时: {self.duration_ms:.0f} ms, tokens: {self.tokens}, 速度: {tps} tokens/s{suffix}"
+
+
+@dataclass
+class CancelStats:
+    """中途停止节省的生成量，按历史平均回复长度估算"""
+    cancels: int = 0
+    tokens_saved: int = 0
+    ms_saved: float = 0.0
+
+    def record(self, tokens: int, ms: float):
+        self.cancels += 1
+        self.tokens_saved += tokens
+        self.ms_saved += ms
+
+    def summary(self) -> str:
+        return f"已中断 {self.cancels} 次，累计节省约 {self.tokens_saved} tokens / {self.ms_saved:.0f} ms"
+
+
+@dataclass
+class StreamResult:
+    """流式响应的累积结果，片段先存列表，最后一次性拼接"""
+    parts: list[str] = field(default_factory=list)
+    stats: StreamStats = field(default_factory=StreamStats)
+    last_event: Optional[dict] = None
+
+    def append(self, content: str):
+        self.parts.append(content)
+        self.stats.mark_token()
+
+    @property
+    def text(self) -> str:
+        return "".join(self.parts)
+
+
+# 每个事件循环一组客户端，按 base_url 复用连接池
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict[str, httpx.AsyncClient]]" = weakref.WeakKeyDictionary()
+
+DEFAULT_TIMEOUT = httpx.Timeout(30.0, connect=10.0)
+DEFAULT_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=20, keepalive_expiry=30.0)
+
+
+def get_client(base_url: str) -> httpx.AsyncClient:
+    """获取当前事件循环中指定 base_url 的共享客户端"""
+    loop = asyncio.get_running_loop()
+    clients = _clients.setdefault(loop, {})
+    client = clients.get(base_url)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(base_url=base_url, timeout=DEFAULT_TIMEOUT, limits=DEFAULT_LIMITS)
+        clients[base_url] = client
+    return client
+
+
+async def close_clients():
+    """关闭当前事件循环中的所有共享客户端"""
+    loop = asyncio.get_running_loop()
+    clients = _clients.pop(loop, {})
+    for client in clients.values():
+        await client.aclose()
+
+
+async def stream_events(request: StreamRequest) -> AsyncIterator[dict]:
+    """发送流式请求并逐个产出解析后的 JSON 事件"""
+    client = get_client(request.base_url)
+    async with client.stream(
+        "POST",
+        request.path,
+        json=request.payload,
+        params=request.params,
+        headers=request.headers,
+    ) as response:
+        if response.status_code != 200:
+            body = (await response.aread()).decode("utf-8", errors="replace")
+            raise StreamError(response.status_code, body)
+
+        content_type = response.headers.get("content-type", "")
+        if request.wire_format == "sse" and content_type.startswith("application/json"):
+            # 部分接口出错时直接返回普通 JSON
+            yield json.loads(await response.aread())
+            return
+
+        parser = SSEParser() if request.wire_format == "sse" else NDJSONParser()
+        async for payloads in _payloads(response, parser):
+            for payload in payloads:
+                if payload == "[DONE]":
+                    return
+                try:
+                    yield json.loads(payload)
+                except json.JSONDecodeError:
+                    logger.warning(f"JSON 解析错误，跳过: {payload}")
+
+
+async def _payloads(response: httpx.Response, parser) -> AsyncIterator[list[str]]:
+    async for chunk in response.aiter_bytes():
+        payloads = parser.feed(chunk)
+        if payloads:
+            yield payloads
+    yield parser.close()
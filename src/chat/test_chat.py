@@ -15,7 +15,7 @@ async def test_chat(chat_type: str = None):
     except KeyboardInterrupt:
         print("\n对话被用户中断")
     finally:
-        await chat.client.aclose()
+        await chat.close()
 
 if __name__ == "__main__":
     import sys
@@ -0,0 +1,116 @@
+import time
+import asyncio
+import logging
+import weakref
+from typing import Awaitable, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+# () -> (access_token, expires_in 秒)
+TokenFetcher = Callable[[], Awaitable[tuple[str, float]]]
+
+
+class AccessTokenCache:
+    """进程内共享的访问令牌缓存
+
+    令牌按 expires_in 缓存，同一事件循环内的并发刷新只发出一次请求；
+    在到期前 refresh_margin 秒由后台任务提前续期，对话请求只读取缓存。
+    """
+
+    def __init__(self, fetcher: TokenFetcher, refresh_margin: float = 300.0,
+                 expiry_margin: float = 60.0, retry_interval: float = 10.0):
+        self.fetcher = fetcher
+        self.refresh_margin = refresh_margin
+        self.expiry_margin = expiry_margin  # 按到期前这么多秒视为失效
+        self.retry_interval = retry_interval  # 续期失败后的重试间隔
+        self.token: Optional[str] = None
+        self.expires_at = 0.0
+        self.refresh_at = 0.0
+        self.fetches = 0
+        self._fetched_at = 0.0
+        self._locks: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+        self._renewer: Optional[asyncio.Task] = None
+
+    @property
+    def is_valid(self) -> bool:
+        return self.token is not None and time.monotonic() < self.expires_at
+
+    def _lock(self) -> asyncio.Lock:
+        # asyncio.Lock 绑定事件循环，按循环分别创建
+        loop = asyncio.get_running_loop()
+        lock = self._locks.get(loop)
+        if lock is None:
+            lock = self._locks[loop] = asyncio.Lock()
+        return lock
+
+    async def get(self) -> str:
+        """返回有效令牌，仅在没有可用令牌时等待刷新"""
+        if not self.is_valid:
+            await self.refresh(force=False)
+        self._ensure_renewer()
+        return self.token
+
+    async def refresh(self, force: bool = True) -> str:
+        """获取新令牌，同时到达的调用共享同一次请求"""
+        requested = time.monotonic()
+        async with self._lock():
+            # 等锁期间其他调用可能已完成刷新
+            if self.is_valid and (not force or self._fetched_at > requested):
+                return self.token
+            token, expires_in = await self.fetcher()
+            self.fetches += 1
+            self._fetched_at = time.monotonic()
+            self.token = token
+            lifetime = max(float(expires_in) - self.expiry_margin, 0.0)
+            self.expires_at = self._fetched_at + lifetime
+            # 有效期很短时在一半处续期，避免连续刷新
+            self.refresh_at = self._fetched_at + max(lifetime - self.refresh_margin, lifetime / 2)
+            logger.info(f"已刷新访问令牌，{expires_in:.0f} 秒后过期")
+            return token
+
+    def _ensure_renewer(self):
+        task = self._renewer
+        loop = asyncio.get_running_loop()
+        if task and not task.done() and task.get_loop() is loop:
+            return
+        self._renewer = loop.create_task(self._renew())
+
+    async def _renew(self):
+        """在令牌到期前续期，失败时按 retry_interval 重试直到成功"""
+        while True:
+            delay = self.refresh_at - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            try:
+                await self.refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"访问令牌续期失败，{self.retry_interval:.0f} 秒后重试: {str(e)}")
+                await asyncio.sleep(self.retry_interval)
+
+    def invalidate(self):
+        """服务端拒绝令牌时丢弃缓存"""
+        self.token = None
+        self.expires_at = 0.0
+
+    async def stop(self):
+        task, self._renewer = self._renewer, None
+        if task and not task.done() and task.get_loop() is asyncio.get_running_loop():
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+
+# 进程内共享，同一组凭据只有一个缓存
+_caches: dict[tuple, AccessTokenCache] = {}
+
+
+def get_token_cache(key: tuple, fetcher: TokenFetcher, **kwargs) -> AccessTokenCache:
+    """获取指定凭据的共享令牌缓存"""
+    cache = _caches.get(key)
+    if cache is None:
+        cache = _caches[key] = AccessTokenCache(fetcher, **kwargs)
+    return cache
@@ -10,6 +10,7 @@ import os
 from pathlib import Path
 from dotenv import load_dotenv
 import traceback
+import uuid
 from src.agent.agent_handler import AgentHandler
 
 # 获取项目根目录
@@ -38,7 +39,12 @@ sys.path.append(str(ROOT_DIR))
 from src.audio.recorder import AudioRecorder
 from src.transcription.senseVoiceSmall import SenseVoiceSmallProcessor
 from src.chat.chat_factory import ChatFactory
-from src.audio.text_to_speech import KokoroTTS
+from src.chat.history_store import get_history_store
+from src.chat.session_manager import SessionManager
+from src.chat.speculative import Speculator
+from src.chat.stream_client import close_clients
+from src.audio.tts_service import ReplyAudio, get_tts_service
+from src.utils.segmenter import SentenceSegmenter
 
 # 确保目录存在
 static_dir = BASE_DIR / "static"
@@ -72,6 +78,59 @@ class ConnectionManager:
 
 manager = ConnectionManager()
 
+
+def create_session_chat():
+    """按 CHAT_TYPE 创建一个会话使用的聊天实例"""
+    # 重新加载环境变量
+    load_dotenv(env_path, override=True)
+    
+    # 从环境变量获取聊天类型
+    chat_type = os.getenv("CHAT_TYPE", "deepseek").lower().strip()
+    chat_type = chat_type.split('#')[0].strip()  # 移除可能的注释
+    
+    print("\n=== 创建聊天模型 ===")
+    print(f"使用的聊天类型: {chat_type}")
+    
+    try:
+        chat = ChatFactory.create_chat(chat_type)
+        print(f"成功创建聊天模型: {chat.__class__.__name__}")
+    except Exception as e:
+        print(f"创建聊天模型失败: {str(e)}")
+        traceback.print_exc()
+        print("使用默认的 DeepSeek 模型")
+        chat = ChatFactory.create_chat("deepseek")
+    return chat
+
+
+# 按浏览器的 session id 复用聊天实例
+sessions = SessionManager(
+    create_session_chat,
+    max_sessions=int(os.getenv("CHAT_MAX_SESSIONS", "100")),
+    idle_ttl=float(os.getenv("CHAT_SESSION_IDLE_TTL", "1800")),
+    max_total_tokens=int(os.getenv("CHAT_SESSION_MAX_TOKENS", "200000")),
+    # 会话历史持久化到 SQLite，重启后恢复；设为空字符串则不持久化
+    store=get_history_store(os.getenv("CHAT_HISTORY_DB", str(ROOT_DIR / "data" / "chat_history.db")))
+)
+
+# 会话被其他标签页的连接取代时使用的 WebSocket 关闭码
+SESSION_REPLACED_CODE = 4000
+
+# 浏览器提供稳定的部分转录时，在语音识别完成前预取回复
+SPECULATIVE = os.getenv("CHAT_SPECULATIVE", "false").lower() == "true"
+SPECULATIVE_THRESHOLD = float(os.getenv("CHAT_SPECULATIVE_THRESHOLD", "0.8"))
+
+@app.on_event("startup")
+async def startup():
+    """启动时加载共享的 TTS 模型，连接建立时无需再加载"""
+    await asyncio.to_thread(get_tts_service)
+
+@app.on_event("shutdown")
+async def shutdown():
+    """关闭所有会话和共享的 HTTP 连接池"""
+    await sessions.close()
+    await close_clients()
+    get_tts_service().close()
+
 @app.get("/")
 async def get(request: Request):
     """返回主页"""
@@ -136,46 +195,64 @@ async def favicon():
 async def websocket_endpoint(websocket: WebSocket):
     """处理 WebSocket 连接"""
     chat = None
+    speculator = None
     agent = AgentHandler()
     current_task = None
     is_connected = True
+    # 浏览器在 localStorage 中保存 session id，重连时恢复同一个会话
+    session_id = websocket.query_params.get("session_id")
+    # 本连接使用的声音，为空时使用默认声音；可通过 {"type": "voice"} 消息切换
+    voice = websocket.query_params.get("voice") or None
+    anonymous = not session_id
+    if anonymous:
+        session_id = uuid.uuid4().hex
+
+    async def replaced():
+        """同一会话在其他标签页打开，停止本连接的回复并断开"""
+        nonlocal is_connected
+        is_connected = False
+        if speculator:
+            speculator.cancel()
+        if current_task and not current_task.done():
+            current_task.cancel()
+            try:
+                await current_task
+            except asyncio.CancelledError:
+                pass
+        try:
+            await websocket.send_json({"type": "error", "message": "会话已在其他页面打开，本页面已断开"})
+            # 浏览器收到该关闭码后不再自动重连，避免两个标签页互相抢占会话
+            await websocket.close(code=SESSION_REPLACED_CODE)
+        except Exception as e:
+            print(f"Error closing replaced connection: {e}")
     
     try:
         # 初始化组件
         sense_voice = SenseVoiceSmallProcessor()
-        tts = KokoroTTS()
-        
-        # 重新加载环境变量
-        load_dotenv(env_path, override=True)
-        
-        # 从环境变量获取聊天类型
-        chat_type = os.getenv("CHAT_TYPE", "deepseek").lower().strip()
-        chat_type = chat_type.split('#')[0].strip()  # 移除可能的注释
-        
-        print("\n=== 创建聊天模型 ===")
-        print(f"当前工作目录: {os.getcwd()}")
-        print(f"环境变量 CHAT_TYPE: {os.getenv('CHAT_TYPE')}")
-        print(f"使用的聊天类型: {chat_type}")
-        
-        try:
-            chat = ChatFactory.create_chat(chat_type)
-            print(f"成功创建聊天模型: {chat.__class__.__name__}")
-        except Exception as e:
-            print(f"创建聊天模型失败: {str(e)}")
-            traceback.print_exc()
-            print("使用默认的 DeepSeek 模型")
-            chat = ChatFactory.create_chat("deepseek")
+        tts = get_tts_service()
         
-        print("环境变量内容:")
-        print(f"CHAT_TYPE: {os.getenv('CHAT_TYPE')}")
-        print(f"OLLAMA_BASE_URL: {os.getenv('OLLAMA_BASE_URL')}")
+        chat, resumed = await sessions.acquire(session_id, on_replaced=replaced)
+        if SPECULATIVE:
+            speculator = Speculator(chat, threshold=SPECULATIVE_THRESHOLD)
         
         await manager.connect(websocket)
         print("WebSocket connected")
+        if not tts.has_voice(voice):
+            await websocket.send_json({"type": "error", "message": f"未知的声音: {voice}，使用默认声音"})
+            voice = None
+        await websocket.send_json({
+            "type": "session",
+            "session_id": session_id,
+            "resumed": resumed,
+            "speculative": SPECULATIVE,
+            "history": [m for m in chat.conversation_history if m["role"] != "system"] if resumed else []
+        })
         
         while True:
             try:
                 message = await websocket.receive()
+                if not is_connected:
+                    break  # 已被同一会话的新连接取代
                 
                 # 处理音频数据
                 if "bytes" in message:
@@ -197,10 +274,13 @@ async def websocket_endpoint(websocket: WebSocket):
                     async def process_audio_task(audio_data):
                         try:
                             audio_buffer = io.BytesIO(audio_data)
-                            result, error = sense_voice.process_audio(audio_buffer)
+                            # 识别在线程中进行，期间预取的回复流可以继续接收
+                            result, error = await asyncio.to_thread(sense_voice.process_audio, audio_buffer)
                             
                             if error:
                                 print(f"Audio processing error: {error}")
+                                if speculator:
+                                    speculator.cancel()
                                 await websocket.send_json({
                                     "type": "error",
                                     "message": str(error)
@@ -216,73 +296,90 @@ async def websocket_endpoint(websocket: WebSocket):
                                 
                                 print("Starting chat response...")
                                 current_response = ""
-                                sentence_buffer = ""
-                                
-                                try:
-                                    print("Sending request to chat API...")
-                                    async for response in chat.stream_chat(result):
-                                        print(f"Got response chunk: {response}")
-                                        
-                                        if not is_connected:
-                                            print("WebSocket disconnected during chat")
-                                            break
+                                segmenter = SentenceSegmenter()
+                                async def send_audio(tts_audio):
+                                    if is_connected:
+                                        print("Sending audio response")
+                                        await websocket.send_bytes(tts_audio)
+
+                                # 语音在线程池中合成，按句子顺序发送，聊天流无需等待合成；
+                                # 任务被取消（停止或新的语音输入）时立即放弃尚未发送的语音
+                                async with ReplyAudio(tts, session_id, send_audio) as reply_audio:
+                                    async def send_sentence(sentence):
+                                        """发送一个完整句子并提交其语音，发送失败时返回 False"""
+                                        print(f"Sending complete sentence: {sentence}")
+                                        try:
+                                            await websocket.send_json({
+                                                "type": "chat",
+                                                "message": sentence
+                                            })
+                                        except Exception as e:
+                                            print(f"Error sending chat message: {e}")
+                                            return False
+
+                                        try:
+                                            await reply_audio.add(sentence, voice=voice)
+                                        except Exception as e:
+                                            print(f"TTS error: {e}")
+                                        return True
+                                    
+                                    try:
+                                        print("Sending request to chat API...")
+                                        finished = True
+                                        stream = speculator.commit(result) if speculator else chat.stream_chat(result)
+                                        async for response in stream:
+                                            print(f"Got response chunk: {response}")
                                             
-                                        if response:
-                                            if response.startswith("Error:"):
-                                                print(f"Chat error: {response}")
-                                                await websocket.send_json({
-                                                    "type": "error",
-                                                    "message": response
-                                                })
+                                            if not is_connected:
+                                                print("WebSocket disconnected during chat")
+                                                reply_audio.cancel()
+                                                finished = False
                                                 break
                                                 
-                                            print(f"Processing response chunk: {response}")
-                                            current_response += response
-                                            sentence_buffer += response
-                                            
-                                            if any(char in response for char in '.!?。！？'):
-                                                print(f"Sending complete sentence: {sentence_buffer}")
-                                                try:
+                                            if response:
+                                                if response.startswith("Error:"):
+                                                    print(f"Chat error: {response}")
                                                     await websocket.send_json({
-                                                        "type": "chat",
-                                                        "message": sentence_buffer
+                                                        "type": "error",
+                                                        "message": response
                                                     })
-                                                except Exception as e:
-                                                    print(f"Error sending chat message: {e}")
+                                                    finished = False
                                                     break
                                                     
-                                                try:
-                                                    tts_audio = tts.speak(sentence_buffer)
-                                                    if tts_audio and is_connected:
-                                                        print("Sending audio response")
-                                                        await websocket.send_bytes(tts_audio[0])
-                                                except Exception as e:
-                                                    print(f"TTS error: {e}")
+                                                current_response += response
+                                                for sentence in segmenter.feed(response):
+                                                    if not await send_sentence(sentence):
+                                                        finished = False
+                                                        break
+                                                if not finished:
+                                                    break
+
+                                        # 发送最后一个没有句末标点的句子
+                                        if finished:
+                                            for sentence in segmenter.flush():
+                                                await send_sentence(sentence)
                                                     
-                                                sentence_buffer = ""
-                                                
-                                except Exception as e:
-                                    print(f"Chat error: {e}")
-                                    traceback.print_exc()
-                                    try:
-                                        await websocket.send_json({
-                                            "type": "error",
-                                            "message": f"Chat error: {str(e)}"
-                                        })
-                                    except Exception as send_error:
-                                        print(f"Error sending error message: {send_error}")
+                                    except Exception as e:
+                                        print(f"Chat error: {e}")
+                                        traceback.print_exc()
+                                        try:
+                                            await websocket.send_json({
+                                                "type": "error",
+                                                "message": f"Chat error: {str(e)}"
+                                            })
+                                        except Exception as send_error:
+                                            print(f"Error sending error message: {send_error}")
                             else:
                                 print("No transcription result")
+                                if speculator:
+                                    speculator.cancel()
                                 
                         except Exception as e:
                             print(f"Error in process_audio_task: {e}")
                             traceback.print_exc()
                     
+                    # 在后台处理，接收循环保持响应以便及时收到停止命令
                     current_task = asyncio.create_task(process_audio_task(received_audio_data))
-                    try:
-                        await current_task
-                    except asyncio.CancelledError:
-                        print("Audio processing task cancelled")
                 
                 # 处理文本消息
                 elif "text" in message:
@@ -292,8 +389,27 @@ async def websocket_endpoint(websocket: WebSocket):
                         if not isinstance(data, dict):  # 确保是 JSON 对象
                             continue
                             
+                        # 处理部分转录，用于预取回复
+                        if data.get("type") == "partial":
+                            if speculator:
+                                speculator.propose(data.get("text", ""))
+                            continue
+
+                        # 切换本连接的声音，声音已预加载，立即生效
+                        if data.get("type") == "voice":
+                            requested = data.get("voice") or None
+                            if not tts.has_voice(requested):
+                                # 保留之前的声音，否则之后的回复都会合成失败
+                                await websocket.send_json({"type": "error", "message": f"未知的声音: {requested}"})
+                                continue
+                            voice = requested
+                            print(f"切换声音: {voice or '默认'}")
+                            continue
+
                         # 处理停止命令
                         if data.get("type") == "stop":
+                            if speculator:
+                                speculator.cancel()
                             if chat:
                                 chat.stop_streaming()
                             if current_task and not current_task.done():
@@ -310,12 +426,26 @@ async def websocket_endpoint(websocket: WebSocket):
                                 "description": result["description"]
                             })
                         else:
-                            # 继续现有的聊天处理
-                            async for response in chat.stream_chat(result["content"]):
-                                await websocket.send_json({
-                                    "type": "chat",
-                                    "message": response
-                                })
+                            # 继续现有的聊天处理，在后台任务中流式发送
+                            if current_task and not current_task.done():
+                                current_task.cancel()
+                                try:
+                                    await current_task
+                                except asyncio.CancelledError:
+                                    pass
+
+                            async def process_text_task(text):
+                                try:
+                                    async for response in chat.stream_chat(text):
+                                        await websocket.send_json({
+                                            "type": "chat",
+                                            "message": response
+                                        })
+                                except asyncio.CancelledError:
+                                    print("Chat task cancelled")
+                                    raise
+
+                            current_task = asyncio.create_task(process_text_task(result["content"]))
                     except json.JSONDecodeError:
                         # 忽略无效的 JSON 消息
                         continue
@@ -327,12 +457,16 @@ async def websocket_endpoint(websocket: WebSocket):
             except Exception as e:
                 print(f"Error in websocket loop: {e}")
                 traceback.print_exc()
-                if "Cannot call \"receive\" once a disconnect" in str(e):
+                if not is_connected or "Cannot call \"receive\" once a disconnect" in str(e):
                     is_connected = False
                     break
                 
     finally:
         print("Cleaning up resources...")
+        if speculator:
+            speculator.cancel()
+            if speculator.stats.turns:
+                print(f"Speculation: {speculator.stats.summary()}")
         if current_task and not current_task.done():
             current_task.cancel()
             try:
@@ -341,7 +475,8 @@ async def websocket_endpoint(websocket: WebSocket):
                 pass
         
         if chat:
-            await chat.close()
+            # 会话保留给重连的浏览器，由 SessionManager 按空闲时间和内存上限淘汰
+            await sessions.release(session_id, discard=anonymous)
             
         manager.disconnect(websocket)
         try:
@@ -9,7 +9,9 @@ const state = {
     isStopped: false,
     currentResponse: '',
     audioQueue: [],
-    isPlayingAudio: false
+    isPlayingAudio: false,
+    speculative: false,
+    recognition: null
 };
 
 // 停止所有音频播放
@@ -106,9 +108,69 @@ function addMessage(message, type) {
     chatMessages.scrollTop = chatMessages.scrollHeight;
 }
 
+// 获取或生成会话 id，保存在 localStorage 中，重连和刷新页面后恢复同一会话
+function getSessionId() {
+    let sessionId = localStorage.getItem('chatSessionId');
+    if (!sessionId) {
+        sessionId = window.crypto && crypto.randomUUID
+            ? crypto.randomUUID()
+            : `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`;
+        localStorage.setItem('chatSessionId', sessionId);
+    }
+    return sessionId;
+}
+
+// 恢复会话时补全页面上没有的历史消息
+function restoreHistory(history) {
+    const chatMessages = document.getElementById('chat-messages');
+    if (!chatMessages || chatMessages.children.length > 0) {
+        return;
+    }
+    history.forEach(message => {
+        addMessage(message.content, message.role === 'user' ? 'user' : 'chat');
+    });
+}
+
+// 录音时用浏览器语音识别得到稳定的部分转录，发给服务端预取回复
+function startPartialRecognition() {
+    const Recognition = window.SpeechRecognition || window.webkitSpeechRecognition;
+    if (!state.speculative || !Recognition) {
+        return;
+    }
+    const recognition = new Recognition();
+    recognition.lang = 'zh-CN';
+    recognition.continuous = true;
+    recognition.interimResults = false;
+    recognition.onresult = (event) => {
+        // 只发送已确定的结果，中间结果变化太频繁
+        const text = Array.from(event.results)
+            .filter(result => result.isFinal)
+            .map(result => result[0].transcript)
+            .join('');
+        if (text && state.ws && state.ws.readyState === WebSocket.OPEN) {
+            state.ws.send(JSON.stringify({ type: 'partial', text: text }));
+        }
+    };
+    recognition.onerror = (event) => console.log('部分转录不可用:', event.error);
+    try {
+        recognition.start();
+        state.recognition = recognition;
+    } catch (error) {
+        console.log('无法启动语音识别:', error);
+    }
+}
+
+function stopPartialRecognition() {
+    if (state.recognition) {
+        state.recognition.stop();
+        state.recognition = null;
+    }
+}
+
 // 初始化 WebSocket
 function initWebSocket() {
-    state.ws = new WebSocket(`ws://${window.location.host}/ws`);
+    const sessionId = encodeURIComponent(getSessionId());
+    state.ws = new WebSocket(`ws://${window.location.host}/ws?session_id=${sessionId}`);
     
     state.ws.onmessage = async function(event) {
         // 处理二进制数据（音频）
@@ -123,6 +185,15 @@ function initWebSocket() {
             const data = JSON.parse(event.data);
             
             switch(data.type) {
+                case 'session':
+                    state.speculative = !!data.speculative;
+                    // 服务端已恢复会话，历史无需重新发送
+                    if (data.resumed) {
+                        console.log(`恢复会话 ${data.session_id}`);
+                        restoreHistory(data.history || []);
+                    }
+                    break;
+                    
                 case 'image':
                     // 显示生成的图像
                     const imagePreview = document.getElementById('generated-image');
@@ -160,8 +231,12 @@ function initWebSocket() {
         addMessage('Connection error occurred', 'error');
     };
     
-    state.ws.onclose = function() {
+    state.ws.onclose = function(event) {
         console.log('WebSocket connection closed');
+        // 4000: 会话已在其他标签页打开，不再重连
+        if (event.code === 4000) {
+            return;
+        }
         setTimeout(initWebSocket, 1000);
     };
 }
@@ -231,6 +306,7 @@ async function startRecording() {
         // 7. 开始录音
         state.mediaRecorder.start();
         state.isRecording = true;
+        startPartialRecognition();
         console.log("录音已开始");
         
     } catch (error) {
@@ -245,6 +321,7 @@ function stopRecording() {
     if (!state.isRecording) return;
     
     state.isRecording = false;
+    stopPartialRecognition();
     if (state.mediaRecorder && state.mediaRecorder.state === 'recording') {
         state.mediaRecorder.stop();
     }
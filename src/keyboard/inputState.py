@@ -6,17 +6,25 @@ class InputState(Enum):
     IDLE = auto()           # 空闲状态
     RECORDING = auto()      # 正在录音
     RECORDING_TRANSLATE = auto()  # 正在录音(翻译模式)
+    RECORDING_CHAT = auto()  # 正在录音(对话模式)
     PROCESSING = auto()     # 正在处理
     TRANSLATING = auto()    # 正在翻译
+    CHATTING = auto()       # 已转录，等待回复的第一句
+    REPLYING = auto()       # 正在逐句输入回复
     ERROR = auto()          # 错误状态
     WARNING = auto()        # 警告状态（用于录音时长不足等提示）
 
     @property
     def is_recording(self):
         """检查是否处于录音状态"""
-        return self in (InputState.RECORDING, InputState.RECORDING_TRANSLATE)
+        return self in (InputState.RECORDING, InputState.RECORDING_TRANSLATE, InputState.RECORDING_CHAT)
+    
+    @property
+    def is_replying(self):
+        """检查是否有正在进行的对话回复"""
+        return self in (InputState.CHATTING, InputState.REPLYING)
     
     @property
     def can_start_recording(self):
         """检查是否可以开始新的录音"""
-        return not self.is_recording
+        return not self.is_recording and not self.is_replying
@@ -2,15 +2,17 @@ from pynput.keyboard import Controller, Key, Listener
 import pyperclip
 from ..utils.logger import logger
 import time
+import threading
 from .inputState import InputState
 import os
 
 
 class KeyboardManager:
-    def __init__(self, on_record_start, on_record_stop, on_translate_start, on_translate_stop, on_chat_start, on_chat_stop, on_reset_state):
+    def __init__(self, on_record_start, on_record_stop, on_translate_start, on_translate_stop, on_chat_start, on_chat_stop, on_reset_state, on_reply_cancel=None):
         self.keyboard = Controller()
         self.option_pressed = False
         self.shift_pressed = False
+        self.chat_pressed = False
         self.temp_text_length = 0  # 用于跟踪临时文本的长度
         self.processing_text = None  # 用于跟踪正在处理的文本
         self.error_message = None  # 用于跟踪错误信息
@@ -29,6 +31,9 @@ class KeyboardManager:
         self.on_chat_start = on_chat_start
         self.on_chat_stop = on_chat_stop
         self.on_reset_state = on_reset_state
+        self.on_reply_cancel = on_reply_cancel  # 重置时中断正在输入的回复
+        # 回复由对话线程逐句输入，与键盘监听线程的重置互斥
+        self._reply_lock = threading.Lock()
 
         
         # 状态管理
@@ -39,6 +44,9 @@ class KeyboardManager:
             InputState.RECORDING_TRANSLATE: "🎤 正在录音 (翻译模式)",
             InputState.PROCESSING: "🔄 正在转录...",
             InputState.TRANSLATING: "🔄 正在翻译...",
+            InputState.RECORDING_CHAT: "🎤 正在录音 (对话模式)",
+            InputState.CHATTING: "💬 正在思考...",
+            InputState.REPLYING: "",
             InputState.ERROR: lambda msg: f"{msg}",  # 错误消息使用函数动态生成
             InputState.WARNING: lambda msg: f"⚠️ {msg}"  # 警告消息使用函数动态生成
         }
@@ -68,8 +76,20 @@ class KeyboardManager:
         except KeyError:
             logger.error(f"无效的翻译按钮配置：{translations_button}")
 
+        # 对话按钮可选，未配置时不启用对话模式
+        chat_button = os.getenv("CHAT_BUTTON")
+        self.chat_button = None
+        if chat_button:
+            try:
+                self.chat_button = Key[chat_button]
+                logger.info(f"配置到对话按钮(与转录按钮组合)：{chat_button}")
+            except KeyError:
+                logger.error(f"无效的对话按钮配置：{chat_button}")
+
         logger.info(f"按住 {transcriptions_button} 键：实时语音转录（保持原文）")
         logger.info(f"按住 {translations_button} + {transcriptions_button} 键：实时语音翻译（翻译成英文）")
+        if self.chat_button:
+            logger.info(f"按住 {chat_button} + {transcriptions_button} 键：语音对话（逐句输入回复）")
     
     @property
     def state(self):
@@ -100,6 +120,12 @@ class KeyboardManager:
                     self.type_temp_text(message)
                     self.on_translate_start()
 
+                case InputState.RECORDING_CHAT:
+                    # 对话,录音状态
+                    self.temp_text_length = 0
+                    self.type_temp_text(message)
+                    self.on_chat_start()
+
                 case InputState.PROCESSING:
                     self._delete_previous_text()
                     self.type_temp_text(message)
@@ -112,6 +138,17 @@ class KeyboardManager:
                     self.type_temp_text(message)
                     self.processing_text = message
                     self.on_translate_stop()
+
+                case InputState.CHATTING:
+                    # 对话状态，显示提示直到第一句回复到达
+                    self._delete_previous_text()
+                    self.type_temp_text(message)
+                    self.processing_text = message
+                    self.on_chat_stop()
+
+                case InputState.REPLYING:
+                    # 回复状态，文本由 append_reply 逐句输入
+                    self._delete_previous_text()
                 
                 case InputState.WARNING:
                     # 警告状态
@@ -143,7 +180,6 @@ class KeyboardManager:
             time.sleep(2)  # 警告消息显示2秒
             self.state = InputState.IDLE
         
-        import threading
         threading.Thread(target=clear_message, daemon=True).start()
     
     def show_warning(self, warning_message):
@@ -173,7 +209,7 @@ class KeyboardManager:
             
         if not text:
             # 如果没有文本且不是错误，可能是录音时长不足
-            if self.state in (InputState.PROCESSING, InputState.TRANSLATING):
+            if self.state in (InputState.PROCESSING, InputState.TRANSLATING, InputState.CHATTING):
                 self.show_warning("录音时长过短，请至少录制1秒")
             return
             
@@ -207,10 +243,8 @@ class KeyboardManager:
 
         self.temp_text_length = 0
     
-    def type_temp_text(self, text):
-        """输入临时状态文本"""
-        if not text:
-            return
+    def _paste(self, text):
+        """通过剪贴板在光标处粘贴文本"""
         # 将文本复制到剪贴板
         pyperclip.copy(text)
 
@@ -219,8 +253,44 @@ class KeyboardManager:
             self.keyboard.press('v')
             self.keyboard.release('v')
 
+    def type_temp_text(self, text):
+        """输入临时状态文本"""
+        if not text:
+            return
+        self._paste(text)
+
         # 更新临时文本长度
         self.temp_text_length = len(text)
+
+    def begin_reply(self):
+        """第一句回复到达，删除"正在思考"提示"""
+        with self._reply_lock:
+            if self.state != InputState.CHATTING:
+                return False
+            self.state = InputState.REPLYING
+            return True
+
+    def append_reply(self, text):
+        """在光标处追加一句回复，返回 False 表示回复已被用户中断
+
+        回复文本直接保留，不计入临时文本长度；换行会被部分应用当作
+        发送，统一替换为空格。
+        """
+        text = " ".join(text.splitlines())
+        with self._reply_lock:
+            if self.state != InputState.REPLYING:
+                return False
+            if text:
+                self._paste(text)
+            return True
+
+    def finish_reply(self):
+        """回复输入完成"""
+        with self._reply_lock:
+            if self.state in (InputState.CHATTING, InputState.REPLYING):
+                # 没有任何回复时仍显示着"正在思考"提示
+                self._delete_previous_text()
+                self.state = InputState.IDLE
     
     def start_duration_check(self):
         """开始检查按键持续时间"""
@@ -235,7 +305,10 @@ class KeyboardManager:
                     (current_time - self.option_press_time) >= self.PRESS_DURATION_THRESHOLD):
                     
                     # 达到阈值时触发相应功能
-                    if self.option_pressed and self.shift_pressed and self.state.can_start_recording:
+                    if self.option_pressed and self.chat_pressed and self.state.can_start_recording:
+                        self.state = InputState.RECORDING_CHAT
+                        self.has_triggered = True
+                    elif self.option_pressed and self.shift_pressed and self.state.can_start_recording:
                         self.state = InputState.RECORDING_TRANSLATE
                         # self.on_translate_start()
                         self.has_triggered = True
@@ -247,7 +320,6 @@ class KeyboardManager:
                 time.sleep(0.01)  # 短暂休眠以降低 CPU 使用率
 
         self.is_checking_duration = True
-        import threading
         threading.Thread(target=check_duration, daemon=True).start()
 
     def on_press(self, key):
@@ -278,6 +350,8 @@ class KeyboardManager:
                 self.start_duration_check()
             elif key == self.translations_button:
                 self.shift_pressed = True
+            elif self.chat_button is not None and key == self.chat_button:
+                self.chat_pressed = True
         except AttributeError:
             pass
 
@@ -293,6 +367,8 @@ class KeyboardManager:
                 if self.has_triggered:
                     if self.state == InputState.RECORDING_TRANSLATE:
                         self.state = InputState.TRANSLATING
+                    elif self.state == InputState.RECORDING_CHAT:
+                        self.state = InputState.CHATTING
                     elif self.state == InputState.RECORDING:
                         self.state = InputState.PROCESSING
                     self.has_triggered = False
@@ -303,6 +379,13 @@ class KeyboardManager:
                     self.has_triggered):
                     self.state = InputState.TRANSLATING
                     self.has_triggered = False
+            elif self.chat_button is not None and key == self.chat_button:
+                self.chat_pressed = False
+                if (self.state == InputState.RECORDING_CHAT and
+                    not self.option_pressed and
+                    self.has_triggered):
+                    self.state = InputState.CHATTING
+                    self.has_triggered = False
             elif key == self.transcriptions_button:
                 self.on_record_stop()
             elif key == self.translations_button:
@@ -319,12 +402,20 @@ class KeyboardManager:
 
     def reset_state(self):
         """重置所有状态和临时文本"""
-        # 清除临时文本
-        self._delete_previous_text()
+        with self._reply_lock:
+            replying = self.state.is_replying
+            # 清除临时文本
+            self._delete_previous_text()
+            if replying:
+                # 先切换状态，之后到达的回复句子不再输入
+                self.state = InputState.IDLE
+        if replying and self.on_reply_cancel:
+            self.on_reply_cancel()
         
         # 重置状态标志
         self.option_pressed = False
         self.shift_pressed = False
+        self.chat_pressed = False
         self.option_press_time = None
         self.is_checking_duration = False
         self.has_triggered = False
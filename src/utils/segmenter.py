@@ -0,0 +1,133 @@
+import re
+
+# 中文句末标点，后面不必跟空白，但要看到后文才能确认其后没有连续的标点或右引号
+_CJK_TERMINATORS = "。！？…"
+# 需要后面跟空白才算句末的英文标点
+_LATIN_TERMINATORS = ".!?"
+# 句末标点后可能紧跟的右引号和括号，归入当前句
+_CLOSERS = "\"'”’」』）)】]》"
+# 超长时优先在这些位置切分
+_SOFT_BREAKS = "，、；：,;:—"
+
+_CJK_RE = re.compile(r"[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af]")
+
+# 以 "." 结尾但通常不是句末的缩写（小写、去掉结尾的点）
+ABBREVIATIONS = frozenset({
+    "mr", "mrs", "ms", "dr", "prof", "sr", "jr", "st", "mt", "vs", "etc", "e.g", "i.e",
+    "no", "inc", "ltd", "co", "corp", "dept", "approx", "fig", "vol", "jan", "feb", "mar",
+    "apr", "jun", "jul", "aug", "sep", "sept", "oct", "nov", "dec", "a.m", "p.m", "u.s", "u.k",
+})
+
+
+def _weight(text: str) -> int:
+    """按朗读时长计的长度，中日韩字符记 2"""
+    return len(text) + len(_CJK_RE.findall(text))
+
+
+class SentenceSegmenter:
+    """增量分句器，逐段输入流式文本，输出已完整的句子
+
+    每个字符只扫描一次；输出的句子按原样拼接即得到输入文本，且与输入
+    如何分段无关：句末标点位于本段末尾时等待下一段（或 flush）确认。
+    长度（中日韩字符记 2）短于 min_chars 的句子与下一句合并，避免 TTS
+    为很短的片段单独合成；超过 max_chars 仍未结束的句子在逗号、空格等
+    位置提前切分，让 TTS 尽早开始。
+    """
+
+    def __init__(self, min_chars: int = 8, max_chars: int = 150):
+        self.min_chars = min_chars
+        self.max_chars = max_chars
+        self._buffer = ""
+        self._pos = 0  # 下一次从这里继续扫描
+
+    def feed(self, chunk: str) -> list[str]:
+        """输入一段文本，返回其中已完整的句子"""
+        self._buffer += chunk
+        sentences = []
+        while True:
+            end = self._find_boundary()
+            if end is None:
+                if len(self._buffer) <= self.max_chars:
+                    break
+                end = self._soft_break()
+            sentences.append(self._take(end))
+        return sentences
+
+    def flush(self) -> list[str]:
+        """流结束时输出剩余文本"""
+        rest, self._buffer, self._pos = self._buffer, "", 0
+        return [rest] if rest.strip() else []
+
+    def reset(self):
+        self._buffer = ""
+        self._pos = 0
+
+    def _take(self, end: int) -> str:
+        sentence = self._buffer[:end]
+        self._buffer = self._buffer[end:]
+        self._pos = 0
+        return sentence
+
+    def _find_boundary(self):
+        """返回第一个可输出的句末位置，没有时记录扫描进度并返回 None"""
+        buffer = self._buffer
+        length = len(buffer)
+        i = self._pos
+        while i < length:
+            char = buffer[i]
+            if char == "\n":
+                end = i + 1
+            elif char in _CJK_TERMINATORS or char in _LATIN_TERMINATORS:
+                # 连续的句末标点（如 "?!"、"..."）和右引号视为一个整体
+                j = i + 1
+                while j < length and (buffer[j] in _CJK_TERMINATORS or buffer[j] in _LATIN_TERMINATORS):
+                    j += 1
+                while j < length and buffer[j] in _CLOSERS:
+                    j += 1
+                if j == length:
+                    # 后文可能还有连续的标点（"……"、"？！"）或右引号，等待下一段
+                    break
+                if char in _LATIN_TERMINATORS and not self._is_latin_end(buffer, i, j):
+                    i = j
+                    continue
+                end = j
+            else:
+                i += 1
+                continue
+            if _weight(buffer[:end].strip()) >= self.min_chars:
+                self._pos = 0
+                return end
+            i = end  # 太短，与下一句合并
+        self._pos = i
+        return None
+
+    def _is_latin_end(self, buffer: str, i: int, j: int) -> bool:
+        """英文标点后跟空白或中文时才是句末，并排除缩写和首字母"""
+        following = buffer[j]
+        if not (following.isspace() or _CJK_RE.match(following)):
+            return False  # 小数、网址、文件名等
+        if buffer[i] != "." or (j - i > 1 and buffer[i + 1] == "."):
+            return True
+        start = i
+        while start > 0 and not buffer[start - 1].isspace():
+            start -= 1
+        word = buffer[start:i].lstrip("\"'“‘(（[").lower()
+        if word in ABBREVIATIONS:
+            return False
+        # 单个大写字母，如 "J. K. Rowling"
+        return not (len(word) == 1 and buffer[i - 1].isupper())
+
+    def _soft_break(self) -> int:
+        """在 max_chars 以内找最后一个逗号或空格，找不到时直接截断"""
+        window = self._buffer[:self.max_chars]
+        for candidates in (_SOFT_BREAKS, " "):
+            cut = max(window.rfind(char) for char in candidates)
+            if cut + 1 >= self.min_chars:
+                return cut + 1
+        return self.max_chars
+
+
+def split_sentences(text: str, min_chars: int = 8, max_chars: int = 150) -> list[str]:
+    """一次性切分完整文本"""
+    segmenter = SentenceSegmenter(min_chars, max_chars)
+    return segmenter.feed(text) + segmenter.flush()
@@ -0,0 +1,45 @@
+import sys
+import asyncio
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from src.chat import benchmark
+from src.chat.mock_server import MockProfile
+
+
+def test_percentile_interpolates():
+    values = [10, 20, 30, 40, 50]
+    assert benchmark.percentile(values, 50) == 30
+    assert benchmark.percentile(values, 95) == 48
+    assert benchmark.percentile([], 50) is None
+
+
+def test_compare_reports_direction():
+    old = {"results": {"deepseek": {"1": {"ttft_ms": {"p50": 100.0}, "throughput_rps": 2.0}}}}
+    new = {"results": {"deepseek": {"1": {"ttft_ms": {"p50": 80.0}, "throughput_rps": 1.0}}}}
+    rows = {row["metric"]: row for row in benchmark.compare(old, new)}
+    assert rows["ttft_ms.p50"]["better"] is True
+    assert rows["ttft_ms.p50"]["change_pct"] == -20.0
+    assert rows["throughput_rps"]["better"] is False
+
+
+def test_benchmark_against_mock_server(monkeypatch):
+    profile = MockProfile(ttft_ms=20, prefill_ms_per_token=0, inter_token_ms=5, reply_tokens=8)
+    # run_benchmark 会改写这些环境变量，先登记以便测试结束后恢复
+    for name in ("DEEPSEEK_BASE_URL", "ERNIE_BASE_URL", "OLLAMA_BASE_URL", "CHAT_RESPONSE_CACHE",
+                 "DEEPSEEK_API_KEY", "BAIDU_API_KEY", "BAIDU_SECRET_KEY"):
+        monkeypatch.setenv(name, "")
+    monkeypatch.delenv("OLLAMA_MODE", raising=False)
+
+    report = asyncio.run(benchmark.run_benchmark(["deepseek", "ernie", "ollama"], [1, 3],
+                                                 requests=6, warmup=1, mock=True,
+                                                 mock_profile=profile))
+
+    for backend in ("deepseek", "ernie", "ollama"):
+        for level in ("1", "3"):
+            result = report["results"][backend][level]
+            assert result["errors"] == 0, result
+            assert result["requests"] == 6
+            assert result["ttft_ms"]["p50"] >= 20
+            assert result["inter_token_ms"]["p50"] is not None
+            assert result["tokens_per_sec"]["p50"] > 0
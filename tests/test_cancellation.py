@@ -0,0 +1,82 @@
+import sys
+import time
+import asyncio
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import pytest
+
+from src.chat.mock_server import MockLLMServer, MockProfile
+from src.chat.ollama_3 import OllamaChat
+from src.chat.stream_client import close_clients
+
+TOKEN_COUNT = 40
+TOKEN_DELAY = 0.02
+
+
+async def _with_server(monkeypatch, body):
+    server = MockLLMServer(MockProfile(ttft_ms=10, prefill_ms_per_token=0,
+                                       inter_token_ms=TOKEN_DELAY * 1000, reply_tokens=TOKEN_COUNT))
+    await server.start()
+    monkeypatch.setenv("OLLAMA_BASE_URL", server.url)
+    monkeypatch.delenv("OLLAMA_MODE", raising=False)
+    chat = OllamaChat()
+    try:
+        return server, chat, await body(chat)
+    finally:
+        await chat.health.stop()
+        await close_clients()
+        await server.stop()
+
+
+def test_stop_closes_upstream_stream_immediately(monkeypatch):
+    async def body(chat):
+        # 先完整对话一轮，作为估算节省量的基准
+        full = [chunk async for chunk in chat.stream_chat("hi")]
+        received = []
+        stopped_at = None
+        async for chunk in chat.stream_chat("again"):
+            received.append(chunk)
+            if len(received) == 3:
+                stopped_at = time.perf_counter()
+                chat.stop_streaming()
+        ended = time.perf_counter() - stopped_at
+        await asyncio.sleep(TOKEN_DELAY * 3)  # 让模拟服务发现连接已断开
+        return full, received, ended
+
+    server, chat, (full, received, ended) = asyncio.run(_with_server(monkeypatch, body))
+
+    assert len(full) == TOKEN_COUNT
+    assert len(received) == 3
+    assert ended < TOKEN_DELAY  # 不再等待下一个 token
+    assert server.aborted == 1
+    assert chat.last_stats.cancelled
+    assert chat.cancel_stats.cancels == 1
+    assert chat.cancel_stats.tokens_saved == TOKEN_COUNT - 3
+    assert chat.cancel_stats.ms_saved > 0
+    # 被中断的一轮不写入历史
+    assert len(chat.history) == 2
+
+
+def test_cancelling_consumer_propagates_cancelled_error(monkeypatch):
+    async def body(chat):
+        received = []
+
+        async def consume():
+            async for chunk in chat.stream_chat("hi"):
+                received.append(chunk)
+
+        task = asyncio.create_task(consume())
+        await asyncio.sleep(TOKEN_DELAY * 3)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        await asyncio.sleep(TOKEN_DELAY * 3)
+        return received
+
+    server, chat, received = asyncio.run(_with_server(monkeypatch, body))
+
+    assert 0 < len(received) < TOKEN_COUNT
+    assert server.aborted == 1
+    assert chat.last_stats.cancelled
+    assert len(chat.history) == 0
@@ -0,0 +1,37 @@
+import sys
+import time
+import asyncio
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from src.chat.health import HealthMonitor
+from src.chat.ollama_3 import OllamaChat
+from src.chat.stream_client import close_clients
+
+
+def test_monitor_caches_passive_observations():
+    monitor = HealthMonitor("http://127.0.0.1:9", "/api/version", ttl=60)
+    assert monitor.is_available()  # 尚未确认时乐观放行
+    monitor.mark_down("connection refused")
+    assert not monitor.is_available()
+    monitor.mark_up()
+    assert monitor.is_available()
+
+
+def test_stream_chat_fails_fast_when_backend_down(monkeypatch):
+    # 9 号端口没有服务监听，探测会失败
+    monkeypatch.setenv("OLLAMA_BASE_URL", "http://127.0.0.1:9")
+
+    async def run():
+        chat = OllamaChat()
+        await chat.health.probe()
+        start = time.perf_counter()
+        chunks = [chunk async for chunk in chat.stream_chat("hi")]
+        elapsed = time.perf_counter() - start
+        await chat.health.stop()
+        await close_clients()
+        return chunks, elapsed
+
+    chunks, elapsed = asyncio.run(run())
+    assert len(chunks) == 1 and chunks[0].startswith("Error:")
+    assert elapsed < 0.05
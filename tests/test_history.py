@@ -0,0 +1,94 @@
+import sys
+import asyncio
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from src.chat.history import ConversationHistory, estimate_tokens
+
+
+def test_estimate_tokens_mixed_text():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("你好世界") == 4
+    assert estimate_tokens("hello world!") == 3
+    assert estimate_tokens("你好 world") == 2 + 2
+
+
+def test_history_stays_within_budget_without_summarizer():
+    history = ConversationHistory(max_tokens=60, min_recent=2)
+    for i in range(20):
+        history.add_turn(f"question {i} " * 5, f"answer {i} " * 5)
+    assert history.tokens <= 60
+    messages = history.messages()
+    assert messages[-1]["content"].startswith("answer 19")
+    assert [m["role"] for m in messages] == ["user", "assistant"] * (len(messages) // 2)
+
+
+def test_history_compacts_evicted_turns_in_background():
+    calls = []
+
+    async def summarizer(summary, messages):
+        calls.append(len(messages))
+        await asyncio.sleep(0)
+        return (summary + " " + " ".join(m["content"].split()[1] for m in messages)).strip()
+
+    async def run():
+        history = ConversationHistory(max_tokens=80, min_recent=2, summarizer=summarizer)
+        for i in range(6):
+            history.add_turn(f"q{i} " + "x " * 20, f"a{i} " + "y " * 20)
+            # 压缩在后台进行，add_turn 本身不等待
+        await history.wait_idle()
+        return history
+
+    history = asyncio.run(run())
+    assert calls and sum(calls) == 12 - len(history)
+    messages = history.messages()
+    assert messages[0]["role"] == "system" and "x" in messages[0]["content"]
+    assert messages[-1]["content"].startswith("a5")
+
+
+def test_low_water_keeps_prefix_stable_between_evictions():
+    import json
+
+    def prefix_breaks(history):
+        breaks, previous = 0, None
+        for i in range(30):
+            current = json.dumps(history.messages(), ensure_ascii=False)
+            if previous is not None and not current.startswith(previous[:-1]):
+                breaks += 1
+            previous = current
+            history.add_turn(f"q{i} " + "x " * 10, f"a{i} " + "y " * 10)
+        return breaks
+
+    rolling = prefix_breaks(ConversationHistory(max_tokens=200, min_recent=2))
+    append = prefix_breaks(ConversationHistory(max_tokens=200, min_recent=2, low_water=100))
+    assert append < rolling / 3
+
+
+def test_summary_replaces_evicted_turns_in_one_step():
+    import json
+
+    calls = []
+
+    async def summarizer(summary, messages):
+        calls.append(len(messages))
+        await asyncio.sleep(0.01)
+        return f"{summary} +{len(messages)}".strip()
+
+    async def run():
+        history = ConversationHistory(max_tokens=120, min_recent=2, low_water=60, summarizer=summarizer)
+        snapshots = [json.dumps(history.messages())]
+        for i in range(20):
+            history.add_turn(f"q{i} " + "x " * 10, f"a{i} " + "y " * 10)
+            snapshots.append(json.dumps(history.messages()))
+            # 摘要有时在两轮之间完成，有时跨过几轮
+            await asyncio.sleep(0.02 if i % 3 == 0 else 0)
+            snapshots.append(json.dumps(history.messages()))
+        await history.wait_idle()
+        snapshots.append(json.dumps(history.messages()))
+        return history, snapshots
+
+    history, snapshots = asyncio.run(run())
+    breaks = sum(not current.startswith(previous[:-1]) for previous, current in zip(snapshots, snapshots[1:]))
+    # 每次移出只改变一次前缀：移出的消息和新摘要同时出现
+    assert calls and breaks == len(calls)
+    assert history.summary.startswith("+8")
@@ -0,0 +1,109 @@
+import sys
+import time
+import sqlite3
+import asyncio
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from src.chat.history import MESSAGE_OVERHEAD, ConversationHistory, estimate_tokens
+from src.chat.history_store import SQLiteHistoryStore
+
+
+def test_restore_loads_only_the_token_window(tmp_path):
+    path = tmp_path / "history.db"
+
+    async def write():
+        store = SQLiteHistoryStore(path)
+        history = ConversationHistory(max_tokens=10_000)
+        history.attach(store, "s1")
+        for i in range(50):
+            history.add_turn(f"question {i}", f"answer {i}")
+        history.summary = "earlier facts"
+        store.save_summary("s1", history.summary)
+        await store.close()
+
+    async def read():
+        # 模拟服务重启：新的存储实例和新的历史对象
+        store = SQLiteHistoryStore(path)
+        history = ConversationHistory(max_tokens=60)
+        history.attach(store, "s1")
+        await history.restore()
+        await store.close()
+        return history
+
+    asyncio.run(write())
+    history = asyncio.run(read())
+
+    messages = history.messages()
+    assert messages[0]["content"].endswith("earlier facts")
+    assert messages[1] == {"role": "user", "content": messages[1]["content"]}
+    assert messages[-1]["content"] == "answer 49"
+    assert sum(estimate_tokens(m["content"]) + MESSAGE_OVERHEAD for m in messages[1:]) <= 60
+    assert 0 < len(history) < 100
+
+
+def test_append_is_non_blocking_and_batched(tmp_path):
+    async def run():
+        store = SQLiteHistoryStore(tmp_path / "history.db")
+        history = ConversationHistory(max_tokens=1_000_000)
+        history.attach(store, "s1")
+        start = time.perf_counter()
+        for i in range(500):
+            history.add_turn(f"q{i}", f"a{i}")
+        per_turn_ms = (time.perf_counter() - start) * 1000 / 500
+        await store.close()
+        return store, per_turn_ms
+
+    store, per_turn_ms = asyncio.run(run())
+    # 写入在后台线程完成，调用方只付出入队开销
+    assert per_turn_ms < 0.5
+    assert store.batches < 1000
+
+
+def test_clear_removes_persisted_session(tmp_path):
+    async def run():
+        store = SQLiteHistoryStore(tmp_path / "history.db")
+        history = ConversationHistory()
+        history.attach(store, "s1")
+        history.add_turn("hi", "hello")
+        history.clear()
+        fresh = ConversationHistory()
+        fresh.attach(store, "s1")
+        await fresh.restore()
+        await store.close()
+        return fresh
+
+    assert len(asyncio.run(run())) == 0
+
+
+def _count(path, table):
+    conn = sqlite3.connect(path)
+    try:
+        return dict(conn.execute(f"SELECT session_id, COUNT(*) FROM {table} GROUP BY session_id").fetchall())
+    finally:
+        conn.close()
+
+
+def test_writer_prunes_old_and_excess_messages(tmp_path):
+    path = tmp_path / "history.db"
+
+    async def run():
+        store = SQLiteHistoryStore(path, max_rows=4, prune_interval=0)
+        for i in range(5):
+            store.append("old", "user", f"q{i}", 1)
+        store.save_summary("old", "old facts")
+        store.flush()
+        # 超出 max_rows，最早的消息被删除
+        assert _count(path, "messages") == {"old": 4}
+        store.max_age = 0.05
+        await asyncio.sleep(0.1)
+        store.append("new", "user", "hi", 1)
+        store.flush()
+        await store.close()
+        return store
+
+    store = asyncio.run(run())
+    # old 的消息全部过期，摘要一并删除
+    assert _count(path, "messages") == {"new": 1}
+    assert _count(path, "summaries") == {}
+    assert store.pruned == 5
@@ -0,0 +1,60 @@
+import sys
+import time
+import asyncio
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from src.chat.mock_server import MockLLMServer, MockProfile, reply_tokens
+from src.chat.ollama_3 import OllamaChat
+from src.chat.stream_client import close_clients
+
+TOKEN_COUNT = 6
+TOKEN_DELAY = 0.05
+
+
+async def _run_concurrent_streams(count: int, monkeypatch):
+    profile = MockProfile(ttft_ms=TOKEN_DELAY * 1000, prefill_ms_per_token=0,
+                          inter_token_ms=TOKEN_DELAY * 1000, reply_tokens=TOKEN_COUNT)
+    server = MockLLMServer(profile)
+    await server.start()
+    monkeypatch.setenv("OLLAMA_BASE_URL", server.url)
+    chats = [OllamaChat() for _ in range(count)]
+
+    # 心跳协程，用于检测事件循环是否被阻塞
+    max_gap = 0.0
+    running = True
+
+    async def heartbeat():
+        nonlocal max_gap
+        last = time.perf_counter()
+        while running:
+            await asyncio.sleep(0.005)
+            now = time.perf_counter()
+            max_gap = max(max_gap, now - last)
+            last = now
+
+    async def consume(chat):
+        return [chunk async for chunk in chat.stream_chat("hi")]
+
+    beat = asyncio.create_task(heartbeat())
+    start = time.perf_counter()
+    results = await asyncio.gather(*(consume(chat) for chat in chats))
+    elapsed = time.perf_counter() - start
+    running = False
+    await beat
+
+    await close_clients()
+    await server.stop()
+    return results, elapsed, max_gap
+
+
+def test_concurrent_ollama_streams_do_not_block_event_loop(monkeypatch):
+    count = 5
+    results, elapsed, max_gap = asyncio.run(_run_concurrent_streams(count, monkeypatch))
+
+    assert all(chunks == reply_tokens(TOKEN_COUNT) for chunks in results)
+    single_stream = TOKEN_DELAY * TOKEN_COUNT
+    # 并发执行时总耗时应接近单个流，而不是 count 倍
+    assert elapsed < single_stream * 2.5
+    # 事件循环始终保持响应
+    assert max_gap < TOKEN_DELAY * 2
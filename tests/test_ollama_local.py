@@ -0,0 +1,93 @@
+import sys
+import json
+import asyncio
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import httpx
+
+from src.chat import stream_client
+from src.chat.ollama_3 import OllamaChat
+
+
+class FakeOllama:
+    """记录 /api/generate 请求的假 Ollama，每轮返回递增的 context"""
+
+    def __init__(self, reply="ok"):
+        self.reply = reply
+        self.requests = []
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/api/version":
+            return httpx.Response(200, json={"version": "test"})
+        payload = json.loads(request.content)
+        if "prompt" not in payload:  # 预加载
+            return httpx.Response(200, json={"load_duration": 0})
+        self.requests.append(payload)
+        turn = len(self.requests)
+        events = [
+            {"response": self.reply, "done": False},
+            {"response": "", "done": True, "context": [turn] * 3,
+             "prompt_eval_count": 10, "prompt_eval_duration": 1_000_000}
+        ]
+        body = "".join(json.dumps(event) + "\n" for event in events)
+        return httpx.Response(200, content=body.encode(), headers={"content-type": "application/x-ndjson"})
+
+
+def _local_chat(monkeypatch, base_url, server, max_tokens="1500"):
+    """在当前事件循环中创建使用假 Ollama 的本地模式 OllamaChat"""
+    monkeypatch.setenv("OLLAMA_MODE", "local")
+    monkeypatch.setenv("OLLAMA_BASE_URL", base_url)
+    monkeypatch.setenv("CHAT_HISTORY_MAX_TOKENS", max_tokens)
+    client = httpx.AsyncClient(base_url=base_url, transport=httpx.MockTransport(server))
+    stream_client._clients.setdefault(asyncio.get_running_loop(), {})[base_url] = client
+    return OllamaChat()
+
+
+async def _turn(chat, text):
+    return "".join([chunk async for chunk in chat.stream_chat(text)])
+
+
+def test_context_is_reused_and_reset_when_history_is_cleared(monkeypatch):
+    server = FakeOllama()
+
+    async def run():
+        chat = _local_chat(monkeypatch, "http://ollama-clear.test", server)
+        await _turn(chat, "q1")
+        await _turn(chat, "q2")
+        chat.history.clear()
+        await _turn(chat, "q3")
+        await stream_client.close_clients()
+        return chat
+
+    chat = asyncio.run(run())
+    first, second, third = server.requests
+    # 首轮携带系统提示，下一轮只发送新输入和上一轮返回的 context
+    assert "context" not in first and first["system"] and first["prompt"] == "q1"
+    assert second["context"] == [1, 1, 1] and "system" not in second and second["prompt"] == "q2"
+    # 历史清空后不再复用旧的 context
+    assert "context" not in third and third["prompt"] == "q3"
+    assert [stats.reused_tokens for stats in chat.prompt_eval_history] == [0, 3, 0]
+
+
+def test_context_is_rebuilt_once_per_eviction_batch(monkeypatch):
+    server = FakeOllama()
+
+    async def run():
+        # 每轮约 10 tokens，第五轮超出预算，一次移出到 20 tokens 以下
+        chat = _local_chat(monkeypatch, "http://ollama-trim.test", server, max_tokens="40")
+        for i in range(8):
+            await _turn(chat, f"q{i}")
+        await stream_client.close_clients()
+        return chat
+
+    chat = asyncio.run(run())
+    assert [r.get("context") for r in server.requests[1:5]] == [[1] * 3, [2] * 3, [3] * 3, [4] * 3]
+    # 第五轮记录后一次移出到一半预算以下，第六轮按保留的历史重建
+    sixth = server.requests[5]
+    assert "context" not in sixth
+    assert sixth["prompt"].split("\n")[::2] == ["user: q3", "user: q4", "user: q5"]
+    # 之后继续复用重建得到的 context，直到下一次超出预算
+    assert server.requests[6]["context"] == [6] * 3
+    assert server.requests[7]["context"] == [7] * 3
+    assert chat.history.low_water == 20
@@ -0,0 +1,61 @@
+import sys
+import time
+import asyncio
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from src.chat.response_cache import ResponseCache, normalize, replay
+
+
+def test_normalize_ignores_case_width_and_punctuation():
+    assert normalize("你好，请介绍一下你自己！") == normalize("你好 请介绍一下你自己")
+    assert normalize("What can you do?") == normalize("what can YOU do")
+
+
+def test_exact_and_similar_lookup():
+    cache = ResponseCache(threshold=0.7)
+    cache.put("你好，请介绍一下你自己", "I am a voice assistant.")
+    assert cache.get("你好！请介绍一下你自己。") == "I am a voice assistant."
+    assert cache.get("你好，请你介绍一下你自己") == "I am a voice assistant."
+    assert cache.get("今天天气怎么样") is None
+    assert (cache.hits, cache.misses) == (2, 1)
+
+
+def test_questions_differing_in_a_number_or_name_miss():
+    cache = ResponseCache()
+    cache.put("What is 23 times 47?", "1081")
+    cache.put("今天北京的天气怎么样", "晴")
+    assert cache.get("What is 23 times 48?") is None
+    assert cache.get("What is 23 times 47 and 1?") is None
+    assert cache.get("今天上海的天气怎么样") is None
+    # 只多一个语气词仍然命中
+    assert cache.get("So what is 23 times 47?") == "1081"
+    assert cache.get("今天北京的天气怎么样呢") == "晴"
+
+
+def test_lru_eviction_cleans_index():
+    cache = ResponseCache(max_entries=2)
+    cache.put("what can you do", "a")
+    cache.put("tell me a joke", "b")
+    cache.get("what can you do")
+    cache.put("who are you", "c")
+    assert len(cache) == 2
+    assert cache.get("tell me a joke") is None
+    assert cache.get("what can you do") == "a"
+    assert all(keys for keys in cache._index.values())
+
+
+def test_hit_latency_and_replay():
+    cache = ResponseCache()
+    for i in range(256):
+        cache.put(f"question number {i} about topic {i * 7}", f"answer {i}")
+    start = time.perf_counter()
+    assert cache.get("Question number 42 about topic 294?") == "answer 42"
+    assert (time.perf_counter() - start) * 1000 < 10
+
+    async def collect():
+        return [chunk async for chunk in replay("Hello there. " * 5, chunk_chars=8)]
+
+    chunks = asyncio.run(collect())
+    assert "".join(chunks) == "Hello there. " * 5
+    assert len(chunks) > 1
@@ -0,0 +1,101 @@
+import sys
+import asyncio
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import pytest
+
+from src.chat.base_chat import BaseChat
+from src.chat.router import RoutingChat
+
+
+class FakeChat(BaseChat):
+    """按固定延迟回复的假后端"""
+
+    def __init__(self, name, delay, fail=False, fail_midway=False):
+        super().__init__("")
+        self.name = name
+        self.delay = delay
+        self.fail = fail
+        self.fail_midway = fail_midway
+        self.seen = []
+
+    def _build_request(self, messages):
+        return None
+
+    def _parse_event(self, event):
+        return None
+
+    async def _stream_messages(self, messages, result, background=False):
+        self.seen.append(messages)
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise ConnectionError("backend down")
+        for part in (self.name, " ok"):
+            result.append(part)
+            yield part
+            if self.fail_midway:
+                raise ConnectionError("connection reset")
+        result.stats.finish()
+
+
+async def _turn(chat, text):
+    return "".join([chunk async for chunk in chat.stream_chat(text)])
+
+
+def test_router_prefers_backend_meeting_slo():
+    async def run():
+        slow, fast = FakeChat("slow", 0.05), FakeChat("fast", 0.001)
+        router = RoutingChat({"slow": slow, "fast": fast}, slo_ms=20)
+        replies = [await _turn(router, f"q{i}") for i in range(4)]
+        return router, replies
+
+    router, replies = asyncio.run(run())
+    # 前两轮分别探测两个后端，之后稳定使用满足 SLO 的后端
+    assert replies == ["slow ok", "fast ok", "fast ok", "fast ok"]
+    assert router.metrics["slow"].ttft_ms > 20 > router.metrics["fast"].ttft_ms
+
+
+def test_router_fails_over_and_keeps_history():
+    async def run():
+        broken, backup = FakeChat("broken", 0, fail=True), FakeChat("backup", 0)
+        router = RoutingChat({"broken": broken, "backup": backup}, slo_ms=100)
+        first = await _turn(router, "hello")
+        second = await _turn(router, "again")
+        return router, backup, first, second
+
+    router, backup, first, second = asyncio.run(run())
+    assert first == "backup ok" and second == "backup ok"
+    assert router.metrics["broken"].error_rate > 0
+    # 第二轮请求带上了第一轮的历史
+    assert [m["content"] for m in backup.seen[-1]] == ["hello", "backup ok", "again"]
+
+
+def test_router_rejects_backends_with_history():
+    backend = FakeChat("used", 0)
+    backend.history.add_turn("hi", "hello")
+    with pytest.raises(ValueError):
+        RoutingChat({"used": backend})
+
+
+def test_mid_stream_error_counts_as_failure():
+    async def run():
+        flaky, backup = FakeChat("flaky", 0, fail_midway=True), FakeChat("backup", 0)
+        router = RoutingChat({"flaky": flaky, "backup": backup})
+        reply = await _turn(router, "hello")
+        return router, backup, reply
+
+    router, backup, reply = asyncio.run(run())
+    # 已输出部分回复，不换后端重试，但计入错误率
+    assert reply.startswith("flaky") and "Error:" in reply
+    assert backup.seen == []
+    assert router.metrics["flaky"].error_rate > 0
+
+
+def test_router_keeps_backend_low_water(monkeypatch):
+    monkeypatch.setenv("CHAT_HISTORY_MAX_TOKENS", "1000")
+    eager, default = FakeChat("eager", 0), FakeChat("default", 0)
+    eager.history.low_water = 500  # 如 DeepSeek append 模式
+    router = RoutingChat({"eager": eager, "default": default})
+    assert router.history.low_water == 500
+    assert eager.history is router.history
@@ -0,0 +1,63 @@
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from src.utils.segmenter import SentenceSegmenter, split_sentences
+
+TEXT = ('Hello there. Mr. Smith paid $3.50 for it, e.g. a coffee! Really?! '
+        '你好。今天天气不错！我们走吧？ J. K. Rowling wrote it... Then "done." Next')
+
+
+def _stream(text, size, **kwargs):
+    segmenter = SentenceSegmenter(**kwargs)
+    sentences = []
+    for start in range(0, len(text), size):
+        sentences.extend(segmenter.feed(text[start:start + size]))
+    return sentences + segmenter.flush()
+
+
+def test_mixed_punctuation_abbreviations_and_decimals():
+    assert [s.strip() for s in split_sentences(TEXT)] == [
+        "Hello there.",
+        "Mr. Smith paid $3.50 for it, e.g. a coffee!",
+        "Really?!",
+        "你好。今天天气不错！",
+        "我们走吧？",
+        "J. K. Rowling wrote it...",
+        'Then "done."',
+        "Next",
+    ]
+
+
+def test_chunking_does_not_change_result():
+    expected = split_sentences(TEXT)
+    for size in (1, 2, 3, 7, 50):
+        assert _stream(TEXT, size) == expected
+    assert "".join(expected) == TEXT
+
+
+def test_waits_for_lookahead_before_latin_boundary():
+    segmenter = SentenceSegmenter()
+    assert segmenter.feed("The value is 3.") == []
+    assert segmenter.feed("14 exactly. And") == ["The value is 3.14 exactly."]
+    assert segmenter.flush() == [" And"]
+
+
+def test_cjk_terminator_run_split_across_chunks():
+    segmenter = SentenceSegmenter(min_chars=4)
+    # 末尾的句末标点等下一段确认，"……" 和 "？！" 被拆开也不会单独成句
+    assert segmenter.feed("你好…") == []
+    assert segmenter.feed("…真的吗？") == ["你好……"]
+    assert segmenter.feed("！”好的。") == ["真的吗？！”"]
+    assert segmenter.flush() == ["好的。"]
+    text = "你好……真的吗？！”好的。"
+    for size in (1, 2, 3):
+        assert _stream(text, size, min_chars=4) == ["你好……", "真的吗？！”", "好的。"]
+
+
+def test_min_and_max_length_policy():
+    assert split_sentences("Hi. Okay then, let us go.") == ["Hi. Okay then, let us go."]
+    long_clause = "word " * 40
+    pieces = split_sentences(long_clause + "end, " + long_clause, max_chars=60)
+    assert all(len(piece) <= 60 for piece in pieces)
+    assert "".join(pieces) == long_clause + "end, " + long_clause
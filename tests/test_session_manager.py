@@ -0,0 +1,132 @@
+import sys
+import asyncio
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from src.chat.base_chat import BaseChat
+from src.chat.history_store import SQLiteHistoryStore
+from src.chat.session_manager import SessionManager
+
+
+class EchoChat(BaseChat):
+    """原样回复的假后端，记录是否被关闭"""
+    summarize_history = False
+
+    def __init__(self):
+        super().__init__("")
+        self.closed = False
+
+    def _build_request(self, messages):
+        return None
+
+    def _parse_event(self, event):
+        return None
+
+    async def _stream_messages(self, messages, result, background=False):
+        reply = messages[-1]["content"] * 10
+        result.append(reply)
+        yield reply
+
+    async def close(self):
+        await super().close()
+        self.closed = True
+
+
+async def _turn(chat, text):
+    return "".join([chunk async for chunk in chat.stream_chat(text)])
+
+
+def test_reconnect_resumes_same_chat():
+    manager = SessionManager(EchoChat)
+
+    async def run():
+        chat, resumed = await manager.acquire("browser-1")
+        await _turn(chat, "hello")
+        await manager.release("browser-1")
+        again, resumed_again = await manager.acquire("browser-1")
+        return chat, resumed, again, resumed_again
+
+    chat, resumed, again, resumed_again = asyncio.run(run())
+    assert again is chat
+    assert (resumed, resumed_again) == (False, True)
+    assert [m["content"] for m in again.conversation_history] == ["hello", "hello" * 10]
+
+
+def test_lru_and_idle_ttl_eviction_skip_active_sessions():
+    manager = SessionManager(EchoChat, max_sessions=2, idle_ttl=0.05)
+
+    async def run():
+        chats = {}
+        for sid in ("a", "b", "c"):
+            chats[sid], _ = await manager.acquire(sid)
+        # 三个会话都在使用中，不淘汰
+        assert len(manager) == 3
+        await manager.release("a")
+        await manager.release("b")
+        # a 最久未用，被淘汰
+        assert "a" not in manager and "b" in manager and chats["a"].closed
+        await asyncio.sleep(0.1)
+        await manager.acquire("d")
+        # b 空闲超时，c 仍在使用
+        assert "b" not in manager and "c" in manager
+        return manager.evictions
+
+    assert asyncio.run(run()) == 2
+
+
+def test_memory_cap_evicts_idle_sessions():
+    manager = SessionManager(EchoChat, max_total_tokens=200)
+
+    async def run():
+        for sid in ("a", "b", "c"):
+            chat, _ = await manager.acquire(sid)
+            await _turn(chat, "x" * 40)
+            await manager.release(sid)
+        return manager.total_tokens
+
+    total = asyncio.run(run())
+    assert total <= 200
+    assert "c" in manager and "a" not in manager
+
+
+def test_new_connection_replaces_the_live_one():
+    manager = SessionManager(EchoChat)
+    replaced = []
+
+    async def run():
+        async def first_replaced():
+            replaced.append("first")
+
+        chat, _ = await manager.acquire("tab", on_replaced=first_replaced)
+        stops = []
+        chat.stop_streaming = lambda: stops.append(True)
+        # 另一个标签页使用同一 session id
+        again, resumed = await manager.acquire("tab")
+        assert again is chat and resumed
+        assert replaced == ["first"]
+        # 旧连接随后断开，不影响新连接正在进行的回复
+        await manager.release("tab")
+        assert stops == []
+        await manager.release("tab")
+        assert stops == [True]
+        # 会话空闲后重新获取，不再调用已断开连接的回调
+        await manager.acquire("tab")
+        assert replaced == ["first"]
+
+    asyncio.run(run())
+
+
+def test_discarded_session_is_removed_from_store(tmp_path):
+    store = SQLiteHistoryStore(tmp_path / "history.db")
+    manager = SessionManager(EchoChat, store=store)
+
+    async def run():
+        chat, _ = await manager.acquire("anonymous")
+        await _turn(chat, "hello")
+        await manager.release("anonymous", discard=True)
+        again, resumed = await manager.acquire("anonymous")
+        await manager.close()
+        return again, resumed
+
+    again, resumed = asyncio.run(run())
+    assert not resumed and len(again.history) == 0
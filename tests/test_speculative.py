@@ -0,0 +1,112 @@
+import sys
+import asyncio
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from src.chat.base_chat import BaseChat
+from src.chat.speculative import Speculator
+
+
+class SlowEchoChat(BaseChat):
+    """首字前等待 ttft 秒的假后端，记录收到的问题"""
+    summarize_history = False
+
+    def __init__(self, ttft=0.05):
+        super().__init__("")
+        self.ttft = ttft
+        self.prompts = []
+
+    def _build_request(self, messages):
+        return None
+
+    def _parse_event(self, event):
+        return None
+
+    async def _stream_messages(self, messages, result, background=False):
+        prompt = messages[-1]["content"]
+        self.prompts.append(prompt)
+        await asyncio.sleep(self.ttft)
+        for part in ("回复：", prompt):
+            result.append(part)
+            yield part
+
+
+async def _commit(speculator, text):
+    return "".join([chunk async for chunk in speculator.commit(text)])
+
+
+def test_hit_reuses_inflight_stream():
+    chat = SlowEchoChat()
+    speculator = Speculator(chat)
+
+    async def run():
+        speculator.propose("今天北京的天气怎么样")
+        await asyncio.sleep(0.03)  # 识别尚未完成
+        return await _commit(speculator, "今天北京的天气怎么样？")
+
+    reply = asyncio.run(run())
+    assert reply == "回复：今天北京的天气怎么样"
+    assert chat.prompts == ["今天北京的天气怎么样"]
+    assert speculator.stats.hits == 1
+    assert speculator.stats.last_saved_ms >= 25
+    assert len(chat.history) == 2
+
+
+def test_miss_cancels_and_reissues():
+    chat = SlowEchoChat()
+    speculator = Speculator(chat)
+
+    async def run():
+        speculator.propose("帮我订一张")
+        await asyncio.sleep(0.01)
+        return await _commit(speculator, "帮我订一张明天去上海的火车票")
+
+    reply = asyncio.run(run())
+    assert reply == "回复：帮我订一张明天去上海的火车票"
+    assert chat.prompts == ["帮我订一张", "帮我订一张明天去上海的火车票"]
+    assert (speculator.stats.speculated, speculator.stats.hits) == (1, 0)
+    # 被取消的预取不写入历史
+    assert [m["content"] for m in chat.history.messages()][0] == "帮我订一张明天去上海的火车票"
+
+
+def test_similar_partials_keep_one_speculation():
+    chat = SlowEchoChat()
+    speculator = Speculator(chat)
+
+    async def run():
+        speculator.propose("请介绍一下你自己吧")
+        speculator.propose("请介绍一下你自己吧。")
+        speculator.propose("你好")  # 太短，忽略
+        return await _commit(speculator, "请介绍一下你自己吧")
+
+    asyncio.run(run())
+    assert chat.prompts == ["请介绍一下你自己吧"]
+    assert speculator.stats.hit_rate == 1.0
+
+
+def test_completed_miss_leaves_no_history():
+    chat = SlowEchoChat(ttft=0.01)
+    speculator = Speculator(chat)
+
+    async def run():
+        speculator.propose("帮我订一张")
+        await asyncio.sleep(0.05)  # 预取已经完成
+        return await _commit(speculator, "帮我订一张去上海的机票")
+
+    reply = asyncio.run(run())
+    assert reply == "回复：帮我订一张去上海的机票"
+    assert [m["content"] for m in chat.history.messages()] == ["帮我订一张去上海的机票", reply]
+
+
+def test_cancel_after_completion_leaves_no_history():
+    chat = SlowEchoChat(ttft=0.01)
+    speculator = Speculator(chat)
+
+    async def run():
+        speculator.propose("帮我订一张")
+        await asyncio.sleep(0.05)
+        speculator.cancel()  # 如识别出错或用户停止
+
+    asyncio.run(run())
+    assert chat.prompts == ["帮我订一张"]
+    assert len(chat.history) == 0
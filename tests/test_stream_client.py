@@ -0,0 +1,39 @@
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from src.chat.stream_client import NDJSONParser, SSEParser, StreamResult
+
+
+def test_sse_parser_handles_chunk_boundaries():
+    stream = 'data: {"a": "你好"}\n\n: keep-alive\n\ndata: {"b": 1}\r\n\r\ndata: [DONE]\n\n'.encode("utf-8")
+    parser = SSEParser()
+    events = []
+    # 逐字节喂入，覆盖多字节字符和 \r\n 被切开的情况
+    for i in range(len(stream)):
+        events.extend(parser.feed(stream[i:i + 1]))
+    events.extend(parser.close())
+    assert events == ['{"a": "你好"}', '{"b": 1}', "[DONE]"]
+
+
+def test_sse_parser_joins_multiline_data_and_flushes_tail():
+    parser = SSEParser()
+    assert parser.feed(b"data: line1\ndata: line2\n\ndata: tail") == ["line1\nline2"]
+    assert parser.close() == ["tail"]
+
+
+def test_ndjson_parser():
+    parser = NDJSONParser()
+    assert parser.feed(b'{"x": 1}\n{"x"') == ['{"x": 1}']
+    assert parser.feed(b': 2}\n\n') == ['{"x": 2}']
+    assert parser.close() == []
+
+
+def test_stream_result_accumulates():
+    result = StreamResult()
+    for part in ["Hello", ", ", "world"]:
+        result.append(part)
+    result.stats.finish()
+    assert result.text == "Hello, world"
+    assert result.stats.chunks == 3
+    assert result.stats.ttft_ms is not None
@@ -0,0 +1,90 @@
+import sys
+import asyncio
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from src.chat.token_cache import AccessTokenCache
+
+
+def _fetcher(expires_in=3600.0, delay=0.02):
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(delay)
+        return f"token-{len(calls)}", expires_in
+    return fetch, calls
+
+
+def test_concurrent_gets_share_one_fetch():
+    fetch, calls = _fetcher()
+    cache = AccessTokenCache(fetch)
+
+    async def run():
+        tokens = await asyncio.gather(*(cache.get() for _ in range(20)))
+        await cache.stop()
+        return tokens
+
+    tokens = asyncio.run(run())
+    assert len(calls) == 1
+    assert set(tokens) == {"token-1"}
+
+
+def test_background_renewal_before_expiry():
+    # 有效期 0.3 秒，扣除 expiry_margin 后 0.2 秒，提前 0.1 秒续期
+    fetch, calls = _fetcher(expires_in=0.3, delay=0.0)
+    cache = AccessTokenCache(fetch, refresh_margin=0.1, expiry_margin=0.1)
+
+    async def run():
+        first = await cache.get()
+        await asyncio.sleep(0.15)
+        # 续期已在后台完成，读取不需要等待
+        renewed = await asyncio.wait_for(cache.get(), timeout=0.01)
+        await cache.stop()
+        return first, renewed
+
+    first, renewed = asyncio.run(run())
+    assert first == "token-1"
+    assert renewed == "token-2"
+    assert len(calls) == 2
+
+
+def test_invalidate_forces_refetch():
+    fetch, calls = _fetcher(delay=0.0)
+    cache = AccessTokenCache(fetch)
+
+    async def run():
+        await cache.get()
+        cache.invalidate()
+        token = await cache.get()
+        await cache.stop()
+        return token
+
+    assert asyncio.run(run()) == "token-2"
+    assert len(calls) == 2
+
+
+def test_ernie_instances_share_token(monkeypatch):
+    from src.chat.ernie_chat import ErnieChat
+    from src.chat.mock_server import MockLLMServer, MockProfile
+    from src.chat.stream_client import close_clients
+
+    async def run():
+        server = MockLLMServer(MockProfile(ttft_ms=5, inter_token_ms=1, reply_tokens=3))
+        await server.start()
+        monkeypatch.setenv("ERNIE_BASE_URL", server.url)
+        monkeypatch.setenv("BAIDU_API_KEY", "shared-key")
+        monkeypatch.setenv("BAIDU_SECRET_KEY", "secret")
+        chats = [ErnieChat() for _ in range(5)]
+        replies = await asyncio.gather(*(_collect(chat) for chat in chats))
+        await chats[0].tokens.stop()
+        await close_clients()
+        await server.stop()
+        return server, replies
+
+    async def _collect(chat):
+        return "".join([chunk async for chunk in chat.stream_chat("hi")])
+
+    server, replies = asyncio.run(run())
+    assert all(not reply.startswith("Error:") for reply in replies)
+    assert server.paths["/oauth/2.0/token"] == 1
@@ -0,0 +1,26 @@
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from src.audio.tts_batching import plan_batches
+
+
+def test_groups_similar_lengths_and_covers_all_segments():
+    lengths = [40, 12, 38, 10, 80, 42, 11]
+    batches = plan_batches(lengths, max_batch=4)
+    assert sorted(i for batch in batches for i in batch) == list(range(len(lengths)))
+    assert [1, 3, 6] in [sorted(batch) for batch in batches]
+    for batch in batches:
+        sizes = [lengths[i] for i in batch]
+        assert max(sizes) <= 1.5 * min(sizes)
+
+
+def test_respects_batch_and_token_limits():
+    batches = plan_batches([100] * 10, max_batch=4, max_tokens=300)
+    assert [len(batch) for batch in batches] == [3, 3, 3, 1]
+    assert plan_batches([100] * 5, max_batch=8)[0] == [0, 1, 2, 3, 4]
+
+
+def test_batches_follow_text_order():
+    batches = plan_batches([50, 10, 52, 11])
+    assert batches == [[0, 2], [1, 3]]
@@ -0,0 +1,44 @@
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import numpy as np
+
+from src.audio.tts_cache import AudioCache, PhonemeCache
+
+
+def test_phoneme_cache_is_lru():
+    calls = []
+
+    def phonemize(text, lang):
+        calls.append(text)
+        return text.upper()
+
+    cache = PhonemeCache(max_entries=2)
+    for text in ("hello", "hello", "world", "again", "hello"):
+        assert cache.get_or_compute(text, "a", phonemize) == text.upper()
+    assert calls == ["hello", "world", "again", "hello"]
+    assert (cache.hits, cache.misses) == (1, 4)
+
+
+def test_audio_cache_keys_on_voice_and_speed_and_bounds_memory():
+    cache = AudioCache(max_bytes=3 * 400)
+    audio = np.ones(100, dtype=np.float32)
+    cache.put("həlˈoʊ", "af", 1.0, audio)
+    assert np.array_equal(cache.get("həlˈoʊ", "af", 1.0), audio)
+    assert cache.get("həlˈoʊ", "am_adam", 1.0) is None
+    assert cache.get("həlˈoʊ", "af", 1.2) is None
+    for i in range(3):
+        cache.put(f"p{i}", "af", 1.0, audio)
+    assert len(cache) == 3 and cache.nbytes <= 1200
+    assert cache.get("həlˈoʊ", "af", 1.0) is None  # 最久未用，已淘汰
+
+
+def test_audio_cache_disk_tier_survives_restart(tmp_path):
+    audio = np.linspace(-1, 1, 50, dtype=np.float32)
+    AudioCache(disk_dir=str(tmp_path)).put("wˈɜːld", "af", 1.0, audio)
+    restarted = AudioCache(disk_dir=str(tmp_path))
+    cached = restarted.get("wˈɜːld", "af", 1.0)
+    assert np.array_equal(cached, audio)
+    assert restarted.disk_hits == 1
+    assert not cached.flags.writeable
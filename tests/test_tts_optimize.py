@@ -0,0 +1,44 @@
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import numpy as np
+import pytest
+
+from src.audio.tts_optimize import CPUOptimization, audio_similarity
+
+SAMPLE_RATE = 24000
+
+
+def tone(freq, seconds=1.0):
+    t = np.arange(int(SAMPLE_RATE * seconds)) / SAMPLE_RATE
+    return (np.sin(2 * np.pi * freq * t) * np.linspace(0, 1, len(t))).astype(np.float32)
+
+
+def test_similarity_tolerates_small_differences():
+    rng = np.random.default_rng(0)
+    audio = tone(440)
+    assert audio_similarity(audio, audio) == pytest.approx(1.0)
+    assert audio_similarity(audio, audio + rng.normal(0, 0.001, audio.shape)) > 0.99
+    # 音量和长度不同不影响频谱形状
+    assert audio_similarity(audio, audio[:20000] * 0.5) > 0.99
+
+
+def test_similarity_detects_different_audio():
+    rng = np.random.default_rng(0)
+    audio = tone(440)
+    assert audio_similarity(audio, tone(880)) < 0.2
+    assert audio_similarity(audio, rng.normal(0, 0.3, audio.shape)) < 0.2
+
+
+def test_options_from_env(monkeypatch):
+    assert not CPUOptimization.from_env().enabled
+    monkeypatch.setenv("KOKORO_CPU_OPTIMIZE", "true")
+    monkeypatch.setenv("KOKORO_THREADS", "4")
+    monkeypatch.setenv("KOKORO_COMPILE", "trace")
+    options = CPUOptimization.from_env()
+    assert (options.enabled, options.threads, options.interop_threads, options.quantize, options.compile) == \
+        (True, 4, None, True, "trace")
+    monkeypatch.setenv("KOKORO_COMPILE", "jit")
+    with pytest.raises(ValueError):
+        CPUOptimization.from_env()
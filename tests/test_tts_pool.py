@@ -0,0 +1,84 @@
+import sys
+import time
+import threading
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from src.audio.tts_pool import TTSPool
+
+
+class FakeTTS:
+    """记录并发合成数的假 TTS"""
+    created = 0
+    active = 0
+    peak = 0
+    lock = threading.Lock()
+
+    def __init__(self):
+        FakeTTS.created += 1
+
+    def _segments(self, text):
+        return text.split("|")
+
+    def encode_segments(self, segments, format="wav", voice=None):
+        with FakeTTS.lock:
+            FakeTTS.active += 1
+            FakeTTS.peak = max(FakeTTS.peak, FakeTTS.active)
+        time.sleep(0.01)
+        with FakeTTS.lock:
+            FakeTTS.active -= 1
+        for segment in segments:
+            yield segment.encode()
+
+
+class BatchingTTS(FakeTTS):
+    """记录每次合成的分段"""
+    batch_size = 2
+    calls = []
+
+    def encode_segments(self, segments, format="wav", voice=None):
+        BatchingTTS.calls.append(list(segments))
+        yield from super().encode_segments(segments, format, voice)
+
+
+def test_replicas_are_shared_and_bounded():
+    FakeTTS.created = FakeTTS.peak = 0
+    pool = TTSPool(FakeTTS, size=2)
+    results = []
+
+    def client(i):
+        results.append(b"".join(pool.speak_stream(f"a{i}|b{i}")))
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert FakeTTS.created == 2
+    assert FakeTTS.peak <= 2
+    assert sorted(results) == sorted(f"a{i}b{i}".encode() for i in range(6))
+    assert pool.busy == 0
+
+
+def test_stream_releases_replica_between_segments():
+    pool = TTSPool(FakeTTS, size=1)
+    stream = pool.speak_stream("first|second")
+    assert next(stream) == b"first"
+    # 第一段已产出，另一个连接可以立即使用唯一的副本
+    with pool.acquire(timeout=0.1) as tts:
+        assert isinstance(tts, FakeTTS)
+    assert list(stream) == [b"second"]
+
+
+def test_stream_synthesizes_first_segment_alone_then_batches():
+    BatchingTTS.calls = []
+    pool = TTSPool(BatchingTTS, size=1)
+    assert list(pool.speak_stream("a|b|c|d")) == [b"a", b"b", b"c", b"d"]
+    assert BatchingTTS.calls == [["a"], ["b", "c"], ["d"]]
+
+
+def test_speak_batch_synthesizes_all_texts_in_one_call():
+    BatchingTTS.calls = []
+    pool = TTSPool(BatchingTTS, size=1)
+    assert pool.speak_batch(["a|b", "c", " "]) == [[b"a", b"b"], [b"c"], []]
+    assert BatchingTTS.calls == [["a", "b", "c"]]
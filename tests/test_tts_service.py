@@ -0,0 +1,184 @@
+import sys
+import time
+import asyncio
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import pytest
+
+from src.audio.tts_pool import TTSPool
+from src.audio.tts_service import ReplyAudio, TTSService
+from src.audio.voices import VoiceRegistry
+
+
+class FakeTTS:
+    """按顺序记录合成文本的假 TTS"""
+    spoken = []
+    batches = []
+
+    def _segments(self, text):
+        return [text]
+
+    def encode_segments(self, segments, format="wav", voice=None):
+        time.sleep(0.01)
+        FakeTTS.batches.append(list(segments))
+        for text in segments:
+            FakeTTS.spoken.append(text)
+            yield f"{voice}:{text}".encode()
+
+
+class BatchingTTS(FakeTTS):
+    batch_size = 4
+
+
+def test_sessions_are_served_round_robin():
+    FakeTTS.spoken = []
+    service = TTSService(TTSPool(FakeTTS, size=1), max_pending=4)
+
+    async def run():
+        a = [await service.submit("a", f"a{i}") for i in range(3)]
+        b = await service.submit("b", "b0", voice="bella")
+        return await asyncio.gather(*a, b)
+
+    results = asyncio.run(run())
+    service.close()
+    assert results[-1] == [b"bella:b0"]
+    # a0 已在合成，b0 排在 a 剩余的请求之前
+    assert FakeTTS.spoken.index("b0") < FakeTTS.spoken.index("a2")
+    assert service.completed == 4
+
+
+def test_submit_waits_when_session_queue_is_full():
+    service = TTSService(TTSPool(FakeTTS, size=1), max_pending=2)
+
+    async def run():
+        first = await service.submit("a", "one")
+        await service.submit("a", "two")
+        third = asyncio.create_task(service.submit("a", "three"))
+        await asyncio.sleep(0)
+        assert not third.done()
+        # 其他会话不受影响
+        other = await service.submit("b", "other")
+        await first
+        return await (await third), await other
+
+    assert asyncio.run(run()) == ([b"None:three"], [b"None:other"])
+    service.close()
+
+
+def test_cancel_session_drops_queued_jobs():
+    FakeTTS.spoken = []
+    service = TTSService(TTSPool(FakeTTS, size=1), max_pending=4)
+
+    async def run():
+        jobs = [await service.submit("a", f"a{i}") for i in range(3)]
+        service.cancel_session("a")
+        await jobs[0]
+        return jobs
+
+    jobs = asyncio.run(run())
+    service.close()
+    assert FakeTTS.spoken == ["a0"]
+    assert jobs[1].cancelled() and jobs[2].cancelled()
+    assert service._slots == {}
+
+
+def test_session_slots_are_dropped_and_rebuilt_per_loop():
+    service = TTSService(TTSPool(FakeTTS, size=1), max_pending=1)
+
+    async def run(session_id):
+        first = await service.submit(session_id, "one")
+        second = asyncio.create_task(service.submit(session_id, "two"))
+        await asyncio.sleep(0)
+        assert session_id in service._slots
+        await first
+        return await (await second)
+
+    # 每个新连接一个会话 id，完成后不留下名额；同一服务在新的事件循环中照常使用
+    for session_id in ("a", "b", "a"):
+        assert asyncio.run(run(session_id)) == [b"None:two"]
+        assert service._slots == {}
+    service.close()
+
+
+def test_cancelled_reply_sends_no_more_audio():
+    FakeTTS.spoken = []
+    service = TTSService(TTSPool(FakeTTS, size=1), max_pending=4)
+    sent = []
+
+    async def send(chunk):
+        sent.append(chunk)
+
+    async def reply():
+        async with ReplyAudio(service, "a", send) as audio:
+            for i in range(4):
+                await audio.add(f"s{i}")
+            await asyncio.sleep(10)  # 聊天流仍在进行
+
+    async def run():
+        task = asyncio.create_task(reply())
+        while not sent:
+            await asyncio.sleep(0.001)
+        start = time.perf_counter()
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        elapsed = time.perf_counter() - start
+        count = len(sent)
+        await asyncio.sleep(0.1)
+        return elapsed, count
+
+    elapsed, count = asyncio.run(run())
+    service.close()
+    # 取消不等待剩余的合成，之后也不再发送
+    assert elapsed < 0.01
+    assert len(sent) == count < 4
+    assert len(FakeTTS.spoken) < 4
+
+
+def test_finished_reply_sends_all_audio_in_order():
+    service = TTSService(TTSPool(FakeTTS, size=2), max_pending=4)
+    sent = []
+
+    async def send(chunk):
+        sent.append(chunk)
+
+    async def run():
+        async with ReplyAudio(service, "a", send) as audio:
+            for i in range(4):
+                await audio.add(f"s{i}")
+
+    asyncio.run(run())
+    service.close()
+    assert sent == [f"None:s{i}".encode() for i in range(4)]
+
+
+def test_queued_sentences_are_batched_per_session():
+    FakeTTS.batches = []
+    service = TTSService(TTSPool(BatchingTTS, size=1), max_pending=8)
+
+    async def run():
+        jobs = [await service.submit("a", f"a{i}") for i in range(4)]
+        jobs.append(await service.submit("a", "bella", voice="bella"))
+        return await asyncio.gather(*jobs)
+
+    results = asyncio.run(run())
+    service.close()
+    # a0 立即开始，其余排队的句子合并为一批，声音不同的句子单独合成
+    assert FakeTTS.batches == [["a0"], ["a1", "a2", "a3"], ["bella"]]
+    assert results == [[f"None:a{i}".encode()] for i in range(4)] + [[b"bella:bella"]]
+
+
+def test_has_voice_checks_the_shared_registry(tmp_path):
+    for name in ("af_bella", "af_sarah"):
+        (tmp_path / f"{name}.pt").touch()
+
+    class VoicedTTS(FakeTTS):
+        voices = VoiceRegistry(tmp_path, loader=lambda path: 1.0)
+
+    service = TTSService(TTSPool(VoicedTTS, size=1))
+    assert service.has_voice(None)
+    assert service.has_voice("af_bella:0.7+af_sarah:0.3")
+    assert not service.has_voice("nobody")
+    assert not service.has_voice("af_bella:abc")
+    service.close()
@@ -0,0 +1,45 @@
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import numpy as np
+import pytest
+
+from src.audio.voices import VoiceRegistry
+
+
+def _registry(tmp_path, names=("af_bella", "af_sarah")):
+    loaded = []
+    for name in names:
+        (tmp_path / f"{name}.pt").write_bytes(b"")
+
+    def loader(path):
+        loaded.append(path.stem)
+        return np.full(4, float(names.index(path.stem) + 1))
+
+    return VoiceRegistry(tmp_path, loader), loaded
+
+
+def test_voices_are_loaded_once(tmp_path):
+    registry, loaded = _registry(tmp_path)
+    assert registry.names == ["af_bella", "af_sarah"]
+    for _ in range(3):
+        registry.get("af_bella")
+    assert loaded == ["af_bella", "af_sarah"]
+
+
+def test_weighted_mix_is_cached(tmp_path):
+    registry, _ = _registry(tmp_path)
+    mix = registry.get("af_bella:3 + af_sarah:1")
+    assert np.allclose(mix, 1 * 0.75 + 2 * 0.25)
+    assert registry.get("af_bella:3+af_sarah:1") is mix
+    assert np.allclose(registry.get("af_bella+af_sarah"), 1.5)
+
+
+def test_unknown_voice_or_bad_weight(tmp_path):
+    registry, _ = _registry(tmp_path)
+    with pytest.raises(FileNotFoundError):
+        registry.get("am_adam")
+    with pytest.raises(ValueError):
+        registry.get("af_bella:-1")
+    assert "af_sarah" in registry and "am_adam" not in registry
@@ -0,0 +1,41 @@
+import io
+import sys
+import wave
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import numpy as np
+import pytest
+
+from src.audio.wav import WAV_HEADER_SIZE, encode_pcm16, peak
+
+
+def read_wav(data):
+    with wave.open(io.BytesIO(data)) as f:
+        params = (f.getnchannels(), f.getsampwidth(), f.getframerate())
+        return params, np.frombuffer(f.readframes(f.getnframes()), dtype="<i2")
+
+
+def test_segments_and_silence_share_one_buffer():
+    first = np.full(4, 0.5, dtype=np.float32)
+    second = np.full(3, -0.25)
+    params, samples = read_wav(encode_pcm16([first, None, second], 24000, silence=2))
+    assert params == (1, 2, 24000)
+    assert samples.tolist() == [16383] * 4 + [0] * 2 + [0] * 2 + [-8191] * 3 + [0] * 2
+
+
+def test_normalizes_by_peak_across_segments():
+    audio = [np.array([0.5, -2.0], dtype=np.float32), np.array([1.0])]
+    assert peak(audio) == 2.0
+    _, samples = read_wav(encode_pcm16(audio, 24000))
+    assert samples.tolist() == [8191, -32767, 16383]
+
+
+def test_pcm_has_no_header():
+    audio = [np.array([0.1, 0.2], dtype=np.float32)]
+    wav = encode_pcm16(audio, 24000, silence=1)
+    pcm = encode_pcm16(audio, 24000, silence=1, format="pcm")
+    assert len(pcm) == 6
+    assert wav[WAV_HEADER_SIZE:] == pcm
+    with pytest.raises(ValueError):
+        encode_pcm16(audio, 24000, format="mp3")